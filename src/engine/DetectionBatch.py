@@ -0,0 +1,129 @@
+'''
+DetectionBatch
+Monsters detected on one frame, stored column-wise in NumPy arrays
+so targeting queries run over all detections at once.
+'''
+# Library import
+import numpy as np
+
+# Local import
+from src.utils.box_geometry import (to_boxes, get_centers, get_intersection_areas,
+                                    greedy_nms, get_nearest_box)
+
+class DetectionBatch:
+    '''
+    DetectionBatch
+
+    names:     (n,) monster names, "Health Bar" for health bar detections
+    positions: (n, 2) top-left (x, y) on working frame
+    sizes:     (n, 2) (h, w), same order as template img.shape
+    scores:    (n,) match scores
+    ids:       (n,) track ids from MonsterTracker, -1 for untracked detections
+
+    Indexing or iterating a batch gives detection dicts with
+    "name", "position", "size", "score" and "id" keys.
+    '''
+    __slots__ = ("names", "positions", "sizes", "scores", "ids", "boxes_cache")
+
+    def __init__(self, names=(), positions=(), sizes=(), scores=(), ids=None):
+        self.names = np.asarray(names, dtype=object).reshape(-1)
+        self.positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        self.sizes = np.asarray(sizes, dtype=np.int64).reshape(-1, 2)
+        self.scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+        if ids is None:
+            self.ids = np.full(len(self.scores), -1, dtype=np.int64)
+        else:
+            self.ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        self.boxes_cache = None
+
+    @classmethod
+    def from_matches(cls, name, xs, ys, scores, size, scale=1.0, offset=(0, 0)):
+        '''
+        Batch of template match offsets of one template.
+        Offsets at scale are mapped back by 1/scale then shifted by offset,
+        rounding halves to even like round()
+        '''
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        positions = np.stack((np.rint(xs / scale) + offset[0],
+                              np.rint(ys / scale) + offset[1]), axis=1)
+        return cls(np.full(len(xs), name, dtype=object), positions,
+                   np.tile(size, (len(xs), 1)), scores)
+
+    @classmethod
+    def concat(cls, batches):
+        '''
+        Concatenate batches in order
+        '''
+        batches = [batch for batch in batches if len(batch) > 0]
+        if len(batches) == 0:
+            return cls()
+        if len(batches) == 1:
+            return batches[0]
+        return cls(np.concatenate([batch.names for batch in batches]),
+                   np.concatenate([batch.positions for batch in batches]),
+                   np.concatenate([batch.sizes for batch in batches]),
+                   np.concatenate([batch.scores for batch in batches]),
+                   np.concatenate([batch.ids for batch in batches]))
+
+    def __len__(self):
+        return len(self.scores)
+
+    def __getitem__(self, i):
+        x, y = self.positions[i].tolist()
+        h, w = self.sizes[i].tolist()
+        return {
+            "name": self.names[i],
+            "position": (x, y),
+            "size": (h, w),
+            "score": float(self.scores[i]),
+            "id": int(self.ids[i]),
+        }
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    @property
+    def boxes(self):
+        '''
+        (n, 4) boxes (x1, y1, x2, y2).
+        Sizes are read as (w, h) like common.nms() and the targeting code always did,
+        NMS and attack thresholds are tuned on these boxes
+        '''
+        if self.boxes_cache is None:
+            self.boxes_cache = to_boxes(self.positions, self.sizes)
+        return self.boxes_cache
+
+    @property
+    def centers(self):
+        '''
+        (n, 2) integer (x, y) centers
+        '''
+        return get_centers(self.boxes)
+
+    def select(self, idx):
+        '''
+        Sub-batch of indices or boolean mask idx
+        '''
+        return DetectionBatch(self.names[idx], self.positions[idx],
+                              self.sizes[idx], self.scores[idx], self.ids[idx])
+
+    def nms(self, iou_threshold):
+        '''
+        Non-maximum suppression, same ranking as common.nms()
+        '''
+        if len(self) <= 1:
+            return self
+        return self.select(greedy_nms(self.boxes, self.scores, iou_threshold))
+
+    def get_overlap_mask(self, box, area_thres):
+        '''
+        Whether each detection overlaps box by at least area_thres
+        '''
+        return get_intersection_areas(self.boxes, box) >= area_thres
+
+    def get_nearest(self, point, is_valid=None):
+        '''
+        Index of detection nearest to point, only among is_valid, -1 if none
+        '''
+        return get_nearest_box(self.boxes, point, is_valid)
@@ -0,0 +1,153 @@
+'''
+DirtyRegionMap
+Tile-level map of which parts of the working frame changed since the previous frame.
+Detectors of mostly static screen areas (rune messages, minimap, HP/MP bars)
+reuse their last result while their RoIs stay unchanged.
+'''
+# Library import
+import cv2
+import numpy as np
+
+class DirtyRegionMap:
+    '''
+    DirtyRegionMap
+
+    RoI is (x, y, w, h) on working frame. rois is a list of RoIs,
+    or None for the whole frame.
+    '''
+    def __init__(self, frame_size, cfg):
+        self.enable = cfg["enable"]
+        self.tile_size = cfg["tile_size"]
+        self.diff_thres = cfg["diff_thres"] # Pixel is changed if abs diff > diff_thres
+        self.max_age = cfg["max_age"] # Recompute cached result at least every max_age frames
+        self.frame_w, self.frame_h = frame_size # (w, h)
+        self.rows = -(-self.frame_h // self.tile_size)
+        self.cols = -(-self.frame_w // self.tile_size)
+        # Previous frame and diff buffer, padded to whole tiles
+        self.img_prev = np.zeros((self.rows * self.tile_size,
+                                  self.cols * self.tile_size, 3), dtype=np.uint8)
+        self.img_diff = np.zeros_like(self.img_prev)
+        self.tile_seq = np.zeros((self.rows, self.cols), dtype=np.int64) # last changed seq of tiles
+        self.tile_valid = np.ones((self.rows, self.cols), dtype=bool) # tiles with compared pixels
+        self.seq = -1 # sequence number of current frame
+        self.rois = None # normalized regions of previous frame
+        self.is_reset = True # Next frame marks every tile as changed
+        self.cache = {} # detector name -> (rois, seq, result)
+        self.num_hits = 0 # cached results reused since last new_frame()
+        self.num_misses = 0 # detectors recomputed since last new_frame()
+
+    def update(self, img, seq, rois=None):
+        '''
+        Compare a new working frame with the previous one.
+        rois: normalized regions of img, pixels outside are not compared
+        '''
+        if seq == self.seq or not self.enable:
+            return
+        self.seq = seq
+
+        # Normalized regions changed, e.g. state transition or completed frame
+        if rois != self.rois:
+            self.rois = rois
+            self.is_reset = True
+
+        regions = [(0, 0, self.frame_w, self.frame_h)] if rois is None else rois
+        if self.is_reset:
+            # Regions outside rois are never compared, keep them zero in diff buffer
+            self.img_diff.fill(0)
+            self.tile_valid = self.get_tile_mask(regions)
+            for x, y, w, h in regions:
+                np.copyto(self.img_prev[y:y+h, x:x+w], img[y:y+h, x:x+w])
+            self.tile_seq.fill(seq)
+            self.is_reset = False
+            return
+
+        # Per pixel changed flag, then count changed pixels per tile
+        for x, y, w, h in regions:
+            cv2.absdiff(img[y:y+h, x:x+w], self.img_prev[y:y+h, x:x+w],
+                        dst=self.img_diff[y:y+h, x:x+w])
+            np.copyto(self.img_prev[y:y+h, x:x+w], img[y:y+h, x:x+w])
+        cv2.threshold(self.img_diff, self.diff_thres, 255, cv2.THRESH_BINARY,
+                      dst=self.img_diff)
+        tiles = cv2.resize(self.img_diff, (self.cols, self.rows),
+                           interpolation=cv2.INTER_AREA)
+        is_changed = tiles.any(axis=2) | ~self.tile_valid
+        self.tile_seq[is_changed] = seq
+
+    def get_tile_mask(self, regions):
+        '''
+        Mark tiles that contain any pixel of regions
+        '''
+        mask = np.zeros((self.rows, self.cols), dtype=bool)
+        for roi in regions:
+            tx0, ty0, tx1, ty1 = self.get_tile_range(roi)
+            mask[ty0:ty1, tx0:tx1] = True
+        return mask
+
+    def get_tile_range(self, roi):
+        '''
+        Tile index range (tx0, ty0, tx1, ty1) covering RoI
+        '''
+        x, y, w, h = roi
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.frame_w, x + w), min(self.frame_h, y + h)
+        ts = self.tile_size
+        return x0 // ts, y0 // ts, -(-x1 // ts), -(-y1 // ts)
+
+    def is_changed(self, rois, seq_since):
+        '''
+        Check if any tile of rois changed after frame seq_since
+        '''
+        if rois is None:
+            return bool(self.tile_seq.max() > seq_since)
+        for roi in rois:
+            tx0, ty0, tx1, ty1 = self.get_tile_range(roi)
+            if tx1 > tx0 and ty1 > ty0 and \
+               self.tile_seq[ty0:ty1, tx0:tx1].max() > seq_since:
+                return True
+        return False
+
+    def lookup(self, name):
+        '''
+        Get cached result of a detector.
+
+        Returns:
+            (is_hit, result): is_hit is False if the detector needs to run again,
+                              result is then the stale last result or None
+        '''
+        entry = self.cache.get(name)
+        if entry is None:
+            self.num_misses += 1
+            return False, None
+        rois, seq, result = entry
+        if self.enable and self.seq - seq < self.max_age and not self.is_changed(rois, seq):
+            self.num_hits += 1
+            return True, result
+        self.num_misses += 1
+        return False, result
+
+    def store(self, name, rois, result):
+        '''
+        Cache detector result computed on current frame, valid until rois change
+        '''
+        self.cache[name] = (rois, self.seq, result)
+
+    def new_frame(self):
+        '''
+        Start a new frame, return (hits, misses) during last frame
+        '''
+        num_hits, num_misses = self.num_hits, self.num_misses
+        self.num_hits = self.num_misses = 0
+        return num_hits, num_misses
+
+def get_box_border_rois(box, margin=2):
+    '''
+    RoIs of the border band around an (x, y, w, h) box, None if box is None
+    '''
+    if box is None:
+        return None
+    x, y, w, h = box
+    m = margin
+    return [(x - m, y - m, w + 2*m, 2*m), # top
+            (x - m, y + h - m, w + 2*m, 2*m), # bottom
+            (x - m, y - m, 2*m, h + 2*m), # left
+            (x + w - m, y - m, 2*m, h + 2*m)] # right
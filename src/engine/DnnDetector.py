@@ -0,0 +1,97 @@
+'''
+DnnDetector
+Detect monsters with an object detection model run by cv2.dnn on CPU.
+One forward pass finds every monster type, so detection time doesn't grow
+with the number of monsters and templates of a map like template matching.
+Training data can be made by tools/mob_dataset_maker.py.
+'''
+# Library import
+import cv2
+import numpy as np
+
+# Local import
+from src.engine.DetectionBatch import DetectionBatch
+from src.utils.box_geometry import greedy_nms
+from src.utils.logger import logger
+from src.utils.common import load_yaml
+
+class DnnDetector:
+    '''
+    DnnDetector
+
+    Model is a YOLO style detector exported to ONNX without NMS, with output
+    (1, 4 + num_classes, num_boxes) like YOLOv8 or (1, num_boxes, 5 + num_classes)
+    like YOLOv5, boxes are (cx, cy, w, h) in input pixels.
+    Input is the ROI letterboxed to the top-left of an input_size square, RGB in [0, 1].
+    Class names are the "names" of a dataset yaml, the same order as training.
+    Scores are 1 - confidence, lower is better like template matching diffs.
+    '''
+    PAD_COLOR = (114, 114, 114)
+
+    def __init__(self, cfg):
+        self.input_size = cfg["input_size"] # model input width and height
+        self.conf_thres = cfg["conf_thres"] # minimum class confidence
+        self.nms_thres = cfg["nms_thres"] # IoU to suppress overlapped detections
+
+        names = load_yaml(cfg["names"])["names"]
+        if isinstance(names, dict):
+            names = [names[i] for i in sorted(names)]
+        self.names = np.array(names, dtype=object)
+
+        self.net = cv2.dnn.readNetFromONNX(cfg["model"])
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        logger.info(f"[DnnDetector] Loaded {cfg['model']} with {len(self.names)} classes")
+
+    def detect(self, img, offset, monster_names):
+        '''
+        Detect monsters of monster_names in BGR image img,
+        positions are shifted by offset like DetectionBatch.from_matches()
+
+        Returns:
+            DetectionBatch of monsters
+        '''
+        is_wanted = np.isin(self.names, list(monster_names))
+        if not np.any(is_wanted):
+            return DetectionBatch()
+
+        # Letterbox to top-left, boxes only need to be scaled back
+        h, w = img.shape[:2]
+        ratio = self.input_size / max(h, w)
+        h_in, w_in = max(1, round(h * ratio)), max(1, round(w * ratio))
+        img_input = np.full((self.input_size, self.input_size, 3), self.PAD_COLOR, dtype=np.uint8)
+        img_input[:h_in, :w_in] = cv2.resize(img, (w_in, h_in), interpolation=cv2.INTER_LINEAR)
+        self.net.setInput(cv2.dnn.blobFromImage(img_input, 1.0 / 255.0, swapRB=True))
+        out = self.net.forward()[0]
+
+        num_classes = len(self.names)
+        if out.shape[0] == 4 + num_classes and out.shape[1] != 4 + num_classes:
+            out = out.T # YOLOv8, one column per box
+        if out.shape[1] == 4 + num_classes:
+            confs = out[:, 4:]
+        elif out.shape[1] == 5 + num_classes:
+            confs = out[:, 5:] * out[:, 4:5] # YOLOv5, class probability times objectness
+        else:
+            logger.error(f"[DnnDetector] Unexpected output shape {out.shape} for {num_classes} classes")
+            return DetectionBatch()
+
+        # Best class of each box, among monsters of this map
+        confs = np.where(is_wanted, confs, 0.0)
+        idx_class = confs.argmax(axis=1)
+        conf = confs[np.arange(len(confs)), idx_class]
+        is_valid = conf >= self.conf_thres
+        if not np.any(is_valid):
+            return DetectionBatch()
+        idx_class, conf = idx_class[is_valid], conf[is_valid]
+
+        # (cx, cy, w, h) at input size to (x1, y1, x2, y2) on img
+        cx, cy, bw, bh = (out[is_valid, :4] / ratio).T
+        boxes = np.stack((cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2), axis=1)
+        boxes = np.rint(np.clip(boxes, 0, (w, h, w, h)))
+        keep = greedy_nms(boxes, conf, self.nms_thres)
+        boxes = boxes[keep].astype(np.int64)
+
+        return DetectionBatch(self.names[idx_class[keep]],
+                              boxes[:, :2] + offset,
+                              np.stack((boxes[:, 3] - boxes[:, 1], boxes[:, 2] - boxes[:, 0]), axis=1),
+                              1.0 - conf[keep])
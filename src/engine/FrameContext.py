@@ -0,0 +1,92 @@
+'''
+FrameContext
+Per-frame container of the working frame and the images derived from it.
+Derived images (grayscale, HSV, color masks) are computed on first use and
+shared by all detectors and states, so each one is computed at most once per frame.
+'''
+# Library import
+import cv2
+
+class FrameContext:
+    '''
+    FrameContext
+
+    RoI is (x, y, w, h) on working frame, or None for the whole frame.
+    A derived image of a RoI is reused for any RoI inside it.
+    '''
+    def __init__(self, img, seq=0):
+        self.img = img # read-only BGR working frame
+        self.seq = seq # captured frame sequence number
+        self.h, self.w = img.shape[:2]
+        self.cache = {} # key -> list of (roi, derived image)
+        self.scaled_ctxs = {} # scale -> FrameContext of downscaled frame
+
+    def clip(self, roi):
+        '''
+        Clip RoI inside frame, None means the whole frame
+        '''
+        if roi is None:
+            return (0, 0, self.w, self.h)
+        x, y, w, h = roi
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.w, x + w), min(self.h, y + h)
+        return (x0, y0, max(0, x1 - x0), max(0, y1 - y0))
+
+    def crop(self, roi=None):
+        '''
+        Get a view of RoI on the BGR frame
+        '''
+        x, y, w, h = self.clip(roi)
+        return self.img[y:y+h, x:x+w]
+
+    def gray(self, roi=None):
+        '''
+        Get grayscale image of RoI
+        '''
+        return self.derive("gray", roi,
+                           lambda img: cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))
+
+    def hsv(self, roi=None):
+        '''
+        Get HSV image (OpenCV scale) of RoI
+        '''
+        return self.derive("hsv", roi,
+                           lambda img: cv2.cvtColor(img, cv2.COLOR_BGR2HSV))
+
+    def color_mask(self, color, roi=None):
+        '''
+        Get mask (0 or 255) of pixels exactly equal to BGR color in RoI
+        '''
+        color = tuple(int(c) for c in color)
+        return self.derive(("color", color), roi,
+                           lambda img: cv2.inRange(img, color, color))
+
+    def scaled(self, scale):
+        '''
+        Get FrameContext of the frame resized by scale, self if scale is 1.0.
+        Exact colors are not preserved, use color_mask() on the full frame
+        '''
+        if scale == 1.0:
+            return self
+        if scale not in self.scaled_ctxs:
+            img = cv2.resize(self.img,
+                             (max(1, round(self.w * scale)), max(1, round(self.h * scale))),
+                             interpolation=cv2.INTER_AREA)
+            img.flags.writeable = False
+            self.scaled_ctxs[scale] = FrameContext(img, self.seq)
+        return self.scaled_ctxs[scale]
+
+    def derive(self, key, roi, func):
+        '''
+        Get func(crop of RoI), computed once per frame.
+        The returned image is shared, treat it as read-only
+        '''
+        x, y, w, h = self.clip(roi)
+        for (rx, ry, rw, rh), img in self.cache.get(key, []):
+            if x >= rx and y >= ry and x + w <= rx + rw and y + h <= ry + rh:
+                return img[y-ry:y-ry+h, x-rx:x-rx+w]
+
+        img = func(self.img[y:y+h, x:x+w])
+        img.flags.writeable = False
+        self.cache.setdefault(key, []).append(((x, y, w, h), img))
+        return img
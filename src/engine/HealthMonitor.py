@@ -38,6 +38,9 @@ class HealthMonitor:
 
         # Frame data (will be updated by main thread)
         self.img_frame = None
+        self.img_frame_gray = None
+        self.is_frame_changed = True # UI changed since last bar parsing
+        self.percent_bars = None # last parsed (hp, mp, exp) percent
         self.frame_lock = threading.Lock()
 
         # FPS settings
@@ -82,12 +85,22 @@ class HealthMonitor:
         '''
         self.enabled = False
 
-    def update_frame(self, img_frame):
+    def update_frame(self, img_frame, img_frame_gray, is_changed=True):
         '''
-        Update frame data from main thread
+        Update frame data from main thread.
+        img_frame and its grayscale image are copied, they are views of buffers
+        the main thread reuses once it moves on to later frames.
+        is_changed: False if the UI is the same as last frame, bars are not parsed again
         '''
+        # Unchanged UI is already kept from an earlier frame
+        if not is_changed and self.img_frame is not None:
+            return
+        img_frame = img_frame.copy()
+        img_frame_gray = img_frame_gray.copy()
         with self.frame_lock:
             self.img_frame = img_frame
+            self.img_frame_gray = img_frame_gray
+            self.is_frame_changed = True
 
     def get_hp_mp_exp_percent(self):
         '''
@@ -101,13 +114,25 @@ class HealthMonitor:
         Returns:
             tuple: (hp_percent, mp_percent, exp_percent), each a float between 0 and 1.
         '''
-        if self.img_frame is None:
+        # Main thread only swaps in new copies, never writes into them
+        with self.frame_lock:
+            img_frame = self.img_frame
+            img_frame_gray = self.img_frame_gray
+            is_changed = self.is_frame_changed
+            self.is_frame_changed = False
+        if img_frame is None:
             return None, None, None
 
-        with self.frame_lock:
-            img_frame = self.img_frame.copy()
+        # Reuse last result if UI is unchanged
+        if not is_changed and self.percent_bars is not None:
+            return self.percent_bars
+        self.percent_bars = self.parse_bars(img_frame, img_frame_gray)
+        return self.percent_bars
 
-        img_frame_gray = cv2.cvtColor(img_frame, cv2.COLOR_BGR2GRAY)
+    def parse_bars(self, img_frame, img_frame_gray):
+        '''
+        Locate HP/MP/EXP bars on UI and get their filled ratio
+        '''
         white_mask = cv2.inRange(img_frame_gray, 240, 255)
         # cv2.imshow("white_mask", white_mask)
 
@@ -12,6 +12,8 @@ import logging
 import os
 import datetime
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Library import
 import numpy as np
@@ -20,22 +22,36 @@ import yaml
 
 # Local import
 from src.utils.global_var import WINDOW_WORKING_SIZE
+from src.utils.buffer_pool import buffer_pool
+from src.utils.color_index import ColorIndex, color_mask
+from src.utils.binary_match import binarize, get_match_planes, match_points
 from src.utils.logger import logger
-from src.utils.common import (find_pattern_sqdiff, draw_rectangle, screenshot, nms,
-    load_image, get_mask, get_minimap_loc_size, get_player_location_on_minimap,
+from src.utils.common import (find_pattern_sqdiff, draw_rectangle, screenshot,
+    load_image, get_minimap_loc_size, get_player_location_on_minimap,
+    is_minimap_border_intact,
     is_mac, override_cfg, load_yaml, get_all_other_player_locations_on_minimap,
     click_in_game_window, mask_route_colors, to_opencv_hsv, debug_minimap_colors,
-    activate_game_window, is_img_16_to_9, normalize_pixel_coordinate, resize_window
+    activate_game_window, normalize_pixel_coordinate, resize_window, get_match_result_buffer,
+    resize_by_scale, scale_box, find_match_peaks, select_peaks
+)
+from src.input.KeyBoardController import press_key
+from src.input.backends import (get_capture_backend, get_input_backend,
+    resolve_input_backend
 )
-from src.input.KeyBoardController import KeyBoardController, press_key
-from src.input.KeyBoardListener import KeyBoardListener
-if is_mac():
-    from src.input.GameWindowCapturorForMac import GameWindowCapturor
-else:
-    from src.input.GameWindowCapturor import GameWindowCapturor
 from src.engine.HealthMonitor import HealthMonitor
 from src.engine.Profiler import Profiler
 from src.engine.RuneSolver import RuneSolver
+from src.engine.TemplateCompiler import TemplateCompiler
+from src.engine.TemplateScheduler import TemplateScheduler
+from src.engine.PalettePrefilter import PalettePrefilter
+from src.engine.DnnDetector import DnnDetector
+from src.engine.DetectionBatch import DetectionBatch
+from src.engine.MonsterTracker import MonsterTracker
+from src.engine.WalkableMask import WalkableMask
+from src.engine.SpawnHeatmap import SpawnHeatmap
+from src.engine.RoiPlanner import RoiPlanner, is_covered
+from src.engine.DirtyRegionMap import DirtyRegionMap, get_box_border_rois
+from src.engine.FrameContext import FrameContext
 from src.engine.FiniteStateMachine import FiniteStateMachine
 from src.states.hunting import HuntingState
 from src.states.finding_rune import FindingRuneState
@@ -55,13 +71,23 @@ class MapleStoryAutoBot:
         self.args = args # User args
         self.cfg = None # Configuration
         self.idx_routes = 0 # Index of route map
-        self.monsters_info = {} # monster information
-        self.monsters = [] # monster detected in current frame
+        self.monsters_info = {} # monster name -> list of compiled templates
+        self.perception_scales = {} # detector name -> scale of frame it runs on
+        self.monsters = DetectionBatch() # monster detected in current frame
+        self.min_mob_area = 0 # smallest monster template area of current map
+        self.min_mob_height = 0 # smallest monster template height of current map
+        self.max_mob_side = 0 # longest monster template side of current map
         self.fps = 0 # Frame per second
+        self.frame_seq = 0 # sequence number of current captured frame
+        self.num_frames = 0 # number of processed frames, unlike frame_seq it has no gaps
+        self.t_frame_capture = 0.0 # capture timestamp of current frame
+        self.frame_rois = None # normalized regions of current frame, None for whole frame
         self.red_dot_center_prev = None # previous other player location in minimap
         self.video_writer = None # For video recording feature
         self.color_code = {} # For color code instruction
         self.color_code_up_down = {} # Color code only contain 'up' and 'down'
+        self.color_index = None # ColorIndex of color_code
+        self.color_index_up_down = None # ColorIndex of color_code_up_down
         self.thread_auto_bot = None # thread for running autobot
         self.cmd_move_x = "none" # "left" "right"
         self.cmd_move_y = "none" # "up" "down"
@@ -90,7 +116,7 @@ class MapleStoryAutoBot:
         # Images
         self.frame = None # raw image
         self.img_frame = None # game window frame
-        self.img_frame_gray = None # game window frame graysale
+        self.ctx = None # FrameContext of img_frame, shares derived images between detectors
         self.img_frame_debug = None # game window frame for visualization
         self.img_route = None # route map
         self.img_route_debug = None # route map for visualization
@@ -106,7 +132,8 @@ class MapleStoryAutoBot:
         self.img_map = None
         self.img_routes = []
         self.img_nametag = None
-        self.img_nametag_gray = None
+        self.nametag = None # compiled nametag template
+        self.img_nametag_pattern = None # nametag preprocessed for nametag.mode
         self.img_create_party_enable = None
         self.img_create_party_disable = None
         self.img_login_button = None
@@ -119,6 +146,17 @@ class MapleStoryAutoBot:
         self.health_monitor = None # Health monitor
         self.profiler = None # Profiler, for performance issue debugging
         self.rune_solver = None # Rune solver
+        self.roi_planner = RoiPlanner(WINDOW_WORKING_SIZE) # Regions each detector reads
+        self.dirty_map = None # Changed tiles since last frame, for detector result reuse
+        self.match_pool = None # Worker threads for monster template matching
+        self.num_match_workers = 1 # number of threads in match_pool
+        self.template_scheduler = None # Order and skip monster templates by hit rate
+        self.palette_prefilter = None # Skip monsters whose colors aren't in search ROI
+        self.dnn_detector = None # Object detection model of "dnn" monster detection mode
+        self.monster_tracker = None # Track monsters between full monster detections
+        self.target_id = -1 # track id of last attacked monster, -1 for none
+        self.walkable_mask = None # Platforms of current map, to restrict monster search
+        self.spawn_heatmap = None # Where monsters of current map were seen, to search there first
 
         # Finite State Machine
         self.fsm = FiniteStateMachine()
@@ -158,6 +196,21 @@ class MapleStoryAutoBot:
             tuple(map(int, k.split(','))): v
             for k, v in cfg["route"]["color_code_up_down"].items()
         }
+        self.color_index = ColorIndex(self.color_code.keys())
+        self.color_index_up_down = ColorIndex(self.color_code_up_down.keys())
+
+        # Templates and their derived variants are compiled once
+        compiler = TemplateCompiler(cfg)
+
+        # Perception scale of each detector
+        scale = cfg["perception"]["scale"]
+        if not 0.0 < scale <= 1.0:
+            logger.error(f"Invalid perception scale: {scale}, expect (0.0 ~ 1.0]")
+            return -1
+        self.perception_scales = {
+            name: 1.0 if name in cfg["perception"]["full_res"] else scale
+            for name in ["monster", "nametag", "rune"]
+        }
 
         if cfg["bot"]["mode"] == "normal":
             map_name = cfg['bot']['map']
@@ -187,12 +240,9 @@ class MapleStoryAutoBot:
             for monster_name in self.data["map_mobs_mapping"][map_name]:
                 imgs = []
                 for file in glob.glob(f"monster/{monster_name}/{monster_name}*.png"):
-                    # Add original image
-                    img = load_image(file)
-                    imgs.append((img, get_mask(img, (0, 255, 0))))
-                    # Add flipped image
-                    img_flip = cv2.flip(img, 1)
-                    imgs.append((img_flip, get_mask(img_flip, (0, 255, 0))))
+                    # Add original and flipped image
+                    imgs.extend(compiler.compile(file, self.perception_scales["monster"],
+                                                 is_flip=True))
                 if imgs:
                     self.monsters_info[monster_name] = imgs
                 else:
@@ -201,17 +251,49 @@ class MapleStoryAutoBot:
                     # raise RuntimeError(f"No images found in monster/{monster_name}/{monster_name}*")
             logger.info(f"Loaded monsters: {list(self.monsters_info.keys())}")
 
+            # Template statistics used by every frame's targeting and health bar boxes
+            templates = [t for imgs in self.monsters_info.values() for t in imgs]
+            self.min_mob_area = min((t["img"].shape[0]*t["img"].shape[1] for t in templates), default=0)
+            self.min_mob_height = min((t["img"].shape[0] for t in templates), default=0)
+            self.max_mob_side = max((max(t["img"].shape[:2]) for t in templates), default=0)
+
+        # Load monster detection model
+        self.dnn_detector = None
+        if cfg["monster_detect"]["mode"] == "dnn":
+            cfg_dnn = cfg["dnn_detector"]
+            for path in (cfg_dnn["model"], cfg_dnn["names"]):
+                if not os.path.exists(path):
+                    logger.error(f"[load_config] {path} not found, needed by monster_detect.mode \"dnn\"")
+                    return -1
+            try:
+                self.dnn_detector = DnnDetector(cfg_dnn)
+            except (cv2.error, KeyError) as e:
+                logger.error(f"[load_config] Failed to load monster detection model: {e}")
+                return -1
+
         # Load player's name tag
         if cfg["nametag"]["enable"]:
-            self.img_nametag = load_image(f"nametag/{cfg['nametag']['name']}.png")
-            self.img_nametag_gray = load_image(f"nametag/{cfg['nametag']['name']}.png",
-                                               cv2.IMREAD_GRAYSCALE)
+            self.nametag = compiler.compile(f"nametag/{cfg['nametag']['name']}.png",
+                                            self.perception_scales["nametag"])[0]
+            self.img_nametag = self.nametag["img"]
+            # Preprocess nametag the same way as camera image in each mode
+            img_gray = self.nametag["gray_scaled"]
+            if cfg["nametag"]["mode"] == "white_mask":
+                self.img_nametag_pattern = cv2.inRange(
+                    cv2.GaussianBlur(img_gray, (3, 3), 0), 150, 255)
+            elif cfg["nametag"]["mode"] == "histogram_eq":
+                _, self.img_nametag_pattern = cv2.threshold(
+                    cv2.equalizeHist(img_gray), 150, 255, cv2.THRESH_BINARY)
+            else:
+                self.img_nametag_pattern = img_gray
 
         # Load misc image
         lang = cfg["system"]["language"]
-        self.img_create_party_enable  = load_image(f"misc/party_button_create_enable_{lang}.png")
-        self.img_create_party_disable = load_image(f"misc/party_button_create_disable_{lang}.png")
-        self.img_login_button = load_image(f"misc/login_button_{lang}.png")
+        self.img_create_party_enable  = compiler.compile(
+            f"misc/party_button_create_enable_{lang}.png")[0]["img"]
+        self.img_create_party_disable = compiler.compile(
+            f"misc/party_button_create_disable_{lang}.png")[0]["img"]
+        self.img_login_button = compiler.compile(f"misc/login_button_{lang}.png")[0]["img"]
 
         # Normalized pixel coordinate configuration
         cfg['rune_warning_cn']['top_left'] = normalize_pixel_coordinate(
@@ -243,22 +325,117 @@ class MapleStoryAutoBot:
         # Update cfg
         self.cfg = cfg
 
+        self.register_rois()
+        self.dirty_map = DirtyRegionMap(WINDOW_WORKING_SIZE, cfg["dirty_region"])
+        self.template_scheduler = TemplateScheduler(self.monsters_info, cfg["template_scheduler"])
+        self.palette_prefilter = PalettePrefilter(self.monsters_info, cfg["palette_prefilter"])
+        cfg_tracker = dict(cfg["monster_tracker"])
+        if cfg_tracker["enable"] and cfg["monster_detect"]["mode"] == "template_free":
+            logger.warning("[load_config] monster_tracker doesn't support template_free mode, disabled")
+            cfg_tracker["enable"] = False
+        self.monster_tracker = MonsterTracker(self.monsters_info, cfg_tracker)
+        self.target_id = -1
+        cfg_walkable = dict(cfg["walkable_mask"])
+        if cfg_walkable["enable"] and cfg_walkable["minimap_scale"] <= 0:
+            logger.warning("[load_config] walkable_mask needs minimap_scale, disabled")
+            cfg_walkable["enable"] = False
+        # Player location on map.png is only available in normal mode
+        cfg_walkable["enable"] = cfg_walkable["enable"] and cfg["bot"]["mode"] == "normal"
+        # Walking route codes lie on platforms, jumps, teleports and ladders go through the air
+        route_colors = [color for color, cmd in self.color_code.items()
+                        if cmd.split()[1] in ("none", "stop") and
+                           cmd.split()[2] in ("none", "stop", "goal")]
+        route_colors.append(tuple(cfg["edge_teleport"]["color_code"]))
+        self.walkable_mask = WalkableMask(
+            self.img_routes, route_colors, cfg_walkable,
+            None if self.img_map is None else self.img_map.shape[:2], pad=self.max_mob_side)
+        if self.spawn_heatmap is not None:
+            self.spawn_heatmap.save()
+        cfg_heatmap = dict(cfg["spawn_heatmap"])
+        if cfg_heatmap["enable"] and cfg_walkable["minimap_scale"] <= 0:
+            logger.warning("[load_config] spawn_heatmap needs walkable_mask.minimap_scale, disabled")
+            cfg_heatmap["enable"] = False
+        cfg_heatmap["enable"] = cfg_heatmap["enable"] and cfg["bot"]["mode"] == "normal"
+        self.spawn_heatmap = SpawnHeatmap(
+            f"minimaps/{cfg['bot']['map']}/spawn_heatmap.npy",
+            None if self.img_map is None else self.img_map.shape[:2],
+            cfg_walkable["minimap_scale"], cfg_heatmap, pad=self.max_mob_side)
+
+        # Worker pool for monster template matching, None for serial matching
+        if self.match_pool is not None:
+            self.match_pool.shutdown(wait=True)
+            self.match_pool = None
+        num_workers = cfg["monster_detect"]["num_workers"]
+        if num_workers == 0:
+            num_workers = os.cpu_count() or 1
+        self.num_match_workers = num_workers
+        if num_workers > 1:
+            self.match_pool = ThreadPoolExecutor(max_workers=num_workers,
+                                                 thread_name_prefix="monster_match")
+            logger.info(f"[load_config] Monster template matching with {num_workers} workers")
+
         return 0 # load successfully
 
+    def register_rois(self):
+        '''
+        Declare the regions of working frame each detector reads in each state.
+        The capture thread only normalizes the union of regions of current state.
+        '''
+        states_perception = [name for name in self.fsm.states if name != "solving_rune"]
+        lang = self.cfg["system"]["language"]
+        w, h = WINDOW_WORKING_SIZE
+
+        # Minimap is searched on the whole frame
+        self.roi_planner.register("minimap", None, states_perception)
+        # Player nametag/party red bar is searched on the whole camera
+        self.roi_planner.register("player", None, states_perception)
+        # Monsters can be anywhere on the camera
+        self.roi_planner.register("monster", None, ["hunting", "finding_rune", "near_rune"])
+        # HP/MP/EXP bars
+        ui_y_start = self.cfg["ui_coords"]["ui_y_start"]
+        self.roi_planner.register("health_monitor", (0, ui_y_start, w, h - ui_y_start))
+        # Rune messages
+        for name in [f"rune_warning_{lang}", f"rune_enable_msg_{lang}"]:
+            (x0, y0), (x1, y1) = self.cfg[name]["top_left"], self.cfg[name]["bottom_right"]
+            self.roi_planner.register(name, (x0, y0, x1 - x0, y1 - y0),
+                                      ["hunting", "finding_rune"])
+        # Rune mini-game arrow boxes
+        x0, y0 = self.cfg["rune_solver"]["arrow_box_coord"]
+        size = self.cfg["rune_solver"]["arrow_box_size"]
+        self.roi_planner.register("rune_solver",
+            (x0, y0, 3 * self.cfg["rune_solver"]["arrow_box_interval"] + size, size),
+            ["finding_rune", "near_rune", "solving_rune"])
+
+    def get_rois_needed(self):
+        '''
+        Regions current frame must have, None for the whole frame
+        '''
+        if self.is_show_debug_window:
+            return None # Debug window shows the whole frame
+        return self.roi_planner.plan(self.fsm.state.name)
+
     def start(self):
         '''
         Start all threads
         '''
         # Start keyboard controller thread
+        KeyBoardController = get_input_backend(self.cfg["system"]["input_backend"])
         self.kb = KeyBoardController(self.cfg)
         if self.is_disable_control:
             self.kb.disable() # Disable keyboard controller for debugging
 
         # Start game window capturing thread
-        if self.args.test_image == '':
-            self.capture = GameWindowCapturor(self.cfg)
+        if self.args.replay != '':
+            ReplayCapturor = get_capture_backend("replay")
+            self.capture = ReplayCapturor(self.cfg, self.args.replay,
+                                          speed=self.args.replay_speed,
+                                          is_loop=self.args.replay_loop)
+        elif self.args.test_image != '':
+            HeadlessCapturor = get_capture_backend("headless")
+            self.capture = HeadlessCapturor(self.cfg, self.args.test_image)
         else:
-            self.capture = GameWindowCapturor(self.cfg, self.args.test_image)
+            GameWindowCapturor = get_capture_backend(self.cfg["system"]["capture_backend"])
+            self.capture = GameWindowCapturor(self.cfg)
 
         # Start health monitoring thread
         self.health_monitor = HealthMonitor(self.cfg, self.kb)
@@ -270,7 +447,7 @@ class MapleStoryAutoBot:
         self.profiler = Profiler(self.cfg)
 
         # Init rune solver
-        self.rune_solver = RuneSolver(self.cfg)
+        self.rune_solver = RuneSolver(self.cfg, self.dirty_map)
 
         # Reset all timers
         self.t_last_frame = time.time()
@@ -355,31 +532,29 @@ class MapleStoryAutoBot:
         - Selecting the best match (left or right) based on score and cache status.
         - Computing the player's center position by applying a fixed offset to the nametag.
 
+        Matching runs at perception scale, the result is mapped back to working frame.
+
         Returns:
             loc_player (tuple): The (x, y) coordinates of the player's estimated location.
         '''
         # Get camera region in the game window
-        img_camera = self.img_frame_gray[
-            :self.cfg["ui_coords"]["ui_y_start"], :]
+        scale = self.perception_scales["nametag"]
+        img_camera = self.ctx.scaled(scale).gray(scale_box(
+            (0, 0, self.ctx.w, self.cfg["ui_coords"]["ui_y_start"]), scale))
 
         # Get nametag image and search image
         if self.cfg["nametag"]["mode"] == "white_mask":
             # Apply Gaussian blur for smoother white detection
             img_camera = cv2.GaussianBlur(img_camera, (3, 3), 0)
-            img_nametag = cv2.GaussianBlur(self.img_nametag_gray, (3, 3), 0)
             lower_white, upper_white = (150, 255)
             img_roi = cv2.inRange(img_camera, lower_white, upper_white)
-            img_nametag  = cv2.inRange(img_nametag, lower_white, upper_white)
         elif self.cfg["nametag"]["mode"] == "grayscale":
             img_roi = img_camera
-            img_nametag = self.img_nametag_gray
         elif self.cfg["nametag"]["mode"] == "histogram_eq":
             # Apply histogram equalization
-            img_nametag_eq = cv2.equalizeHist(self.img_nametag_gray)
             img_camera_eq = cv2.equalizeHist(img_camera)
 
             # Apply global (fixed) threshold
-            _, img_nametag = cv2.threshold(img_nametag_eq, 150, 255, cv2.THRESH_BINARY)
             _, img_roi = cv2.threshold(img_camera_eq, 150, 255, cv2.THRESH_BINARY)
         else:
             logger.error(f"Unsupported nametag detection mode: {self.cfg['nametag']['mode']}")
@@ -388,11 +563,13 @@ class MapleStoryAutoBot:
         # cv2.imshow("img_nametag", img_nametag)
 
         # Pad search region to deal with fail detection when player is at map edge
-        (pad_y, pad_x) = self.img_nametag.shape[:2]
+        (pad_y, pad_x) = self.nametag["img_scaled"].shape[:2]
         img_roi = cv2.copyMakeBorder(
             img_roi,
             pad_y, pad_y, pad_x, pad_x,
-            borderType=cv2.BORDER_REPLICATE  # replicate border for safe matching
+            borderType=cv2.BORDER_REPLICATE,  # replicate border for safe matching
+            dst=buffer_pool.get((img_roi.shape[0] + 2*pad_y, img_roi.shape[1] + 2*pad_x),
+                                img_roi.dtype, "nametag_roi")
         )
 
         # Get last frame name tag location
@@ -400,17 +577,18 @@ class MapleStoryAutoBot:
             last_result = None
         else:
             last_result = (
-                self.loc_nametag[0] + pad_x,
-                self.loc_nametag[1] + pad_y
+                round(self.loc_nametag[0] * scale) + pad_x,
+                round(self.loc_nametag[1] * scale) + pad_y
             )
 
         # Get number of splits
+        img_nametag = self.img_nametag_pattern # preprocessed in load_config
         h, w = img_nametag.shape
-        num_splits = max(1, w // self.cfg["nametag"]["split_width"])
+        num_splits = max(1, w // max(1, round(self.cfg["nametag"]["split_width"] * scale)))
         w_split = w // num_splits
 
         # Get nametag's background mask
-        mask = get_mask(self.img_nametag, (0, 255, 0))
+        mask = self.nametag["mask_scaled"]
 
         # Vertically split the nametag image
         nametag_splits = {}
@@ -435,7 +613,8 @@ class MapleStoryAutoBot:
                 split["img"],
                 last_result=split["last_result"],
                 mask=split["mask"],
-                global_threshold=self.cfg["nametag"]["global_diff_thres"]
+                global_threshold=self.cfg["nametag"]["global_diff_thres"],
+                pyramid=self.cfg["pyramid_search"]
             )
             w_match = split["img"].shape[1]
             h_match = split["img"].shape[0]
@@ -449,8 +628,8 @@ class MapleStoryAutoBot:
         # Adjust match location back to full nametag coordinates
         loc_nametag = (loc_nametag[0] - offset_x, loc_nametag[1])
         loc_nametag = (
-            loc_nametag[0] - pad_x,
-            loc_nametag[1] - pad_y
+            int(round((loc_nametag[0] - pad_x) / scale)),
+            int(round((loc_nametag[1] - pad_y) / scale))
         )
 
         # Only update nametag location when score is good enough
@@ -458,7 +637,7 @@ class MapleStoryAutoBot:
             self.loc_nametag = loc_nametag
 
         loc_player = (
-            self.loc_nametag[0] + w // 2,
+            self.loc_nametag[0] + self.img_nametag.shape[1] // 2,
             self.loc_nametag[1] - self.cfg["nametag"]["offset"][1]
         )
 
@@ -479,20 +658,16 @@ class MapleStoryAutoBot:
         '''
         get_player_location_by_party_red_bar
         '''
-        # Zero out minimap area in the img_frame
-        img_frame = self.img_frame.copy()
-        x, y = self.loc_minimap
-        h, w = self.img_minimap.shape[:2]
-        img_frame[y:y+h, x:x+w] = 0
-
-        # Get camera area
-        img_camera = img_frame[:self.cfg["ui_coords"]["ui_y_start"], :]
-
-        # Convert to HSV
-        img_hsv = cv2.cvtColor(img_camera, cv2.COLOR_BGR2HSV)
+        # Get camera area in HSV
+        img_hsv = self.ctx.hsv((0, 0, self.ctx.w, self.cfg["ui_coords"]["ui_y_start"]))
         lower_red = to_opencv_hsv(self.cfg["party_red_bar"]["lower_red"])
         upper_red = to_opencv_hsv(self.cfg["party_red_bar"]["upper_red"])
         mask_red = cv2.inRange(img_hsv, lower_red, upper_red)
+
+        # Zero out minimap area on the mask
+        x, y = self.loc_minimap
+        h, w = self.img_minimap.shape[:2]
+        mask_red[y:y+h, x:x+w] = 0
         # cv2.imshow("mask_red", mask_red)
 
         # Find contours on mask_red
@@ -535,7 +710,8 @@ class MapleStoryAutoBot:
         '''
         self.loc_minimap_global, score, _ = find_pattern_sqdiff(
                                         self.img_map,
-                                        self.img_minimap)
+                                        self.img_minimap,
+                                        pyramid=self.cfg["pyramid_search"])
 
         x_offset, y_offset = self.cfg["minimap"]["offset"]
         loc_player_global = (
@@ -571,7 +747,7 @@ class MapleStoryAutoBot:
         around the player on the route map.
 
         This function:
-        - Scans each pixel in the search box to find nearest color code
+        - Labels every pixel in the search box with ColorIndex in one pass
         - Tracks the closest matching pixel using Manhattan distance (|dx| + |dy|).
         - Returns a dictionary containing the nearest matching
           pixel's position, color, action label, and distance.
@@ -591,32 +767,15 @@ class MapleStoryAutoBot:
         y_min = max(0, y0 - self.cfg["route"]["search_range"])
         y_max = min(h, y0 + self.cfg["route"]["search_range"])
 
-        nearest = None
-        nearest_up_down = None
-        min_dist = float('inf')
-        min_dist_up_down = float('inf')
-        for y in range(y_min, y_max):
-            for x in range(x_min, x_max):
-                pixel = tuple(self.img_route[y, x])  # (R, G, B)
-                dist = abs(x - x0) + abs(y - y0)
-                # Get nearest color
-                if pixel in self.color_code and dist < min_dist:
-                    nearest = {
-                        "pixel": (x, y),
-                        "color": pixel,
-                        "command": self.color_code[pixel],
-                        "distance": dist
-                    }
-                    min_dist = dist
-                # Get nearest color (up, dowm)
-                if pixel in self.color_code_up_down and dist < min_dist_up_down:
-                    nearest_up_down = {
-                        "pixel": (x, y),
-                        "color": pixel,
-                        "command": self.color_code_up_down[pixel],
-                        "distance": dist
-                    }
-                    min_dist_up_down = dist
+        # Manhattan distance from player to each pixel in search box
+        dist = np.add.outer(np.abs(np.arange(y_min, y_max) - y0),
+                            np.abs(np.arange(x_min, x_max) - x0))
+        img_search = self.img_route[y_min:y_max, x_min:x_max]
+        nearest = self.find_nearest_color(
+            img_search, dist, (x_min, y_min), self.color_index, self.color_code)
+        nearest_up_down = self.find_nearest_color(
+            img_search, dist, (x_min, y_min), self.color_index_up_down,
+            self.color_code_up_down)
 
         # Debug
         draw_rectangle(
@@ -666,6 +825,31 @@ class MapleStoryAutoBot:
 
         return nearest, nearest_up_down  # if not found return none
 
+    def find_nearest_color(self, img_search, dist, loc_search, color_index, color_code):
+        '''
+        Find the nearest pixel of any color in color_index.
+        Ties are broken in row-major order, the first pixel scanned wins.
+
+        Returns:
+            dict or None: same as get_nearest_color_code()
+        '''
+        if img_search.size == 0:
+            return None
+        labels = color_index.label_map(img_search)
+        dist = np.where(labels >= 0, dist, np.iinfo(dist.dtype).max)
+        idx = int(np.argmin(dist))
+        label = labels.flat[idx]
+        if label < 0:
+            return None
+        y, x = divmod(idx, dist.shape[1])
+        color = color_index.colors[label]
+        return {
+            "pixel": (loc_search[0] + x, loc_search[1] + y),
+            "color": color,
+            "command": color_code[color],
+            "distance": int(dist.flat[idx])
+        }
+
     def get_attack_range(self, is_left=True):
         '''
         get_attack_range
@@ -699,60 +883,213 @@ class MapleStoryAutoBot:
         This function:
         - Defines an attack box relative to the player position,
             depending on the facing direction (`is_left`).
-        - Iterates through all detected monsters and checks which ones overlap
-          with the attack box.
+        - Checks which detected monsters overlap with the attack box.
         - Returns the closest valid monster that meets the overlap criteria.
 
         Args:
             is_left (bool): If True, assume the player is facing left;
                             adjusts attack box accordingly.
         Returns:
-            dict or None: The nearest monster's info dict, or None if no valid match.
+            int: Index of the nearest monster in self.monsters, or -1 if no valid match.
         '''
+        # Monsters overlap attack box enough, nearest to player center
+        is_valid = self.monsters.get_overlap_mask(self.get_attack_range(is_left=is_left),
+                                                  self.get_attack_area_thres())
+        return self.monster_tracker.get_target(self.monsters, self.loc_player,
+                                               is_valid, self.target_id)
 
-        x0, y0, x1, y1 = self.get_attack_range(is_left=is_left)
+    def get_in_attack_range_mask(self, monsters):
+        '''
+        Whether each monster of DetectionBatch overlaps attack range enough
+        to be a target, either side for directional attack
+        '''
+        if self.cfg["bot"]["attack"] == "directional":
+            attack_ranges = [self.get_attack_range(is_left=True),
+                             self.get_attack_range(is_left=False)]
+        else:
+            attack_ranges = [self.get_attack_range()]
 
-        nearest_monster = None
-        min_distance = float('inf')
-        for monster in self.monsters:
-            mx1, my1 = monster["position"]
-            mw, mh = monster["size"]
-            mx2 = mx1 + mw
-            my2 = my1 + mh
+        inter_area_thres = self.get_attack_area_thres()
+        is_in_range = np.zeros(len(monsters), dtype=bool)
+        for attack_range in attack_ranges:
+            is_in_range |= monsters.get_overlap_mask(attack_range, inter_area_thres)
+        return is_in_range
 
-            # Calculate intersection
-            ix1 = max(x0, mx1)
-            iy1 = max(y0, my1)
-            ix2 = min(x1, mx2)
-            iy2 = min(y1, my2)
+    def get_attack_area_thres(self):
+        '''
+        Minimum overlap area with attack range for a monster to be a target
+        '''
+        return min(self.min_mob_area, self.cfg['monster_detect']['max_mob_area_trigger'])
 
-            iw = max(0, ix2 - ix1)
-            ih = max(0, iy2 - iy1)
-            inter_area = iw * ih
+    def update_template_schedule(self, key, monsters_found, is_stop_at_target=False):
+        '''
+        Record result of a matched monster template.
 
-            min_mob_area = min(img.shape[0]*img.shape[1] for _, imgs in self.monsters_info.items() for img, _ in imgs)
-            inter_area_thres = min(min_mob_area, self.cfg['monster_detect']['max_mob_area_trigger'])
-            if inter_area >= inter_area_thres:
-                # Compute distance to player center
-                monster_center = (mx1 + mw // 2, my1 + mh // 2)
-                dx = monster_center[0] - self.loc_player[0]
-                dy = monster_center[1] - self.loc_player[1]
-                distance = abs(dx) + abs(dy)  # Manhattan distance
+        Returns:
+            True if remaining templates can be skipped,
+            a confident match is already in attack range,
+            or any match is in attack range if is_stop_at_target
+        '''
+        self.template_scheduler.update(key, len(monsters_found) > 0)
+        if len(monsters_found) == 0:
+            return False
+        if is_stop_at_target:
+            return bool(np.any(self.get_in_attack_range_mask(monsters_found)))
+        if not self.template_scheduler.is_early_exit:
+            return False
+        is_confident = monsters_found.scores <= self.template_scheduler.confident_thres
+        return bool(np.any(is_confident & self.get_in_attack_range_mask(monsters_found)))
 
-                if distance < min_distance:
-                    min_distance = distance
-                    nearest_monster = monster
+    def get_target_query_rois(self):
+        '''
+        Split attack ranges into vertical strips, nearest strip to player first.
+        Each strip is padded by the longest template side, so a monster
+        overlapping the strip is fully inside its ROI.
 
-        return nearest_monster
+        Returns:
+            list of (distance to player, top_left, bottom_right), ROIs are clipped to frame
+        '''
+        if self.cfg["bot"]["attack"] == "directional":
+            attack_ranges = [self.get_attack_range(is_left=True),
+                             self.get_attack_range(is_left=False)]
+        else:
+            attack_ranges = [self.get_attack_range()]
+
+        num_splits = self.cfg["monster_detect"]["target_query_splits"]
+        pad = self.max_mob_side
+        px = self.loc_player[0]
+        h_frame, w_frame = self.img_frame.shape[:2]
+        strips = []
+        for x0, y0, x1, y1 in attack_ranges:
+            # Split at player so both halves of aoe range start next to player
+            edges = [x0, x1] if not x0 < px < x1 else [x0, px, x1]
+            for xa, xb in zip(edges[:-1], edges[1:]):
+                splits = np.linspace(xa, xb, num_splits + 1).round().astype(int).tolist()
+                for sa, sb in zip(splits[:-1], splits[1:]):
+                    top_left = (max(0, sa - pad), max(0, y0 - pad))
+                    bottom_right = (min(w_frame, sb + pad), min(h_frame, y1 + pad))
+                    if top_left[0] < bottom_right[0] and top_left[1] < bottom_right[1]:
+                        strips.append((max(0, sa - px, px - sb), top_left, bottom_right))
+        strips.sort(key=lambda strip: strip[0]) # stable
+        return strips
+
+    def query_monsters_in_attack_range(self):
+        '''
+        Match monsters strip by strip from get_target_query_rois(),
+        stop once a monster in attack range is found. Strips as near as
+        the one with the target are still matched, so both sides can be compared.
 
-    def get_monsters_in_range(self, top_left, bottom_right):
+        Returns:
+            DetectionBatch of monsters found
+        '''
+        batches = []
+        distance_found = None # distance of strip where first target was found
+        for distance, top_left, bottom_right in self.get_target_query_rois():
+            if distance_found is not None and distance > distance_found:
+                break
+            batches.append(self.get_monsters_in_range(top_left, bottom_right, is_stop_at_target=True))
+            if distance_found is None and np.any(self.get_in_attack_range_mask(batches[-1])):
+                distance_found = distance
+        return DetectionBatch.concat(batches).nms(iou_threshold=0.4)
+
+    def run_match_jobs(self, match_jobs):
+        '''
+        Run (key, (monster_name, template, img, img_pattern)) jobs on match_pool,
+        yield (xs, ys, scores) of each job in job order.
+        At most one job per worker is in flight, so jobs after an early exit never
+        run. Once closed, jobs not started are cancelled, and running ones are
+        waited for and recorded, so they don't keep running into next frame.
+        '''
+        pending = deque() # (key, future) of submitted jobs, in job order
+        try:
+            for key, job in match_jobs:
+                pending.append((key, self.match_pool.submit(self.match_monster_template, *job)))
+                if len(pending) >= self.num_match_workers:
+                    yield pending.popleft()[1].result()
+            while pending:
+                yield pending.popleft()[1].result()
+        finally:
+            for key, future in pending:
+                if not future.cancel():
+                    self.template_scheduler.update(key, len(future.result()[0]) > 0)
+
+    def match_monster_template(self, monster_name, template, img, img_pattern):
+        '''
+        Masked template matching of one monster template on scaled ROI.
+        Can run on worker thread, result buffer is per thread.
+
+        Returns:
+            (xs, ys, scores) of matches, in scaled ROI coordinate
+        '''
+        if img_pattern.shape[0] > img.shape[0] or img_pattern.shape[1] > img.shape[1]:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty, np.zeros(0, dtype=np.float32) # template bigger than ROI
+        res = cv2.matchTemplate(
+                img,
+                img_pattern,
+                cv2.TM_SQDIFF_NORMED,
+                result=get_match_result_buffer(img, img_pattern),
+                mask=template["mask_scaled"])
+        return find_match_peaks(res, self.cfg["monster_detect"]["diff_thres"],
+                                img_pattern.shape[1::-1], self.cfg["monster_detect"]["max_peaks"])
+
+    def get_monsters_in_search_box(self, top_left, bottom_right):
+        '''
+        Detect every monster in search box, only in its walkable bands
+        if walkable mask is enabled, and only in hot cells of spawn heatmap
+        on frames it doesn't run full search
+
+        Returns:
+            DetectionBatch of monsters
+        '''
+        t_start = time.time()
+        mask = self.walkable_mask.mask if self.walkable_mask.enable else None
+        is_full = not self.spawn_heatmap.enable or \
+                  self.spawn_heatmap.is_need_full_search(self.frame_seq)
+        if not is_full:
+            hot_mask = self.spawn_heatmap.get_hot_mask()
+            # Both masks are on map.png's canvas, route images may differ in size
+            mask = hot_mask if mask is None else mask & hot_mask
+
+        if mask is None:
+            monsters = self.get_monsters_in_range(top_left, bottom_right)
+        else:
+            bands = self.walkable_mask.get_bands(top_left, bottom_right,
+                                                 self.loc_player, self.loc_player_global, mask)
+            monsters = DetectionBatch.concat([
+                self.get_monsters_in_range(band_top_left, band_bottom_right)
+                for band_top_left, band_bottom_right in bands
+            ]).nms(iou_threshold=0.4)
+
+        if self.spawn_heatmap.enable:
+            self.spawn_heatmap.update(monsters, self.frame_seq, is_full, time.time() - t_start,
+                                      self.loc_player, self.loc_player_global)
+        return monsters
+
+    def get_monsters_in_range(self, top_left, bottom_right, monster_names=None,
+                              is_stop_at_target=False):
         '''
         get_monsters_in_range
+
+        Template matching runs at perception scale, detected monsters
+        are mapped back to working frame coordinates.
+        monster_names limits matching to templates of these monsters without
+        scheduling and skips health bar detection, for MonsterTracker windows.
+        is_stop_at_target skips remaining templates once a monster in attack range is found.
+
+        Returns:
+            DetectionBatch of monsters
         '''
         x0, y0 = top_left
         x1, y1 = bottom_right
 
-        img_roi = self.img_frame[y0:y1, x0:x1]
+        roi = (x0, y0, x1 - x0, y1 - y0)
+        img_roi = self.ctx.crop(roi)
+
+        # Scaled frame for template matching
+        scale = self.perception_scales["monster"]
+        ctx_scaled = self.ctx.scaled(scale)
+        roi_scaled = scale_box(roi, scale)
 
         # Shift player's location into ROI coordinate system
         px, py = self.loc_player
@@ -760,151 +1097,183 @@ class MapleStoryAutoBot:
         py_in_roi = py - y0
 
         # Define rectangle range around player (in ROI coordinate)
-        char_x_min = max(0, px_in_roi - self.cfg["character"]["width"] // 2)
-        char_x_max = min(img_roi.shape[1], px_in_roi + self.cfg["character"]["width"] // 2)
-        char_y_min = max(0, py_in_roi - self.cfg["character"]["height"] // 2)
-        char_y_max = min(img_roi.shape[0], py_in_roi + self.cfg["character"]["height"] // 2)
-
-        monsters = []
-        for monster_name, monster_imgs in self.monsters_info.items():
-            for img_monster, mask_monster in monster_imgs:
-                if self.cfg["bot"]["mode"] == "patrol":
-                    pass # Don't detect monster using template in patrol mode
-                elif self.cfg["monster_detect"]["mode"] == "template_free":
-                    # Generate mask where pixel is exactly (0,0,0)
-                    black_mask = np.all(img_roi == [0, 0, 0], axis=2).astype(np.uint8) * 255
-                    # cv2.imshow("Black Pixel Mask", black_mask)
+        # Clamp both ends, player can be outside of small ROI like tracker windows
+        char_x_min = min(max(0, px_in_roi - self.cfg["character"]["width"] // 2), img_roi.shape[1])
+        char_x_max = min(max(0, px_in_roi + self.cfg["character"]["width"] // 2), img_roi.shape[1])
+        char_y_min = min(max(0, py_in_roi - self.cfg["character"]["height"] // 2), img_roi.shape[0])
+        char_y_max = min(max(0, py_in_roi + self.cfg["character"]["height"] // 2), img_roi.shape[0])
+
+        batches = [] # DetectionBatch of each matched template
+        match_jobs = [] # (key, (monster_name, template, img, img_pattern)) of "color" and "grayscale" mode
+        img_roi_blur = None # blurred black mask of ROI for "contour_only" mode
+        roi_planes = None # mismatch planes of ROI for "contour_binary" mode
+        # Templates to match on this frame, most likely first
+        if self.cfg["monster_detect"]["mode"] == "dnn":
+            # One model pass detects every monster, no templates to match
+            template_keys = []
+            if self.cfg["bot"]["mode"] != "patrol": # Don't detect monster in patrol mode
+                batches.append(self.dnn_detector.detect(
+                    img_roi, (x0, y0), self.monsters_info.keys() if monster_names is None else monster_names))
+        elif self.cfg["monster_detect"]["mode"] == "template_free":
+            template_keys = self.template_scheduler.keys
+        elif monster_names is not None:
+            template_keys = self.template_scheduler.schedule_monsters(monster_names)
+        else:
+            template_keys = self.template_scheduler.schedule()
+        if self.palette_prefilter.enable and self.cfg["bot"]["mode"] != "patrol" and \
+           self.cfg["monster_detect"]["mode"] not in ("template_free", "dnn"):
+            # Only match monsters whose colors are in ROI
+            monsters_present = self.palette_prefilter.get_present_monsters(img_roi)
+            template_keys = [key for key in template_keys if key[0] in monsters_present]
+        for key in template_keys:
+            monster_name, idx_template = key
+            template = self.monsters_info[monster_name][idx_template]
+            img_monster = template["img"]
+            if self.cfg["bot"]["mode"] == "patrol":
+                pass # Don't detect monster using template in patrol mode
+            elif self.cfg["monster_detect"]["mode"] == "template_free":
+                # Generate mask where pixel is exactly (0,0,0)
+                black_mask = buffer_pool.copy(self.ctx.color_mask((0, 0, 0), roi), "black_mask")
+                # cv2.imshow("Black Pixel Mask", black_mask)
+
+                # Zero out mask inside this region (ignore player's own character)
+                black_mask[char_y_min:char_y_max, char_x_min:char_x_max] = 0
+
+                kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (20, 20))
+                closed_mask = cv2.morphologyEx(black_mask, cv2.MORPH_CLOSE, kernel)
+                # cv2.imshow("Black Mask", closed_mask)
+
+                # draw player character bounding box
+                draw_rectangle(
+                    self.img_frame_debug, (char_x_min+x0, char_y_min+y0),
+                    (self.cfg["character"]["height"], self.cfg["character"]["width"]),
+                    (255, 0, 0), "Character Box"
+                )
+
+                num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(closed_mask, connectivity=8)
+
+                min_area = 1000
+                stats = stats[1:][stats[1:, cv2.CC_STAT_AREA] > min_area]
+                batches = [DetectionBatch(
+                    np.full(len(stats), "", dtype=object),
+                    stats[:, [cv2.CC_STAT_LEFT, cv2.CC_STAT_TOP]] + (x0, y0),
+                    stats[:, [cv2.CC_STAT_HEIGHT, cv2.CC_STAT_WIDTH]],
+                    np.ones(len(stats)))]
+            elif self.cfg["monster_detect"]["mode"] == "contour_only":
+                # Use only black lines contour to detect monsters
+                # ROI mask is the same for all templates, only build it once
+                if img_roi_blur is None:
+                    # Create masks (already grayscale)
+                    mask_roi = buffer_pool.copy(self.ctx.color_mask((0, 0, 0), roi), "black_mask")
 
                     # Zero out mask inside this region (ignore player's own character)
-                    black_mask[char_y_min:char_y_max, char_x_min:char_x_max] = 0
-
-                    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (20, 20))
-                    closed_mask = cv2.morphologyEx(black_mask, cv2.MORPH_CLOSE, kernel)
-                    # cv2.imshow("Black Mask", closed_mask)
-
-                    # draw player character bounding box
-                    draw_rectangle(
-                        self.img_frame_debug, (char_x_min+x0, char_y_min+y0),
-                        (self.cfg["character"]["height"], self.cfg["character"]["width"]),
-                        (255, 0, 0), "Character Box"
-                    )
-
-                    num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(closed_mask, connectivity=8)
-
-                    monsters = []
-                    min_area = 1000
-                    for i in range(1, num_labels):
-                        x, y, w, h, area = stats[i]
-                        if area > min_area:
-                            monsters.append({
-                                "name": "",
-                                "position": (x0+x, y0+y),
-                                "size": (h, w),
-                                "score": 1.0,
-                            })
-                elif self.cfg["monster_detect"]["mode"] == "contour_only":
-                    # Use only black lines contour to detect monsters
-                    # Create masks (already grayscale)
-                    mask_pattern = np.all(img_monster == [0, 0, 0], axis=2).astype(np.uint8) * 255
-                    mask_roi = np.all(img_roi == [0, 0, 0], axis=2).astype(np.uint8) * 255
+                    mask_roi[char_y_min:char_y_max, char_x_min:char_x_max] = 0
+
+                    # Downscale mask after color matching, thin contours stay as gray pixels
+                    mask_roi = resize_by_scale(mask_roi, scale)
+
+                    # Apply Gaussian blur (soften the masks), template is blurred at load time
+                    blur = max(1, round(self.cfg["monster_detect"]["contour_blur"] * scale)) | 1
+                    img_roi_blur = cv2.GaussianBlur(mask_roi, (blur, blur), 0, dst=mask_roi)
+                img_monster_blur = template["contour"]
+
+                # Check template vs ROI size before matching
+                h_roi, w_roi = img_roi_blur.shape[:2]
+                h_temp, w_temp = img_monster_blur.shape[:2]
+
+                if h_temp > h_roi or w_temp > w_roi:
+                    continue # template bigger than roi, skip only this template
+
+                # Perform template matching
+                res = cv2.matchTemplate(img_roi_blur, img_monster_blur, cv2.TM_SQDIFF_NORMED,
+                        result=get_match_result_buffer(img_roi_blur, img_monster_blur))
+
+                # Apply soft threshold, keep local minima only
+                xs, ys, scores = find_match_peaks(res, self.cfg["monster_detect"]["diff_thres"],
+                                                  (w_temp, h_temp), self.cfg["monster_detect"]["max_peaks"])
+
+                batches.append(DetectionBatch.from_matches(
+                    monster_name, xs, ys, scores, img_monster.shape[:2], scale, (x0, y0)))
+                if self.update_template_schedule(key, batches[-1], is_stop_at_target):
+                    break
+            elif self.cfg["monster_detect"]["mode"] == "contour_binary":
+                # Match binary black lines contour, tolerance radius instead of blur
+                # ROI planes are the same for all templates, only build them once
+                if roi_planes is None:
+                    mask_roi = buffer_pool.copy(self.ctx.color_mask((0, 0, 0), roi), "black_mask")
 
                     # Zero out mask inside this region (ignore player's own character)
                     mask_roi[char_y_min:char_y_max, char_x_min:char_x_max] = 0
 
-                    # Apply Gaussian blur (soften the masks)
-                    blur = self.cfg["monster_detect"]["contour_blur"]
-                    img_monster_blur = cv2.GaussianBlur(mask_pattern, (blur, blur), 0)
-                    img_roi_blur = cv2.GaussianBlur(mask_roi, (blur, blur), 0)
-
-                    # Check template vs ROI size before matching
-                    h_roi, w_roi = img_roi_blur.shape[:2]
-                    h_temp, w_temp = img_monster_blur.shape[:2]
-
-                    if h_temp > h_roi or w_temp > w_roi:
-                        return []  # template bigger than roi, skip this matching
-
-                    # Perform template matching
-                    res = cv2.matchTemplate(img_roi_blur, img_monster_blur, cv2.TM_SQDIFF_NORMED)
-
-                    # Apply soft threshold
-                    match_locations = np.where(res <= self.cfg["monster_detect"]["diff_thres"])
-
-                    h, w = img_monster.shape[:2]
-                    for pt in zip(*match_locations[::-1]):
-                        monsters.append({
-                            "name": monster_name,
-                            "position": (pt[0] + x0, pt[1] + y0),
-                            "size": (h, w),
-                            "score": res[pt[1], pt[0]],
-                        })
-                elif self.cfg["monster_detect"]["mode"] == "grayscale":
-                    img_monster_gray = cv2.cvtColor(img_monster, cv2.COLOR_BGR2GRAY)
-                    img_roi_gray = cv2.cvtColor(img_roi, cv2.COLOR_BGR2GRAY)
-                    res = cv2.matchTemplate(
-                            img_roi_gray,
-                            img_monster_gray,
-                            cv2.TM_SQDIFF_NORMED,
-                            mask=mask_monster)
-                    match_locations = np.where(res <= self.cfg["monster_detect"]["diff_thres"])
-                    h, w = img_monster.shape[:2]
-                    for pt in zip(*match_locations[::-1]):
-                        monsters.append({
-                            "name": monster_name,
-                            "position": (pt[0] + x0, pt[1] + y0),
-                            "size": (h, w),
-                            "score": res[pt[1], pt[0]],
-                    })
-                elif self.cfg["monster_detect"]["mode"] == "color":
-                    res = cv2.matchTemplate(
-                            img_roi,
-                            img_monster,
-                            cv2.TM_SQDIFF_NORMED,
-                            mask=mask_monster)
-                    match_locations = np.where(res <= self.cfg["monster_detect"]["diff_thres"])
-                    h, w = img_monster.shape[:2]
-                    for pt in zip(*match_locations[::-1]):
-                        monsters.append({
-                            "name": monster_name,
-                            "position": (pt[0] + x0, pt[1] + y0),
-                            "size": (h, w),
-                            "score": res[pt[1], pt[0]],
-                    })
-                else:
-                    logger.error(f"Unexpected camera localization mode: {self.cfg['monster_detect']['mode']}")
-                    return []
+                    radius = round(self.cfg["monster_detect"]["contour_tolerance"] * scale)
+                    roi_planes = get_match_planes(binarize(mask_roi, scale), radius)
 
-        # Apply Non-Maximum Suppression to monster detection
-        monsters = nms(monsters, iou_threshold=0.4)
+                contour_points = template["contour_points"]
+                interior_points = template["interior_points"]
+                num_points = len(contour_points) + len(interior_points)
+                if num_points == 0:
+                    continue
+                # Score is the fraction of mismatched template points
+                max_mismatch = int(self.cfg["monster_detect"]["diff_thres"] * num_points)
+                h_temp, w_temp = template["mask_scaled"].shape[:2]
+                xs, ys, counts = match_points(roi_planes, contour_points, interior_points,
+                                              (h_temp, w_temp), max_mismatch)
+                if self.cfg["monster_detect"]["max_peaks"] > 0:
+                    xs, ys, counts = select_peaks(xs, ys, counts, (w_temp, h_temp),
+                                                  self.cfg["monster_detect"]["max_peaks"])
+
+                batches.append(DetectionBatch.from_matches(
+                    monster_name, xs, ys, counts / num_points, img_monster.shape[:2], scale, (x0, y0)))
+                if self.update_template_schedule(key, batches[-1], is_stop_at_target):
+                    break
+            elif self.cfg["monster_detect"]["mode"] == "grayscale":
+                # Shared derived images are built here, workers only read them
+                match_jobs.append((key, (monster_name, template, ctx_scaled.gray(roi_scaled),
+                                         template["img_scaled_gray"])))
+            elif self.cfg["monster_detect"]["mode"] == "color":
+                match_jobs.append((key, (monster_name, template, ctx_scaled.crop(roi_scaled),
+                                         template["img_scaled"])))
+            else:
+                logger.error(f"Unexpected camera localization mode: {self.cfg['monster_detect']['mode']}")
+                return DetectionBatch()
+
+        # Run template matches of "color" and "grayscale" mode,
+        # results are merged in job order so detection doesn't depend on thread timing
+        if self.match_pool is None:
+            # Lazily, remaining jobs are never run after early exit
+            match_results = (self.match_monster_template(*job) for _, job in match_jobs)
+        else:
+            match_results = self.run_match_jobs(match_jobs)
+        for (key, (monster_name, template, _, _)), (xs, ys, scores) in zip(match_jobs, match_results):
+            batches.append(DetectionBatch.from_matches(
+                monster_name, xs, ys, scores, template["img"].shape[:2], scale, (x0, y0)))
+            if self.update_template_schedule(key, batches[-1], is_stop_at_target):
+                break
+        match_results.close()
+
+        # Apply Non-Maximum Suppression to monster detection, model detections already are
+        monsters = DetectionBatch.concat(batches)
+        if self.cfg["monster_detect"]["mode"] != "dnn":
+            monsters = monsters.nms(iou_threshold=0.4)
 
         # Detect monster via health bar
-        if self.cfg["monster_detect"]["with_enemy_hp_bar"]:
+        if self.cfg["monster_detect"]["with_enemy_hp_bar"] and monster_names is None:
             # Create color mask for Monsters' HP bar
-            mask = cv2.inRange(img_roi,
-                               np.array(self.cfg["monster_detect"]["hp_bar_color"]),
-                               np.array(self.cfg["monster_detect"]["hp_bar_color"]))
+            mask = self.ctx.color_mask(self.cfg["monster_detect"]["hp_bar_color"], roi)
 
             # Find connected components (each cluster of green pixels)
             num_labels, labels, stats, centroids = \
                 cv2.connectedComponentsWithStats(mask, connectivity=8)
 
-            for i in range(1, num_labels):  # skip background (label 0)
-                x, y, w, h, area = stats[i]
-                if area < 3:  # small noise filter
-                    continue
-
-                # Guess a monster bounding box
-                y += 10
-                x = max(0, x)
-                y = max(0, y)
-                w = 70
-                h = min(img.shape[0] for _, imgs in self.monsters_info.items() for img, _ in imgs)
+            # Skip background (label 0), small noise filter
+            stats = stats[1:][stats[1:, cv2.CC_STAT_AREA] >= 3]
 
-                monsters.append({
-                    "name": "Health Bar",
-                    "position": (x0 + x, y0 + y),
-                    "size": (h, w),
-                    "score": 1.0,
-                })
+            # Guess a monster bounding box below each health bar
+            positions = stats[:, [cv2.CC_STAT_LEFT, cv2.CC_STAT_TOP]] + (0, 10)
+            positions = np.maximum(positions, 0) + (x0, y0)
+            sizes = np.tile((self.min_mob_height, 70), (len(stats), 1))
+            monsters = DetectionBatch.concat([monsters, DetectionBatch(
+                np.full(len(stats), "Health Bar", dtype=object), positions, sizes, np.ones(len(stats)))])
 
         # Debug
         # Draw attack detection range
@@ -927,39 +1296,52 @@ class MapleStoryAutoBot:
 
         return monsters
 
-    def get_img_frame(self):
+    def get_img_frame(self, is_wait_new_frame=False):
         '''
         get_img_frame
+
+        If is_wait_new_frame is True, block until the capturor publishes a frame
+        that hasn't been processed yet. Return None if no new frame arrived
+        within system.frame_wait_timeout.
         '''
-        # Get window game raw frame
-        self.frame = self.capture.get_frame()
-        if self.frame is None:
+        # Get window game raw frame (read-only view, no copy)
+        if is_wait_new_frame and self.args.test_image == "":
+            frame = self.capture.wait_for_new_frame(
+                        self.frame_seq, self.cfg["system"]["frame_wait_timeout"])
+            if frame is None:
+                # No new frame, skip instead of processing the same frame twice
+                self.profiler.count("Duplicate Frames")
+                return
+            # Frames published while we were busy are never processed
+            if self.frame_seq > 0:
+                self.profiler.count("Dropped Frames", frame.seq - self.frame_seq - 1)
+        else:
+            frame = self.capture.get_latest_frame()
+        if frame is None:
             logger.warning("Failed to capture game frame.")
             return
+        self.frame = frame.img
+        self.frame_seq = frame.seq
+        self.t_frame_capture = frame.timestamp
+
+        # Title bar cut, size check and resize to WINDOW_WORKING_SIZE
+        # are already done by the capture thread
+        if frame.img_working is None:
+            logger.error(frame.error)
+            return
 
-        # Cut the title bar and resize raw frame to (1296, 759)
-        frame_no_title = self.frame[self.cfg["game_window"]["title_bar_height"]:, :]
-
-        # Make sure the window ratio is as expected
-        if self.args.test_image != "":
-            pass # Disable size check if using test image for debugging
-        elif self.cfg["bot"]["mode"] == "aux":
-            if not is_img_16_to_9(frame_no_title, self.cfg): # Aux mode allow 16:9 resolution
-                text = f"Unexpeted window size: {frame_no_title.shape[:2]} (expect window ratio 16:9)\n"
-                text += "Please use windowed mode & smallest resolution."
-                logger.error(text)
-                return
-        else:
-            # Other mode only allow specific resolution
-            if self.cfg["game_window"]["size"] != frame_no_title.shape[:2]:
-                text = f"Unexpeted window size: {frame_no_title.shape[:2]} "\
-                       f"(expect {self.cfg['game_window']['size']})\n"
-                text += "Please use windowed mode & smallest resolution."
-                logger.error(text)
+        # Frame may be partially normalized for another state,
+        # only the main loop knows what current state needs
+        rois_needed = self.get_rois_needed() if is_wait_new_frame else None
+        if not is_covered(frame.rois, rois_needed):
+            frame = self.capture.complete_frame(frame.seq)
+            if frame is None:
+                logger.warning("Captured frame is overwritten before completed.")
                 return
+            self.profiler.count("Completed Frames")
+        self.frame_rois = frame.rois
 
-        return cv2.resize(frame_no_title, WINDOW_WORKING_SIZE,
-                   interpolation=cv2.INTER_NEAREST)
+        return frame.img_working
 
     def is_player_stuck(self):
         """
@@ -1003,7 +1385,13 @@ class MapleStoryAutoBot:
         if self.img_frame is None:
             logger.error("[screenshot_img_frame] Failed, game window is not available")
         else:
-            screenshot(self.img_frame, "img_frame")
+            img_frame = self.img_frame
+            if self.frame_rois is not None:
+                # Only some regions are normalized, complete the whole frame
+                frame = self.capture.complete_frame(self.frame_seq)
+                if frame is not None:
+                    img_frame = frame.img_working
+            screenshot(img_frame, "img_frame")
 
         if self.img_frame_debug is None:
             pass
@@ -1050,7 +1438,7 @@ class MapleStoryAutoBot:
 
         # Find mask of matching pixels
         roi = self.img_route[y_min:y_max, x_min:x_max]
-        mask = np.all(roi == self.cfg["edge_teleport"]["color_code"], axis=2)
+        mask = color_mask(roi, self.cfg["edge_teleport"]["color_code"])
         coords = np.column_stack(np.where(mask))
 
         # No edge pixel
@@ -1203,7 +1591,8 @@ class MapleStoryAutoBot:
 
         # Find the 'create party' button
         loc_enable, score_enable, _ = find_pattern_sqdiff(
-                        self.img_frame, self.img_create_party_enable)
+                        self.img_frame, self.img_create_party_enable,
+                        pyramid=self.cfg["pyramid_search"])
 
         lang = self.cfg["system"]["language"]
         thres = self.cfg['party_red_bar'][f'create_party_button_{lang}_thres']
@@ -1247,7 +1636,7 @@ class MapleStoryAutoBot:
                     logger.info("Waiting for login button to show up...")
             except Exception as e:
                 logger.warning(f"Exception occurred while waiting for login button: {e}")
-                if not is_mac():
+                if self.capture.can_activate_window:
                     resize_window(window_title, width=1296, height=759)
                 logger.info("Retrying login button detection...")
 
@@ -1286,40 +1675,39 @@ class MapleStoryAutoBot:
         # Terminate health monitor
         if self.health_monitor is not None:
             self.health_monitor.stop()
+        # Terminate template matching workers
+        if self.match_pool is not None:
+            self.match_pool.shutdown(wait=False, cancel_futures=True)
+        # Keep spawn heatmap of this session
+        if self.spawn_heatmap is not None:
+            self.spawn_heatmap.save()
         self.is_terminated = True
         logger.info(f"[terminate_threads] Terminated all threads")
 
-    def get_attack_direction(self, monster_left, monster_right):
+    def get_attack_direction(self, idx_left, idx_right):
         '''
         get_attack_direction
+
+        idx_left, idx_right: index of nearest monster in self.monsters
+                             for each facing direction, -1 if none
         '''
-        # Compute distance for left
-        distance_left = float('inf')
-        if monster_left is not None:
-            mx, my = monster_left["position"]
-            mw, mh = monster_left["size"]
-            center_left = (mx + mw // 2, my + mh // 2)
-            distance_left = abs(center_left[0] - self.loc_player[0]) + \
-                            abs(center_left[1] - self.loc_player[1])
-        # Compute distance for right
-        distance_right = float('inf')
-        if monster_right is not None:
-            mx, my = monster_right["position"]
-            mw, mh = monster_right["size"]
-            center_right = (mx + mw // 2, my + mh // 2)
-            distance_right = abs(center_right[0] - self.loc_player[0]) + \
-                            abs(center_right[1] - self.loc_player[1])
+        # Center and distance to player of both nearest monsters at once
+        centers = self.monsters.centers[[idx_left, idx_right]]
+        distances = np.abs(centers - self.loc_player).sum(axis=1)
+        monster_left = None if idx_left < 0 else centers[0]
+        monster_right = None if idx_right < 0 else centers[1]
+        distance_left = float('inf') if monster_left is None else float(distances[0])
+        distance_right = float('inf') if monster_right is None else float(distances[1])
+
         # Choose attack direction and nearest monster
         attack_direction = None
         # nearest_monster = None
 
         # Additional validation: check if monster is actually on the correct side
-        def is_monster_on_correct_side(monster, direction):
-            if monster is None:
+        def is_monster_on_correct_side(monster_center, direction):
+            if monster_center is None:
                 return False
-            mx, my = monster["position"]
-            mw, mh = monster["size"]
-            monster_center_x = mx + mw // 2
+            monster_center_x = monster_center[0]
             player_x = self.loc_player[0]
 
             if direction == "left":
@@ -1357,8 +1745,8 @@ class MapleStoryAutoBot:
 
         # Debug attack direction selection
         if monster_left is not None or monster_right is not None:
-            left_side_ok = is_monster_on_correct_side(monster_left, "left") if monster_left else False
-            right_side_ok = is_monster_on_correct_side(monster_right, "right") if monster_right else False
+            left_side_ok = is_monster_on_correct_side(monster_left, "left")
+            right_side_ok = is_monster_on_correct_side(monster_right, "right")
             debug_text = f"L:{distance_left:.0f}({left_side_ok}) R:{distance_right:.0f}({right_side_ok}) Dir:{attack_direction}"
             cv2.putText(self.img_frame_debug, debug_text,
                         (10, 450), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
@@ -1489,13 +1877,36 @@ class MapleStoryAutoBot:
             cooldown = self.cfg["directional_attack"]["cooldown"]
         else:
             raise RuntimeError(f"Unsupported attack mode: {self.cfg['bot']['attack']}")
+
+        # Attack can't be issued during cooldown, no need to look for monsters
+        if self.cfg["monster_detect"]["skip_on_cooldown"] and \
+           time.time() - self.t_last_attack <= cooldown:
+            self.monsters = DetectionBatch() # Don't keep last frame's monsters
+            return
+
         x0 = max(0                      , self.loc_player[0] - dx)
         x1 = min(self.img_frame.shape[1], self.loc_player[0] + dx)
         y0 = max(0                      , self.loc_player[1] - dy)
         y1 = min(self.img_frame.shape[0], self.loc_player[1] + dy)
 
         # Get monsters in the search box
-        self.monsters = self.get_monsters_in_range((x0, y0), (x1, y1))
+        if self.monster_tracker.enable:
+            windows = self.monster_tracker.get_windows(self.frame_seq, (x0, y0, x1, y1))
+            if windows is None:
+                monsters = self.get_monsters_in_search_box((x0, y0), (x1, y1))
+            else:
+                # Only match tracked monsters around their predicted positions
+                monsters = DetectionBatch.concat([
+                    self.get_monsters_in_range(top_left, bottom_right, monster_names=(name,))
+                    for name, top_left, bottom_right in windows
+                ]).nms(iou_threshold=0.4)
+            self.monsters = self.monster_tracker.update(monsters, self.frame_seq,
+                                                        is_full=windows is None)
+        elif self.cfg["monster_detect"]["target_query"] and not self.is_show_debug_window:
+            # Only look for a target, debug window shows every monster in search box
+            self.monsters = self.query_monsters_in_attack_range()
+        else:
+            self.monsters = self.get_monsters_in_search_box((x0, y0), (x1, y1))
 
         # Check if no mob to attack
         if len(self.monsters) == 0:
@@ -1509,16 +1920,19 @@ class MapleStoryAutoBot:
 
         elif self.cfg["bot"]["attack"] == "directional":
             # Get nearest monster to player
-            monster_left  = self.get_nearest_monster(is_left = True)
-            monster_right = self.get_nearest_monster(is_left = False)
+            idx_left  = self.get_nearest_monster(is_left = True)
+            idx_right = self.get_nearest_monster(is_left = False)
             # Determine attack direction
-            attack_direction = self.get_attack_direction(monster_left, monster_right)
+            attack_direction = self.get_attack_direction(idx_left, idx_right)
             # Attack Command
             if time.time() - self.t_last_attack > cooldown and attack_direction is not None:
                 self.cmd_action = "attack"
                 self.t_last_attack = time.time()
                 # Set up attack direction
                 self.cmd_move_x = attack_direction
+                # Remember target track for hysteresis
+                idx_target = idx_left if attack_direction == "left" else idx_right
+                self.target_id = int(self.monsters.ids[idx_target])
 
     def update_cmd_by_random(self):
         '''
@@ -1542,6 +1956,16 @@ class MapleStoryAutoBot:
         '''
         # Start profiler for performance debugging
         self.profiler.start()
+        self.profiler.count("Buffer Allocations", buffer_pool.new_frame())
+        num_hits, num_misses = self.dirty_map.new_frame()
+        self.profiler.count("Dirty Region Hits", num_hits)
+        self.profiler.count("Dirty Region Misses", num_misses)
+        num_matched, num_skipped = self.template_scheduler.new_frame()
+        self.profiler.count("Template Matches", num_matched)
+        self.profiler.count("Template Skips", num_skipped)
+        num_hits, num_skips = self.palette_prefilter.new_frame()
+        self.profiler.count("Palette Hits", num_hits)
+        self.profiler.count("Palette Skips", num_skips)
 
         # Check if need viz window
         self.is_show_debug_window = self.is_need_show_debug_window
@@ -1552,21 +1976,27 @@ class MapleStoryAutoBot:
         ###########################
         ### Image Preprocessing ###
         ###########################
-        # Get game window frame
-        img_frame = self.get_img_frame()
+        # Wait for a new game window frame
+        img_frame = self.get_img_frame(is_wait_new_frame=True)
         if img_frame is None:
-            if not is_mac():
+            if self.capture.can_activate_window:
                 activate_game_window(self.capture.window_title)
             return -1 # Wait for game window to be ready
         else:
             self.img_frame = img_frame
+            self.num_frames += 1
+            self.template_scheduler.next_turn()
 
-        # Grayscale game window
-        self.img_frame_gray = cv2.cvtColor(self.img_frame, cv2.COLOR_BGR2GRAY)
+        # Derived images (grayscale, HSV, masks) are computed on demand by detectors
+        self.ctx = FrameContext(self.img_frame, self.frame_seq)
+        # Find tiles changed since last frame
+        self.dirty_map.update(self.img_frame, self.frame_seq, self.frame_rois)
 
         # Image for debug viz
+        # Alternate two buffers, main thread may still be showing the last one
         if self.is_show_debug_window:
-            self.img_frame_debug = self.img_frame.copy()
+            self.img_frame_debug = buffer_pool.copy(
+                self.img_frame, f"img_frame_debug_{self.num_frames % 2}")
 
         # Get current route image
         if self.cfg["bot"]["mode"] == "normal":
@@ -1574,117 +2004,136 @@ class MapleStoryAutoBot:
             if self.is_show_debug_window:
                 self.img_route_debug = cv2.cvtColor(self.img_route, cv2.COLOR_RGB2BGR)
 
+        # Update health monitor with current frame
+        roi_ui = (0, self.cfg["ui_coords"]["ui_y_start"], self.ctx.w, self.ctx.h)
+        is_ui_unchanged, _ = self.dirty_map.lookup("health_monitor")
+        if not is_ui_unchanged:
+            self.dirty_map.store("health_monitor", [roi_ui], None)
+        self.health_monitor.update_frame(self.ctx.crop(roi_ui), self.ctx.gray(roi_ui),
+                                         is_changed=not is_ui_unchanged)
+
         self.profiler.mark("Image Preprocessing")
 
         ###################
         ### Get Minimap ###
         ###################
-        # Get minimap coordinate and size on game window
-        minimap_result = get_minimap_loc_size(self.img_frame)
-        if minimap_result is None:
-            if time.time() - self.t_last_minimap_update > 30:
-                # Unable to get minimap for 30 seconds -> assume it's login screen
-                loc_login_button = self.get_login_button_location()
-                if loc_login_button:
-                    logger.info("Found login button on screen. Proceed to login.")
-                    click_in_game_window(self.capture.window_title,
-                                         loc_login_button)
-                    time.sleep(3)
-                    click_in_game_window(self.capture.window_title,
-                                         self.cfg["ui_coords"]["select_character"])
-                    time.sleep(2)
-        else:
-            x, y, w, h = minimap_result
-            # Shrink minimap boardary by one pixel to avoid pixel leaking to minimap
-            x += 1
-            y += 1
-            w -= 2
-            h -= 2
-            # update minimap image
-            self.loc_minimap = (x, y)
-            self.img_minimap = self.img_frame[y:y+h, x:x+w]
-            self.t_last_minimap_update = time.time()
+        # Minimap and player location are not needed in some states, e.g. solving rune
+        state = self.fsm.state.name
+        if self.roi_planner.is_active("minimap", state):
+            # Get minimap coordinate and size on game window
+            # Reuse last result if the minimap border didn't change
+            is_hit, minimap_result = self.dirty_map.lookup("minimap")
+            if not is_hit:
+                # Border tiles also cover minimap content, check the border itself
+                # before searching the whole frame
+                if minimap_result is None or \
+                   not is_minimap_border_intact(self.img_frame, minimap_result):
+                    minimap_result = get_minimap_loc_size(self.img_frame)
+                self.dirty_map.store("minimap", get_box_border_rois(minimap_result),
+                                     minimap_result)
+            if minimap_result is None:
+                if time.time() - self.t_last_minimap_update > 30:
+                    # Unable to get minimap for 30 seconds -> assume it's login screen
+                    loc_login_button = self.get_login_button_location()
+                    if loc_login_button:
+                        logger.info("Found login button on screen. Proceed to login.")
+                        click_in_game_window(self.capture.window_title,
+                                             loc_login_button)
+                        time.sleep(3)
+                        click_in_game_window(self.capture.window_title,
+                                             self.cfg["ui_coords"]["select_character"])
+                        time.sleep(2)
+            else:
+                x, y, w, h = minimap_result
+                # Shrink minimap boardary by one pixel to avoid pixel leaking to minimap
+                x += 1
+                y += 1
+                w -= 2
+                h -= 2
+                # update minimap image, copied as it's kept after frame's ring slot is reused
+                self.loc_minimap = (x, y)
+                self.img_minimap = self.img_frame[y:y+h, x:x+w].copy()
+                self.t_last_minimap_update = time.time()
 
         self.profiler.mark("Get Minimap Location and Size")
 
-        # Update health monitor with current frame
-        self.health_monitor.update_frame(self.img_frame[self.cfg["ui_coords"]["ui_y_start"]:, :])
-
         #################################
         ### Player Location Detection ###
         #################################
-        # Get player location in game window
-        if self.cfg["nametag"]["enable"]:
-            loc_player = self.get_player_location_by_nametag()
-        else:
-            loc_player, loc_party_red_bar = self.get_player_location_by_party_red_bar()
-            if loc_party_red_bar is not None:
-                self.loc_party_red_bar = loc_party_red_bar
-
-        # Update player location
-        if loc_player is not None:
-            # Check if character is on ladder
-            dx = abs(loc_player[0] - self.loc_player[0])
-            dy = abs(loc_player[1] - self.loc_player[1])
-            if self.is_on_ladder:
-                if dx > 3: # Leave ladder if there is horizontal move
-                    self.is_on_ladder = False
+        if self.roi_planner.is_active("player", state):
+            # Get player location in game window
+            if self.cfg["nametag"]["enable"]:
+                loc_player = self.get_player_location_by_nametag()
             else:
-                if dx < 3 and dy != 0:
-                    self.is_on_ladder = True
-            # logger.info((self.is_on_ladder, dx, dy))
-            # Update player location
-            self.loc_player = loc_player
-
-        # Draw player center for debugging
-        cv2.circle(self.img_frame_debug,
-                self.loc_player, radius=3,
-                color=(0, 0, 255), thickness=-1)
-
-        # Get player location on minimap
-        loc_player_minimap = get_player_location_on_minimap(
-                                self.img_minimap,
-                                minimap_player_color=self.cfg["minimap"]["player_color"])
-        if loc_player_minimap:
-            self.loc_player_minimap = loc_player_minimap
-
-        # Get other player location on minimap
-        loc_other_players = get_all_other_player_locations_on_minimap(
-                                self.img_minimap,
-                                self.cfg['minimap']['other_player_color'])
-        # Debug
-        # if self.is_first_frame:
-        #     logger.info("Running minimap color analysis...")
-        #     debug_minimap_colors(self.img_minimap, other_player_color)
+                loc_player, loc_party_red_bar = self.get_player_location_by_party_red_bar()
+                if loc_party_red_bar is not None:
+                    self.loc_party_red_bar = loc_party_red_bar
 
-        # Get player location on global map
-        if self.cfg["bot"]["mode"] in ["patrol", "aux"]:
-            self.loc_player_global = self.loc_player_minimap
-        else:
-            self.loc_player_global = self.get_player_location_on_global_map()
+            # Update player location
+            if loc_player is not None:
+                # Check if character is on ladder
+                dx = abs(loc_player[0] - self.loc_player[0])
+                dy = abs(loc_player[1] - self.loc_player[1])
+                if self.is_on_ladder:
+                    if dx > 3: # Leave ladder if there is horizontal move
+                        self.is_on_ladder = False
+                else:
+                    if dx < 3 and dy != 0:
+                        self.is_on_ladder = True
+                # logger.info((self.is_on_ladder, dx, dy))
+                # Update player location
+                self.loc_player = loc_player
+
+            # Draw player center for debugging
+            cv2.circle(self.img_frame_debug,
+                    self.loc_player, radius=3,
+                    color=(0, 0, 255), thickness=-1)
+
+            # Get player location on minimap
+            loc_player_minimap = get_player_location_on_minimap(
+                                    self.img_minimap,
+                                    minimap_player_color=self.cfg["minimap"]["player_color"])
+            if loc_player_minimap:
+                self.loc_player_minimap = loc_player_minimap
+
+            # Get other player location on minimap
+            loc_other_players = get_all_other_player_locations_on_minimap(
+                                    self.img_minimap,
+                                    self.cfg['minimap']['other_player_color'])
+            # Debug
+            # if self.is_first_frame:
+            #     logger.info("Running minimap color analysis...")
+            #     debug_minimap_colors(self.img_minimap, other_player_color)
+
+            # Get player location on global map
+            if self.cfg["bot"]["mode"] in ["patrol", "aux"]:
+                self.loc_player_global = self.loc_player_minimap
+            else:
+                self.loc_player_global = self.get_player_location_on_global_map()
 
         self.profiler.mark("Player Location Detection")
 
         ######################
         ### Change Channel ###
         ######################
-        if self.cfg['channel_change']['enable'] and \
-            self.is_need_change_channel(loc_other_players):
-            self.kb.set_command("none none none")
-            self.kb.release_all_key()
-            self.kb.disable()
-            time.sleep(1)
-            self.channel_change()
-            self.red_dot_center_prev = None
-            return 0
-
-        if self.is_time_to_change_channel():
-            self.kb.set_command("none none none")
-            self.kb.release_all_key()
-            self.kb.disable()
-            time.sleep(1)
-            self.channel_change()
-            return 0
+        if self.roi_planner.is_active("player", state):
+            if self.cfg['channel_change']['enable'] and \
+                self.is_need_change_channel(loc_other_players):
+                self.kb.set_command("none none none")
+                self.kb.release_all_key()
+                self.kb.disable()
+                time.sleep(1)
+                self.channel_change()
+                self.red_dot_center_prev = None
+                return 0
+
+            if self.is_time_to_change_channel():
+                self.kb.set_command("none none none")
+                self.kb.release_all_key()
+                self.kb.disable()
+                time.sleep(1)
+                self.channel_change()
+                return 0
 
         self.profiler.mark("Change Channel")
 
@@ -1715,6 +2164,9 @@ class MapleStoryAutoBot:
         ######################
         self.fsm.do_state_stuff()
 
+        # Only normalize the regions next state needs from next frame
+        self.capture.set_rois(self.get_rois_needed())
+
         self.is_first_frame = False
 
         self.profiler.mark("State per-frame behavior")
@@ -1759,7 +2211,7 @@ class MapleStoryAutoBot:
         Only run when call autobot from UI framework and AutoBotController
         '''
         # Make sure player is in party
-        if not is_mac():
+        if self.capture.can_activate_window:
             activate_game_window(self.capture.window_title)
             time.sleep(0.3)
             self.ensure_is_in_party()
@@ -1781,17 +2233,26 @@ class MapleStoryAutoBot:
                     img_route_debug_emit = self.img_route_debug.copy()
                     self.image_debug_signal.emit(img_frame_debug_emit)
                     self.route_map_viz_signal.emit(img_route_debug_emit)
+            elif self.args.replay != '' and self.capture.is_finished:
+                # Replay is over, print final profiling result and stop
+                logger.info("[MapleStoryAutoBot] Replay finished")
+                if self.cfg["profiler"]["enable"]:
+                    logger.info('\n' + self.profiler.report())
+                self.terminate_threads()
+                break
             else:
                 pass
                 # logger.warning("Skipped debug window update due to invalid frame.")
 
             self.is_frame_done = True
 
-            # Cap FPS to save system resource
-            frame_duration = time.time() - t_start
-            target_duration = 1.0 / self.cfg["system"]["fps_limit_main"]
-            if frame_duration < target_duration:
-                time.sleep(target_duration - frame_duration)
+            # Loop is paced by new frame arrival in run_once().
+            # A static test image never produces new frame, cap FPS instead
+            if self.args.test_image != "":
+                frame_duration = time.time() - t_start
+                target_duration = 1.0 / self.cfg["system"]["fps_limit_main"]
+                if frame_duration < target_duration:
+                    time.sleep(target_duration - frame_duration)
 
 def main(args):
     '''
@@ -1842,10 +2303,13 @@ def main(args):
     if args.record:
         mapleStoryAutoBot.start_record()
 
-    kb_listener = KeyBoardListener(is_autobot=True)
-    kb_listener.register_func_key_handler('f1', mapleStoryAutoBot.kb.toggle_enable)
-    kb_listener.register_func_key_handler('f2', mapleStoryAutoBot.screenshot_img_frame)
-    kb_listener.register_func_key_handler('f12', mapleStoryAutoBot.terminate_threads)
+    # Function keys need a desktop session, not available with headless input
+    if resolve_input_backend(cfg["system"]["input_backend"]) != "headless":
+        from src.input.KeyBoardListener import KeyBoardListener
+        kb_listener = KeyBoardListener(is_autobot=True)
+        kb_listener.register_func_key_handler('f1', mapleStoryAutoBot.kb.toggle_enable)
+        kb_listener.register_func_key_handler('f2', mapleStoryAutoBot.screenshot_img_frame)
+        kb_listener.register_func_key_handler('f12', mapleStoryAutoBot.terminate_threads)
 
     # While loop
     while not mapleStoryAutoBot.is_terminated:
@@ -1859,7 +2323,9 @@ def main(args):
             if mapleStoryAutoBot.img_route_debug is not None:
                 cv2.imshow("Route Map Debug", mapleStoryAutoBot.img_route_debug)
 
-        cv2.waitKey(1)
+        # Headless OpenCV build doesn't support GUI functions
+        if mapleStoryAutoBot.is_show_debug_window:
+            cv2.waitKey(1)
 
         time.sleep(0.01)
 
@@ -1868,7 +2334,8 @@ def main(args):
     #########################
     mapleStoryAutoBot.terminate_threads() # Terminate all threads
 
-    cv2.destroyAllWindows()
+    if not args.disable_viz:
+        cv2.destroyAllWindows()
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -1909,6 +2376,26 @@ if __name__ == '__main__':
         help="Pass in image in test/XXX.png"
     )
 
+    parser.add_argument(
+        '--replay',
+        default="",
+        help="Replay recorded frames instead of capturing game window. "
+             "Accept PNG directory, video file or raw .npy recording"
+    )
+
+    parser.add_argument(
+        '--replay_speed',
+        type=float,
+        default=1.0,
+        help="Replay speed, 1.0 = recorded timing, 0 = as fast as possible"
+    )
+
+    parser.add_argument(
+        '--replay_loop',
+        action="store_true",
+        help="Restart replay from the first frame when it ends"
+    )
+
     parser.add_argument(
         '--init_state',
         default="",
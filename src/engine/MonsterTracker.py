@@ -0,0 +1,202 @@
+'''
+MonsterTracker
+Track detected monsters across frames, so full monster detection over the
+whole search box only runs every few frames. In between, each track is only
+matched again inside a small window around its predicted position.
+'''
+# Library import
+import numpy as np
+
+# Local import
+from src.engine.DetectionBatch import DetectionBatch
+from src.utils.box_geometry import to_boxes, get_centers, get_iou_matrix
+
+class MonsterTracker:
+    '''
+    MonsterTracker
+
+    Tracks are associated with detections of the same monster name by IoU
+    or center distance, and predicted with constant velocity per frame.
+    Each track keeps a stable id, which is put in DetectionBatch.ids.
+    Detections without templates (health bars) aren't tracked.
+    '''
+    def __init__(self, monsters_info, cfg):
+        self.enable = cfg["enable"]
+        self.redetect_interval = cfg["redetect_interval"] # full detection at least every N frames
+        self.window_margin = cfg["window_margin"] # margin around predicted box of local window
+        self.iou_thres = cfg["iou_thres"] # associate if IoU >= iou_thres
+        self.max_center_dist = cfg["max_center_dist"] # or center distance <= max_center_dist
+        self.max_misses = cfg["max_misses"] # drop track after more misses in a row
+        self.max_lost_ratio = cfg["max_lost_ratio"] # full detection if more tracks were lost
+        self.velocity_smooth = cfg["velocity_smooth"] # weight of latest measured velocity
+        self.target_hysteresis = cfg["target_hysteresis"] # distance advantage of current target
+        # Largest template side of each monster with templates to re-match
+        self.template_sizes = {name: max(max(t["img"].shape[:2]) for t in templates)
+                               for name, templates in monsters_info.items()}
+        self.next_id = 0 # id of next new track
+        self.reset()
+
+    def reset(self):
+        '''
+        Drop all tracks, next frame runs full detection
+        '''
+        self.tracks = DetectionBatch() # last matched detection of each track
+        self.locs = np.zeros((0, 2)) # (x, y) top-left of each track at seq_last
+        self.velocities = np.zeros((0, 2)) # (vx, vy) pixels per frame
+        self.misses = np.zeros(0, dtype=np.int64) # frames in a row track wasn't matched
+        self.seq_last = None # frame sequence number of last update()
+        self.seq_full = None # frame sequence number of last full detection
+
+    def is_need_full_detection(self, seq):
+        '''
+        Check if frame seq needs full detection instead of local matching
+        '''
+        if not self.enable or len(self.tracks) == 0 or self.seq_full is None:
+            return True
+        # Tracks are stale, or due for periodic full detection
+        if seq - self.seq_last > self.redetect_interval or \
+           seq - self.seq_full >= self.redetect_interval:
+            return True
+        # Too many tracks were lost by local matching
+        return np.count_nonzero(self.misses > 0) > self.max_lost_ratio * len(self.tracks)
+
+    def get_predicted_locs(self, seq):
+        '''
+        Predicted top-left of each track at frame seq
+        '''
+        if self.seq_last is None:
+            return self.locs
+        return self.locs + self.velocities * (seq - self.seq_last)
+
+    def get_windows(self, seq, bounds):
+        '''
+        Local search windows around predicted tracks, clipped to search box bounds (x0, y0, x1, y1)
+
+        Returns:
+            list of (monster_name, top_left, bottom_right),
+            None if frame seq should run full detection on bounds instead
+        '''
+        if self.is_need_full_detection(seq):
+            return None
+        x0, y0, x1, y1 = bounds
+        centers = get_centers(to_boxes(self.get_predicted_locs(seq), self.tracks.sizes))
+        windows = []
+        for name, (cx, cy) in zip(self.tracks.names, centers.astype(int).tolist()):
+            # Square window fits every template of the monster
+            r = self.template_sizes[name] // 2 + self.window_margin
+            top_left = (max(x0, cx - r), max(y0, cy - r))
+            bottom_right = (min(x1, cx + r), min(y1, cy + r))
+            if top_left[0] < bottom_right[0] and top_left[1] < bottom_right[1]:
+                windows.append((name, top_left, bottom_right))
+
+        # Many tracks, matching the whole search box once is cheaper
+        area = sum((br[0] - tl[0]) * (br[1] - tl[1]) for _, tl, br in windows)
+        if area >= (x1 - x0) * (y1 - y0):
+            return None
+        return windows
+
+    def update(self, detections, seq, is_full):
+        '''
+        Associate detections of frame seq with tracks.
+        New tracks are only started by full detection.
+
+        Returns:
+            DetectionBatch of tracks matched on this frame with their ids,
+            plus untracked detections of full detection
+        '''
+        if not self.enable:
+            return detections
+
+        is_trackable = np.array([name in self.template_sizes for name in detections.names], dtype=bool)
+        untracked = detections.select(~is_trackable)
+        detections = detections.select(is_trackable)
+
+        locs_pred = self.get_predicted_locs(seq)
+        dt = 1 if self.seq_last is None else max(1, seq - self.seq_last)
+        idx_track, idx_det = self.associate(locs_pred, detections)
+
+        # Update matched tracks, constant velocity smoothed over frames
+        locs = locs_pred.copy()
+        velocities = self.velocities.copy()
+        misses = self.misses + 1
+        if len(idx_track) > 0:
+            meas = detections.positions[idx_det].astype(np.float64)
+            v_meas = (meas - self.locs[idx_track]) / dt
+            velocities[idx_track] += self.velocity_smooth * (v_meas - velocities[idx_track])
+            locs[idx_track] = meas
+            misses[idx_track] = 0
+        tracks = self.tracks.select(np.arange(len(self.tracks)))
+        tracks.positions[idx_track] = detections.positions[idx_det]
+        tracks.sizes[idx_track] = detections.sizes[idx_det]
+        tracks.scores[idx_track] = detections.scores[idx_det]
+
+        # Start new tracks from unmatched detections of full detection
+        if is_full:
+            is_new = np.ones(len(detections), dtype=bool)
+            is_new[idx_det] = False
+            new = detections.select(is_new)
+            new.ids = np.arange(self.next_id, self.next_id + len(new), dtype=np.int64)
+            self.next_id += len(new)
+            tracks = DetectionBatch.concat([tracks, new])
+            locs = np.concatenate((locs, new.positions.astype(np.float64)))
+            velocities = np.concatenate((velocities, np.zeros((len(new), 2))))
+            misses = np.concatenate((misses, np.zeros(len(new), dtype=np.int64)))
+            self.seq_full = seq
+
+        # Drop tracks missed too many frames in a row
+        is_alive = misses <= self.max_misses
+        self.tracks = tracks.select(is_alive)
+        self.locs = locs[is_alive]
+        self.velocities = velocities[is_alive]
+        self.misses = misses[is_alive]
+        self.seq_last = seq
+
+        matched = self.tracks.select(self.misses == 0)
+        return DetectionBatch.concat([matched, untracked]) if is_full else matched
+
+    def associate(self, locs_pred, detections):
+        '''
+        Greedily pair predicted tracks with detections of the same monster,
+        highest IoU first, then nearest center
+
+        Returns:
+            (idx_track, idx_det) of matched pairs
+        '''
+        empty = np.zeros(0, dtype=np.intp)
+        if len(self.tracks) == 0 or len(detections) == 0:
+            return empty, empty
+
+        boxes_pred = to_boxes(locs_pred, self.tracks.sizes)
+        iou = get_iou_matrix(boxes_pred, detections.boxes)
+        dist = np.abs(get_centers(boxes_pred)[:, None] - detections.centers[None]).sum(axis=2)
+        is_valid = (self.tracks.names[:, None] == detections.names[None]) & \
+                   ((iou >= self.iou_thres) | (dist <= self.max_center_dist))
+
+        rows, cols = np.nonzero(is_valid)
+        order = np.lexsort((dist[rows, cols], -iou[rows, cols]))
+        is_track_free = np.ones(len(self.tracks), dtype=bool)
+        is_det_free = np.ones(len(detections), dtype=bool)
+        idx_track, idx_det = [], []
+        for i, j in zip(rows[order].tolist(), cols[order].tolist()):
+            if is_track_free[i] and is_det_free[j]:
+                is_track_free[i] = is_det_free[j] = False
+                idx_track.append(i)
+                idx_det.append(j)
+        return np.array(idx_track, dtype=np.intp), np.array(idx_det, dtype=np.intp)
+
+    def get_target(self, monsters, point, is_valid, target_id):
+        '''
+        Index of monster to attack among is_valid, -1 if none.
+        Nearest monster to point, but keep the current target track
+        unless another monster is nearer by more than target_hysteresis.
+        '''
+        idx = monsters.get_nearest(point, is_valid)
+        if idx < 0 or target_id < 0:
+            return idx
+        idx_target = np.flatnonzero(is_valid & (monsters.ids == target_id))
+        if len(idx_target) == 0:
+            return idx
+        distances = np.abs(monsters.centers - np.asarray(point)).sum(axis=1)
+        if distances[idx_target[0]] <= distances[idx] + self.target_hysteresis:
+            return int(idx_target[0])
+        return idx
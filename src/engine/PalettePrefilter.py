@@ -0,0 +1,57 @@
+'''
+PalettePrefilter
+Skip template matching of monsters whose colors aren't in the search ROI.
+Most search ROIs have no monster in them, counting palette colors of the
+ROI once is much cheaper than matching every template of every monster.
+'''
+# Library import
+import numpy as np
+
+# Local import
+from src.utils.color_palette import NUM_BINS, get_palette_hist, get_dominant_bins
+
+class PalettePrefilter:
+    '''
+    PalettePrefilter
+
+    Palette of a monster is the union of dominant color bins of its templates.
+    A monster is present if the ROI has at least min_hit_ratio of the palette
+    pixels of its smallest template, a low ratio keeps partly covered
+    or recolored monsters matched.
+    '''
+    def __init__(self, monsters_info, cfg):
+        self.enable = cfg["enable"]
+        self.coverage = cfg["coverage"] # dominant bins cover this ratio of template pixels
+        self.min_hit_ratio = cfg["min_hit_ratio"]
+        self.names = list(monsters_info.keys())
+        palettes = [] # (n_monsters, 256) 0/1 palette bins of each monster
+        min_hits = [] # (n_monsters,) palette pixels needed in ROI
+        for templates in monsters_info.values():
+            hists = [t["palette_hist"] for t in templates]
+            palette = np.zeros(NUM_BINS, dtype=bool)
+            for hist in hists:
+                palette |= get_dominant_bins(hist, self.coverage)
+            palettes.append(palette)
+            min_hits.append(self.min_hit_ratio * min(hist[palette].sum() for hist in hists))
+        self.palettes = np.array(palettes, dtype=np.float32).reshape(-1, NUM_BINS)
+        self.min_hits = np.array(min_hits, dtype=np.float32)
+        self.num_hits = 0 # monsters passed since last new_frame()
+        self.num_skips = 0 # monsters skipped since last new_frame()
+
+    def get_present_monsters(self, img_roi):
+        '''
+        Names of monsters whose palette is in BGR image img_roi
+        '''
+        is_present = self.palettes @ get_palette_hist(img_roi) >= self.min_hits
+        num_hits = int(np.count_nonzero(is_present))
+        self.num_hits += num_hits
+        self.num_skips += len(self.names) - num_hits
+        return {name for name, present in zip(self.names, is_present.tolist()) if present}
+
+    def new_frame(self):
+        '''
+        Start a new frame, return (passed, skipped) monsters during last frame
+        '''
+        num_hits, num_skips = self.num_hits, self.num_skips
+        self.num_hits = self.num_skips = 0
+        return num_hits, num_skips
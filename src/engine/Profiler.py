@@ -26,6 +26,7 @@ class Profiler:
         self.start_time = time.time()
         self.times = defaultdict(float)       # total time per label
         self.counts = defaultdict(int)        # how many times each label is marked
+        self.counters = defaultdict(int)      # event counters, e.g. duplicated frames
         self.total_frames = 0
         self.t_start = self.t_last_mask = time.time()
 
@@ -50,6 +51,14 @@ class Profiler:
         self.counts[label] += 1
         self.t_last_mask = now
 
+    def count(self, label, n=1):
+        '''
+        Accumulate an event counter
+        '''
+        if not self.enable:
+            return
+        self.counters[label] += n
+
     def report(self):
         '''
         Report average time per section over all frames
@@ -65,6 +74,10 @@ class Profiler:
             percent = (total_label_time / total_time) * 100 if total_time > 0 else 0
             report_lines.append(f"{label:<20}: {avg_time:.4f}s avg ({percent:.1f}%)")
 
+        for label, total_count in self.counters.items():
+            avg_count = total_count / self.total_frames
+            report_lines.append(f"{label:<20}: {total_count} ({avg_count:.2f} per frame)")
+
         avg_frame_time = total_time / self.total_frames
         total_duration = time.time() - self.start_time
         avg_fps = self.total_frames / total_duration if total_duration > 0 else 0
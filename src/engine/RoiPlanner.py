@@ -0,0 +1,131 @@
+'''
+RoiPlanner
+Detectors declare which regions of interest (RoI) of the working frame
+they read in each FSM state. The capture thread only normalizes the union
+of the RoIs of current state instead of the whole frame.
+'''
+
+class RoiPlanner:
+    '''
+    RoiPlanner
+
+    RoI is (x, y, w, h) on working frame, or None for the whole frame.
+    '''
+    def __init__(self, frame_size, full_frame_ratio=0.7):
+        self.frame_w, self.frame_h = frame_size # (w, h)
+        # Normalize whole frame if RoIs cover more than this ratio of the frame,
+        # small copies are not worth it anymore
+        self.full_frame_ratio = full_frame_ratio
+        self.detectors = {} # name -> (roi, states), states is None for all states
+        self.plans = {} # state name -> cached plan
+
+    def register(self, name, roi, states=None):
+        '''
+        Register or update the RoI a detector reads.
+        states: FSM state names the detector runs in, None for all states
+        '''
+        if roi is not None:
+            roi = self.clip(roi)
+        self.detectors[name] = (roi, None if states is None else set(states))
+        self.plans = {}
+
+    def unregister(self, name):
+        '''
+        Remove a detector
+        '''
+        if self.detectors.pop(name, None) is not None:
+            self.plans = {}
+
+    def is_active(self, name, state):
+        '''
+        Check if a detector runs in given state
+        '''
+        if name not in self.detectors:
+            return False
+        _, states = self.detectors[name]
+        return states is None or state in states
+
+    def plan(self, state):
+        '''
+        Get the RoIs to normalize for given state.
+
+        Returns:
+            None if the whole frame is needed, otherwise list of disjoint (x, y, w, h)
+        '''
+        if state not in self.plans:
+            self.plans[state] = self.make_plan(state)
+        return self.plans[state]
+
+    def make_plan(self, state):
+        '''
+        Union RoIs of all detectors active in state
+        '''
+        rois = []
+        for name, (roi, _) in self.detectors.items():
+            if not self.is_active(name, state):
+                continue
+            if roi is None:
+                return None
+            rois.append(roi)
+
+        rois = merge_rois(rois)
+        area = sum(w * h for _, _, w, h in rois)
+        if area > self.full_frame_ratio * self.frame_w * self.frame_h:
+            return None
+        return rois
+
+    def clip(self, roi):
+        '''
+        Clip RoI inside working frame
+        '''
+        x, y, w, h = roi
+        x0, y0 = max(0, x), max(0, y)
+        x1, y1 = min(self.frame_w, x + w), min(self.frame_h, y + h)
+        return (x0, y0, max(0, x1 - x0), max(0, y1 - y0))
+
+def merge_rois(rois):
+    '''
+    Merge overlapping RoIs into their bounding box until all RoIs are disjoint
+    '''
+    rois = [roi for roi in rois if roi[2] > 0 and roi[3] > 0]
+    is_merged = True
+    while is_merged:
+        is_merged = False
+        for i in range(len(rois)):
+            for j in range(i + 1, len(rois)):
+                if is_overlap(rois[i], rois[j]):
+                    rois[i] = bounding_box(rois[i], rois[j])
+                    del rois[j]
+                    is_merged = True
+                    break
+            if is_merged:
+                break
+    return rois
+
+def is_covered(rois, rois_needed):
+    '''
+    Check if every needed RoI is fully inside one of rois.
+    None means the whole frame.
+    '''
+    if rois is None:
+        return True
+    if rois_needed is None:
+        return False
+    return all(any(x >= rx and y >= ry and x + w <= rx + rw and y + h <= ry + rh
+                   for rx, ry, rw, rh in rois)
+               for x, y, w, h in rois_needed)
+
+def is_overlap(a, b):
+    '''
+    Check if two (x, y, w, h) boxes overlap
+    '''
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and \
+           a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+def bounding_box(a, b):
+    '''
+    Bounding box of two (x, y, w, h) boxes
+    '''
+    x0, y0 = min(a[0], b[0]), min(a[1], b[1])
+    x1, y1 = max(a[0] + a[2], b[0] + b[2]), max(a[1] + a[3], b[1] + b[3])
+    return (x0, y0, x1 - x0, y1 - y0)
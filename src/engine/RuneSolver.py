@@ -12,55 +12,59 @@ import numpy as np
 # Local import
 from src.utils.logger import logger
 from src.utils.common import (find_pattern_sqdiff, draw_rectangle, screenshot,
-    load_image, get_mask, nms_matches, to_opencv_hsv
+    nms_matches, to_opencv_hsv, scale_box
 )
+from src.utils.box_geometry import to_boxes, get_centers
 from src.input.KeyBoardController import press_key
+from src.engine.TemplateCompiler import TemplateCompiler
 
 class RuneSolver:
     '''
     Init RuneSolver
     '''
-    def __init__(self, cfg):
+    def __init__(self, cfg, dirty_map):
         self.cfg = cfg # Configuration
+        self.dirty_map = dirty_map # Reuse message detection when message box is unchanged
         # Image
-        self.img_rune_warning = None
-        self.img_runes = []
-        self.img_arrows = {
-            "left":
-                [load_image("rune/arrow_left_1.png"),
-                 load_image("rune/arrow_left_2.png"),
-                 load_image("rune/arrow_left_3.png"),],
-            "right":
-                [load_image("rune/arrow_right_1.png"),
-                 load_image("rune/arrow_right_2.png"),
-                 load_image("rune/arrow_right_3.png"),],
-            "up":
-                [load_image("rune/arrow_up_1.png"),
-                 load_image("rune/arrow_up_2.png"),
-                 load_image("rune/arrow_up_3.png")],
-            "down":
-                [load_image("rune/arrow_down_1.png"),
-                 load_image("rune/arrow_down_2.png"),
-                 load_image("rune/arrow_down_3.png"),],
+        compiler = TemplateCompiler(cfg)
+        # Arrow templates of rune mini-game
+        self.arrows = {
+            direction: [compiler.compile(f"rune/arrow_{direction}_{i}.png")[0]
+                        for i in [1, 2, 3]]
+            for direction in ["left", "right", "up", "down"]
         }
         # Load rune images from rune/
         lang = cfg["system"]["language"]
-        self.img_rune_warning = load_image(f"rune/rune_warning_{lang}.png",
-                                           cv2.IMREAD_GRAYSCALE)
-        self.img_rune_warning_mask = get_mask(load_image(f"rune/rune_warning_{lang}.png"), (0, 255, 0))
-
-        self.img_runes = [load_image( "rune/rune_1.png"),
-                          load_image(f"rune/rune_2_{lang}.png"),
-                          load_image( "rune/rune_3.png"),]
-        self.img_rune_enable = load_image(f"rune/rune_enable_{lang}.png",
-                                          cv2.IMREAD_GRAYSCALE)
+        rune_warning = compiler.compile(f"rune/rune_warning_{lang}.png")[0]
+        self.img_rune_warning = rune_warning["gray"]
+        self.img_rune_warning_mask = rune_warning["mask"]
+        self.img_rune_enable = compiler.compile(f"rune/rune_enable_{lang}.png")[0]["gray"]
+
+        # Rune parts are matched at perception scale
+        if "rune" in cfg["perception"]["full_res"]:
+            self.scale = 1.0
+        else:
+            self.scale = cfg["perception"]["scale"]
+        self.runes = [compiler.compile(path, self.scale)[0]
+                      for path in ["rune/rune_1.png",
+                                   f"rune/rune_2_{lang}.png",
+                                   "rune/rune_3.png"]]
         # Coordinate
         self.loc_rune = None # rune location on game screen
 
     def reset(self):
         self.loc_rune = None
 
-    def solve_rune(self, img, img_debug):
+    def get_arrow_boxes_roi(self):
+        '''
+        RoI (x, y, w, h) covering all 4 arrow detection boxes
+        '''
+        x0, y0 = self.cfg["rune_solver"]["arrow_box_coord"]
+        size = self.cfg["rune_solver"]["arrow_box_size"]
+        interval = self.cfg["rune_solver"]["arrow_box_interval"]
+        return (x0, y0, 3 * interval + size, size)
+
+    def solve_rune(self, ctx, img_debug):
         '''
         Automatically solves the rune puzzle mini-game by recognizing directional arrows
         on the screen and simulating the correct key presses.
@@ -80,7 +84,8 @@ class RuneSolver:
             None
         '''
         # Only the highlighted arrow will show on mask
-        img_bin = self.arrow_hsv_binarized(img,
+        roi = self.get_arrow_boxes_roi()
+        img_bin = self.arrow_hsv_binarized(ctx.hsv(roi),
                                            self.cfg['rune_solver']['arrow_highlight_low_hsv'],
                                            self.cfg['rune_solver']['arrow_highlight_high_hsv'])
         # Debug img_bin
@@ -95,7 +100,7 @@ class RuneSolver:
             size = self.cfg["rune_solver"]["arrow_box_size"]
 
             # Detect circles
-            img_roi = img_bin[y:y+size, x:x+size].astype(np.uint8)
+            img_roi = img_bin[y-roi[1]:y-roi[1]+size, x-roi[0]:x-roi[0]+size]
             circles = cv2.HoughCircles(
                 img_roi,
                 method=cv2.HOUGH_GRADIENT,
@@ -117,11 +122,11 @@ class RuneSolver:
                 # Loop through all possible arrows template and choose the most possible one
                 best_score = float('inf')
                 best_direction = ""
-                for direction, arrow_list in self.img_arrows.items():
-                    for img_arrow in arrow_list:
+                for direction, arrow_list in self.arrows.items():
+                    for arrow in arrow_list:
                         _, score, _ = find_pattern_sqdiff(
-                                        img[y:y+size, x:x+size], img_arrow,
-                                        mask=get_mask(img_arrow, (0, 255, 0)))
+                                        ctx.crop((x, y, size, size)), arrow["img"],
+                                        mask=arrow["mask"])
                         if score < best_score:
                             best_score = score
                             best_direction = direction
@@ -146,7 +151,7 @@ class RuneSolver:
 
         logger.info("[RuneSolver] No arrows is highlighted, skip frame")
 
-    def is_rune_enable(self, img, img_debug):
+    def is_rune_enable(self, ctx, img_debug):
         '''
         Checks whether the rune enable message is appear on the game frame.
 
@@ -163,9 +168,11 @@ class RuneSolver:
         x1, y1 = self.cfg[f'rune_enable_msg_{lang}']["bottom_right"]
 
         # Find the rune enable message
-        _, score, _ = find_pattern_sqdiff(
-                        img[y0:y1, x0:x1],
-                        self.img_rune_enable)
+        roi = (x0, y0, x1-x0, y1-y0)
+        is_hit, score = self.dirty_map.lookup("rune_enable_msg")
+        if not is_hit:
+            _, score, _ = find_pattern_sqdiff(ctx.gray(roi), self.img_rune_enable)
+            self.dirty_map.store("rune_enable_msg", [roi], score)
         # Debug
         if self.cfg['rune_detect']['debug']:
             draw_rectangle(
@@ -178,7 +185,7 @@ class RuneSolver:
         else:
             return False
 
-    def is_rune_warning(self, img, img_debug):
+    def is_rune_warning(self, ctx, img_debug):
         '''
         Checks whether the rune warning icon is appear on the game frame.
 
@@ -195,9 +202,13 @@ class RuneSolver:
         x1, y1 = self.cfg[f'rune_warning_{lang}']["bottom_right"]
 
         # Detect rune warning
-        _, score, _ = find_pattern_sqdiff(
-                        img[y0:y1, x0:x1], self.img_rune_warning,
-                        mask=self.img_rune_warning_mask)
+        roi = (x0, y0, x1-x0, y1-y0)
+        is_hit, score = self.dirty_map.lookup("rune_warning")
+        if not is_hit:
+            _, score, _ = find_pattern_sqdiff(
+                            ctx.gray(roi), self.img_rune_warning,
+                            mask=self.img_rune_warning_mask)
+            self.dirty_map.store("rune_warning", [roi], score)
 
         # Debug
         if self.cfg['rune_detect']['debug']:
@@ -211,18 +222,19 @@ class RuneSolver:
         else:
             return False
 
-    def update_rune_location(self, img, img_debug, loc_player):
+    def update_rune_location(self, ctx, img_debug, loc_player):
         '''
         Checks if a rune icon is visible around the player's position.
 
         This function:
-        - Uses template matching to detect the rune icon within this predefine box.
+        - Uses template matching to detect the rune icon within this predefine box,
+          at perception scale.
 
         Returns:
             nearest rune
         '''
         # Calculate bounding box
-        h, w = img.shape[:2]
+        h, w = ctx.h, ctx.w
         h_rune_box = self.cfg["rune_detect"]["box_height"]
         w_rune_box = self.cfg["rune_detect"]["box_width"]
         x0 = max(0, loc_player[0] - w_rune_box // 2)
@@ -237,17 +249,24 @@ class RuneSolver:
         )
 
         # Make sure ROI is large enough to hold a full rune
-        max_rune_height = max(r.shape[0] for r in self.img_runes)
-        max_rune_width  = max(r.shape[1] for r in self.img_runes)
+        max_rune_height = max(r["img"].shape[0] for r in self.runes)
+        max_rune_width  = max(r["img"].shape[1] for r in self.runes)
         if (x1 - x0) < max_rune_width or (y1 - y0) < max_rune_height:
             return  # Skip check if box is out of range
 
         # Match each rune part separately
+        img_roi = ctx.scaled(self.scale).crop(scale_box((x0, y0, x1-x0, y1-y0), self.scale))
+        if any(r["img_scaled"].shape[0] > img_roi.shape[0] or
+               r["img_scaled"].shape[1] > img_roi.shape[1] for r in self.runes):
+            return  # Rounding made the scaled box smaller than a rune
+
         matches = []
-        for i, img_rune in enumerate(self.img_runes):
-            mask = get_mask(img_rune, (0, 255, 0))
-            loc, score, _ = find_pattern_sqdiff(img[y0:y1, x0:x1], img_rune, mask=mask)
-            matches.append((i, loc, score, img_rune.shape))
+        for i, rune in enumerate(self.runes):
+            loc, score, _ = find_pattern_sqdiff(img_roi, rune["img_scaled"],
+                                                mask=rune["mask_scaled"],
+                                                pyramid=self.cfg["pyramid_search"])
+            loc = (int(round(loc[0] / self.scale)), int(round(loc[1] / self.scale)))
+            matches.append((i, loc, score, rune["img"].shape))
 
         # # Matches box debug
         # for i, (part_idx, loc, score, shape) in enumerate(matches):
@@ -275,22 +294,24 @@ class RuneSolver:
         if len(good_matches) < 2:
             return
 
+        boxes = to_boxes([(x0 + loc[0], y0 + loc[1]) for (_, loc, _, _) in good_matches],
+                         [(shape[1], shape[0]) for (_, _, _, shape) in good_matches])
+
         # Horizontal: max distance between part's centers are small
-        x_centers = [x0 + loc[0] + shape[1] // 2 for (_, loc, _, shape) in good_matches]
-        if max(x_centers) - min(x_centers) > 10:
+        x_centers = get_centers(boxes)[:, 0]
+        if x_centers.max() - x_centers.min() > 10:
             return
 
         # Vertical: check if all Y's are strictly increasing
-        ys = [y0 + loc[1] for (_, loc, _, _) in good_matches]
-        if not all(ys[i] < ys[i + 1] for i in range(len(ys) - 1)):
+        ys = boxes[:, 1]
+        if not np.all(np.diff(ys) > 0):
             return
 
         logger.info(f"[RuneSolver] Found rune parts near player with scores:"
                     f" {[round(s, 2) for (_, _, s, _) in matches]}")
 
         # Update rune location
-        self.loc_rune = (int(sum(x_centers) / len(x_centers)),
-                         int(sum(ys) / len(ys)))
+        self.loc_rune = (int(x_centers.mean()), int(ys.mean()))
 
         # Draw all parts on debug window
         for (i, loc, score, shape) in matches:
@@ -310,22 +331,19 @@ class RuneSolver:
 
         screenshot(img_debug, "rune_detected")
 
-    def arrow_hsv_binarized(self, img, low_hsv, high_hsv):
+    def arrow_hsv_binarized(self, img_hsv, low_hsv, high_hsv):
         """
-        Convert a BGR image to a binary mask using HSV thresholding.
+        Convert a HSV image to a binary mask using HSV thresholding.
         Handles hue wraparound (e.g., low_hsv > high_hsv).
 
         Args:
-            img (np.ndarray): BGR image
+            img_hsv (np.ndarray): HSV image in OpenCV format, e.g. FrameContext.hsv()
             low_hsv (list/tuple): Lower HSV bound in standard format (0–360, 0–100, 0–100)
             high_hsv (list/tuple): Upper HSV bound in standard format (0–360, 0–100, 0–100)
 
         Returns:
             np.ndarray: Binary mask (0 or 255)
         """
-        # Convert image to HSV (OpenCV format)
-        img_hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-
         # Check if hue range wraps around
         if low_hsv[0] > high_hsv[0]:
             # Wraparound: split into two ranges
@@ -346,7 +364,7 @@ class RuneSolver:
 
         return mask
 
-    def is_in_rune_game(self, img, img_debug):
+    def is_in_rune_game(self, ctx, img_debug):
         '''
         Determines whether the rune puzzle game screen is currently active.
 
@@ -360,7 +378,8 @@ class RuneSolver:
         Returns:
             bool: True if the rune game is detected on screen, False otherwise.
         '''
-        img_bin = self.arrow_hsv_binarized(img,
+        roi = self.get_arrow_boxes_roi()
+        img_bin = self.arrow_hsv_binarized(ctx.hsv(roi),
                                            self.cfg['rune_solver']['arrow_low_hsv'],
                                            self.cfg['rune_solver']['arrow_high_hsv'])
         # Debug img_bin
@@ -375,7 +394,7 @@ class RuneSolver:
             y = y0
             size = self.cfg["rune_solver"]["arrow_box_size"]
 
-            img_roi = img_bin[y:y+size, x:x+size].astype(np.uint8)
+            img_roi = img_bin[y-roi[1]:y-roi[1]+size, x-roi[0]:x-roi[0]+size]
             # Detect circles
             circles = cv2.HoughCircles(
                 img_roi,
@@ -419,11 +438,11 @@ class RuneSolver:
 
         # Check if arrow appear on screen
         best_score = float('inf')
-        for _, arrow_list in self.img_arrows.items():
-            for img_arrow in arrow_list:
+        for _, arrow_list in self.arrows.items():
+            for arrow in arrow_list:
                 _, score, _ = find_pattern_sqdiff(
-                                img[y:y+size, x:x+size], img_arrow,
-                                mask=get_mask(img_arrow, (0, 255, 0)))
+                                img[y:y+size, x:x+size], arrow["img"],
+                                mask=arrow["mask"])
                 if score < best_score:
                     best_score = score
 
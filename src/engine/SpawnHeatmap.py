@@ -0,0 +1,177 @@
+'''
+SpawnHeatmap
+Where monsters of a map were detected, accumulated in map.png coordinates
+over sessions and saved next to the map in minimaps/<map>/.
+Most frames only search the hot cells that cover most past detections,
+every few frames the whole search box is searched to keep the map honest.
+'''
+# Standard import
+import os
+import time
+
+# Library import
+import cv2
+import numpy as np
+
+# Local import
+from src.utils.logger import logger
+from src.utils.common import save_atomic
+
+class SpawnHeatmap:
+    '''
+    SpawnHeatmap
+
+    Detection counts are kept per cell of cell_size x cell_size minimap pixels.
+    Only full searches add counts, searching hot cells only would otherwise
+    keep reinforcing the cells it already searches.
+    minimap_scale is game window pixels per minimap pixel, same as WalkableMask.
+    '''
+    def __init__(self, path, map_shape, minimap_scale, cfg, pad=0):
+        self.enable = cfg["enable"] and minimap_scale > 0 and map_shape is not None
+        self.path = path # minimaps/<map>/spawn_heatmap.npy
+        self.scale = minimap_scale
+        self.cell_size = cfg["cell_size"] # minimap pixels per cell
+        self.coverage = cfg["coverage"] # hot cells cover this ratio of detections
+        self.min_samples = cfg["min_samples"] # detections needed before searching hot cells only
+        self.full_interval = cfg["full_interval"] # full search every N frames
+        self.save_interval = cfg["save_interval"] # seconds between saves
+        self.pad = pad # game window pixels around hot cells, fits monster templates
+        self.counts = None # (rows, cols) float32 detection count per cell
+        self.hot_mask = None # (h, w) uint8 0/1 hot mask at minimap scale, None if outdated
+        self.map_shape = map_shape
+        self.is_dirty = False # counts changed since last save
+        self.seq_full = None # frame sequence number of last full search
+        self.t_last_save = time.time()
+        # Statistics for report()
+        self.time_full = 0.0 # total detection time of full searches
+        self.time_hot = 0.0 # total detection time of hot cell searches
+        self.frames_full = 0
+        self.frames_hot = 0
+        self.num_detections = 0 # detections of full searches while hot cells are in use
+        self.num_detections_cold = 0 # ... of them outside hot cells
+        if not self.enable:
+            return
+
+        h, w = map_shape
+        shape = (-(-h // self.cell_size), -(-w // self.cell_size))
+        self.counts = np.zeros(shape, dtype=np.float32)
+        if os.path.exists(path):
+            try:
+                counts = np.load(path, allow_pickle=False)
+            except (OSError, ValueError) as e:
+                logger.warning(f"[SpawnHeatmap] Failed to load {path}: {e}")
+            else:
+                if counts.shape == shape:
+                    self.counts = counts.astype(np.float32)
+                    logger.info(f"[SpawnHeatmap] Loaded {path} with {int(counts.sum())} detections")
+                else:
+                    logger.warning(f"[SpawnHeatmap] {path} doesn't match map size or cell_size, start over")
+
+    def is_ready(self):
+        '''
+        Whether enough detections were collected to trust hot cells
+        '''
+        return self.enable and self.counts.sum() >= self.min_samples
+
+    def is_need_full_search(self, seq):
+        '''
+        Check if frame seq should search the whole search box.
+        Frames can be dropped, so seq is counted from the last full search
+        instead of checking multiples of full_interval
+        '''
+        return not self.is_ready() or self.seq_full is None or \
+               not 0 <= seq - self.seq_full < self.full_interval
+
+    def get_hot_mask(self):
+        '''
+        0/1 uint8 mask at minimap scale of the fewest cells
+        covering coverage of all detections, padded by monster size
+        '''
+        if self.hot_mask is not None:
+            return self.hot_mask
+        counts = np.sort(self.counts, axis=None)[::-1]
+        n = np.searchsorted(np.cumsum(counts), self.coverage * counts.sum()) + 1
+        thres = max(counts[min(n, len(counts)) - 1], np.finfo(np.float32).tiny)
+        cells = (self.counts >= thres).astype(np.uint8)
+
+        h, w = self.map_shape
+        mask = np.repeat(np.repeat(cells, self.cell_size, axis=0), self.cell_size, axis=1)[:h, :w]
+        r = int(-(-self.pad // self.scale))
+        if r > 0:
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2*r + 1, 2*r + 1))
+            mask = cv2.dilate(mask, kernel)
+        self.hot_mask = np.ascontiguousarray(mask)
+        return self.hot_mask
+
+    def to_global(self, points, loc_player, loc_player_global):
+        '''
+        Game window points (n, 2) to map.png coordinates, inverse of WalkableMask.project()
+        '''
+        return (np.asarray(points, dtype=np.float64) - loc_player) / self.scale + loc_player_global
+
+    def update(self, monsters, seq, is_full, elapsed, loc_player, loc_player_global):
+        '''
+        Record detections and detection time of one search on frame seq
+        '''
+        if is_full:
+            self.seq_full = seq
+            self.frames_full += 1
+            self.time_full += elapsed
+        else:
+            self.frames_hot += 1
+            self.time_hot += elapsed
+            return
+
+        h, w = self.map_shape
+        locs = np.rint(self.to_global(monsters.centers, loc_player, loc_player_global)).astype(np.int64)
+        locs = locs[(locs[:, 0] >= 0) & (locs[:, 0] < w) & (locs[:, 1] >= 0) & (locs[:, 1] < h)]
+
+        # Recall of hot cells, measured before these detections are added
+        if self.is_ready():
+            hot_mask = self.get_hot_mask()
+            self.num_detections += len(monsters)
+            self.num_detections_cold += len(monsters) - int(hot_mask[locs[:, 1], locs[:, 0]].sum())
+
+        if len(locs) > 0:
+            np.add.at(self.counts, (locs[:, 1] // self.cell_size, locs[:, 0] // self.cell_size), 1)
+            self.hot_mask = None
+            self.is_dirty = True
+
+        if time.time() - self.t_last_save > self.save_interval:
+            self.save()
+
+    def save(self):
+        '''
+        Save counts to path
+        '''
+        self.t_last_save = time.time()
+        if not self.enable or not self.is_dirty:
+            return
+        try:
+            save_atomic(self.path, lambda f: np.save(f, self.counts))
+            self.is_dirty = False
+        except OSError as e:
+            logger.warning(f"[SpawnHeatmap] Failed to save {self.path}: {e}")
+            return
+        logger.info(f"[SpawnHeatmap] Saved {self.path}\n{self.report()}")
+
+    def report(self):
+        '''
+        Detector time saved by hot cell searches versus recall they lost.
+        Recall lost is estimated from full searches, the ratio of
+        detections outside hot cells times the ratio of hot cell searches.
+        '''
+        frames = self.frames_full + self.frames_hot
+        if frames == 0 or self.frames_full == 0:
+            return ""
+        avg_full = self.time_full / self.frames_full
+        avg_hot = self.time_hot / self.frames_hot if self.frames_hot > 0 else 0.0
+        time_saved = 1.0 - (self.time_full + self.time_hot) / (avg_full * frames) if avg_full > 0 else 0.0
+        cold_ratio = self.num_detections_cold / self.num_detections if self.num_detections > 0 else 0.0
+        recall_lost = cold_ratio * self.frames_hot / frames
+        return "\n".join([
+            f"{'Full Searches':<20}: {self.frames_full} ({avg_full*1000:.1f}ms avg)",
+            f"{'Hot Cell Searches':<20}: {self.frames_hot} ({avg_hot*1000:.1f}ms avg)",
+            f"{'Time Saved':<20}: {time_saved*100:.1f}%",
+            f"{'Recall Lost':<20}: {recall_lost*100:.1f}% (est., {cold_ratio*100:.1f}% outside hot cells)",
+        ])
@@ -0,0 +1,160 @@
+'''
+TemplateCompiler
+Load template images and build every derived variant AutoBot matches with
+(masks, flips, grayscale, contour masks, downscaled copies) once at load time.
+Compiled templates are cached on disk, keyed by image content and the config
+values the variants depend on.
+'''
+# Standard import
+import os
+import hashlib
+import json
+
+# Library import
+import cv2
+import numpy as np
+
+# Local import
+from src.utils.logger import logger
+from src.utils.common import get_mask, resize_by_scale, save_atomic
+from src.utils.color_index import color_mask
+from src.utils.binary_match import binarize, get_template_points
+from src.utils.color_palette import get_palette_hist
+
+class TemplateCompiler:
+    '''
+    TemplateCompiler
+
+    A compiled template is a dict of variant name -> image:
+        "img":            BGR image
+        "mask":           0 for background pixels (pure green), 255 otherwise
+        "gray":           image decoded as grayscale
+        "img_scaled":     "img" resized by scale
+        "mask_scaled":    "mask" resized by scale
+        "gray_scaled":    "gray" resized by scale
+        "img_scaled_gray":"img_scaled" converted to grayscale
+        "contour":        blurred black-pixel mask at scale, for "contour_only" detection
+        "contour_points": (x, y) of sampled black pixels at scale, for "contour_binary" detection
+        "interior_points":(x, y) of sampled pixels away from black pixels at scale, for "contour_binary" detection
+        "palette_hist":   (256,) coarse color histogram of foreground pixels, for palette prefilter
+    '''
+    VERSION = 3 # Bump when variants change, invalidates on-disk cache
+    BACKGROUND_COLOR = (0, 255, 0)
+
+    def __init__(self, cfg, cache_dir="cache/templates"):
+        self.is_use_cache = cfg["template_cache"]["enable"]
+        self.cache_dir = cache_dir
+        self.contour_blur = cfg["monster_detect"]["contour_blur"]
+        self.contour_tolerance = cfg["monster_detect"]["contour_tolerance"]
+        self.contour_max_points = cfg["monster_detect"]["contour_max_points"]
+
+    def compile(self, path, scale=1.0, is_flip=False):
+        '''
+        Compile template image at path.
+
+        Returns:
+            list of compiled templates, [original] or [original, flipped] if is_flip
+        '''
+        if not os.path.exists(path):
+            logger.error(f"Image not found: {path}")
+            raise FileNotFoundError(f"Image not found: {path}")
+        with open(path, "rb") as f:
+            data = f.read()
+
+        path_cache = self.get_cache_path(path, data, scale, is_flip)
+        if self.is_use_cache and os.path.exists(path_cache):
+            try:
+                templates = self.load_cache(path_cache)
+                logger.info(f"Loaded template: {path} (cached)")
+                return templates
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"[TemplateCompiler] Ignore broken cache {path_cache}: {e}")
+
+        buf = np.frombuffer(data, dtype=np.uint8)
+        img = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+        gray = cv2.imdecode(buf, cv2.IMREAD_GRAYSCALE)
+        if img is None or gray is None:
+            logger.error(f"Failed to load image file: {path}")
+            raise ValueError(f"Failed to load image: {path}")
+
+        templates = [self.build(img, gray, scale)]
+        if is_flip:
+            templates.append(self.build(cv2.flip(img, 1), cv2.flip(gray, 1), scale))
+        logger.info(f"Loaded template: {path}")
+
+        if self.is_use_cache:
+            self.save_cache(path_cache, templates)
+        return templates
+
+    def build(self, img, gray, scale):
+        '''
+        Build all variants of one template
+        '''
+        img_scaled = resize_by_scale(img, scale)
+        mask = get_mask(img, self.BACKGROUND_COLOR)
+        mask_scaled = resize_by_scale(mask, scale, cv2.INTER_NEAREST)
+
+        # Downscale black-pixel mask after color matching, thin contours stay as gray pixels
+        black = color_mask(img, (0, 0, 0))
+        contour = resize_by_scale(black, scale)
+        blur = max(1, round(self.contour_blur * scale)) | 1
+        contour = cv2.GaussianBlur(contour, (blur, blur), 0)
+
+        # Sampled points for binary contour matching
+        radius = round(self.contour_tolerance * scale)
+        contour_points, interior_points = get_template_points(
+            binarize(black, scale), binarize(mask_scaled), radius, self.contour_max_points)
+
+        return {
+            "img": img,
+            "mask": mask,
+            "gray": gray,
+            "img_scaled": img_scaled,
+            "mask_scaled": mask_scaled,
+            "gray_scaled": resize_by_scale(gray, scale),
+            "img_scaled_gray": cv2.cvtColor(img_scaled, cv2.COLOR_BGR2GRAY),
+            "contour": contour,
+            "contour_points": contour_points,
+            "interior_points": interior_points,
+            "palette_hist": get_palette_hist(img, mask),
+        }
+
+    def get_cache_path(self, path, data, scale, is_flip):
+        '''
+        Cache file path, keyed by image content and config the variants depend on
+        '''
+        params = json.dumps({
+            "version": self.VERSION,
+            "scale": scale,
+            "is_flip": is_flip,
+            "contour_blur": self.contour_blur,
+            "contour_tolerance": self.contour_tolerance,
+            "contour_max_points": self.contour_max_points,
+            "background_color": self.BACKGROUND_COLOR,
+        }, sort_keys=True)
+        key = hashlib.sha1(data + params.encode()).hexdigest()[:16]
+        name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.cache_dir, f"{name}_{key}.npz")
+
+    def load_cache(self, path_cache):
+        '''
+        Load compiled templates from cache file
+        '''
+        with np.load(path_cache, allow_pickle=False) as npz:
+            num_templates = int(npz["num_templates"])
+            return [{k.split("/", 1)[1]: npz[k] for k in npz.files if k.startswith(f"{i}/")}
+                    for i in range(num_templates)]
+
+    def save_cache(self, path_cache, templates):
+        '''
+        Save compiled templates to cache file
+        '''
+        arrays = {"num_templates": np.array(len(templates))}
+        for i, template in enumerate(templates):
+            for k, v in template.items():
+                arrays[f"{i}/{k}"] = v
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            save_atomic(path_cache, lambda f: np.savez(f, **arrays))
+        except OSError as e:
+            logger.warning(f"[TemplateCompiler] Failed to save cache {path_cache}: {e}")
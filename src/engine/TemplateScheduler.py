@@ -0,0 +1,79 @@
+'''
+TemplateScheduler
+Decide which monster templates to match on each frame, and in which order.
+Animation frames of a monster that rarely match on the current map are only
+matched a few per frame in turns, monsters move little between frames so
+they're still found within a few frames.
+'''
+
+class TemplateScheduler:
+    '''
+    TemplateScheduler
+
+    A template is keyed by (monster_name, index of template in monsters_info[monster_name]).
+    Hit rate of a template is the exponential moving average of whether it
+    matched anything, only updated on frames it's matched.
+    '''
+    def __init__(self, monsters_info, cfg):
+        self.enable = cfg["enable"]
+        self.hit_rate_decay = cfg["hit_rate_decay"] # weight of latest hit in hit rate
+        self.low_yield_rate = cfg["low_yield_rate"] # template below this hit rate is low-yield
+        self.round_robin = cfg["round_robin"] # low-yield templates matched per frame
+        self.is_early_exit = self.enable and cfg["early_exit"]
+        self.confident_thres = cfg["confident_thres"] # match score to stop early
+        self.keys = [(name, i) for name, templates in monsters_info.items()
+                               for i in range(len(templates))]
+        self.hit_rate = {key: 1.0 for key in self.keys} # New templates start as high-yield
+        self.idx_round_robin = 0 # first low-yield template to match on this frame
+        self.num_matched = 0 # templates matched since last new_frame()
+        self.num_scheduled = 0 # templates that could be matched since last new_frame()
+
+    def schedule(self):
+        '''
+        Get keys of templates to match on this frame, most likely template first.
+        Every call of a frame gets the same low-yield templates, next_turn() rotates them
+        '''
+        self.num_scheduled += len(self.keys)
+        if not self.enable:
+            return self.keys
+
+        # Stable sort keeps monsters_info order between templates of same hit rate
+        keys = sorted(self.keys, key=lambda key: -self.hit_rate[key])
+        keys_high = [key for key in keys if self.hit_rate[key] >= self.low_yield_rate]
+        keys_low = [key for key in self.keys if self.hit_rate[key] < self.low_yield_rate]
+
+        # Take turns to match low-yield templates
+        if len(keys_low) > self.round_robin:
+            start = self.idx_round_robin % len(keys_low)
+            keys_low = (keys_low[start:] + keys_low[:start])[:self.round_robin]
+        return keys_high + keys_low
+
+    def next_turn(self):
+        '''
+        Pass the turn to next low-yield templates, call once per processed frame
+        '''
+        self.idx_round_robin += self.round_robin
+
+    def schedule_monsters(self, monster_names):
+        '''
+        Get keys of every template of monster_names, in monsters_info order
+        '''
+        keys = [key for key in self.keys if key[0] in monster_names]
+        self.num_scheduled += len(keys)
+        return keys
+
+    def update(self, key, is_hit):
+        '''
+        Record whether a matched template found any monster
+        '''
+        self.num_matched += 1
+        rate = self.hit_rate[key]
+        self.hit_rate[key] = rate + self.hit_rate_decay * (float(is_hit) - rate)
+
+    def new_frame(self):
+        '''
+        Start a new frame, return (matched, skipped) templates during last frame
+        '''
+        num_matched, num_skipped = self.num_matched, self.num_scheduled - self.num_matched
+        self.num_matched = self.num_scheduled = 0
+        return num_matched, num_skipped
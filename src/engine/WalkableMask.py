@@ -0,0 +1,88 @@
+'''
+WalkableMask
+Where monsters can be, derived from the route images of the map.
+Route color codes are drawn where the player walks, which are the platforms
+monsters walk on too. The mask is built once per map at minimap scale and
+projected into the game window through the player's location on both.
+'''
+# Library import
+import cv2
+import numpy as np
+
+# Local import
+from src.utils.color_index import ColorIndex
+
+class WalkableMask:
+    '''
+    WalkableMask
+
+    Minimap coordinates are on map.png, the same as loc_player_global,
+    so the mask has map.png's shape. Route images may be a few pixels off
+    map.png's size, each is aligned to the top-left corner.
+    minimap_scale is game window pixels per minimap pixel.
+    '''
+    def __init__(self, img_routes, route_colors, cfg, map_shape, pad=0):
+        self.enable = cfg["enable"] and cfg["minimap_scale"] > 0 and \
+                      len(img_routes) > 0 and map_shape is not None
+        self.scale = cfg["minimap_scale"]
+        self.min_band_gap = cfg["min_band_gap"] # merge bands separated by fewer rows
+        self.mask = None # (h, w) uint8 0/1 walkable mask at minimap scale
+        if not self.enable:
+            return
+
+        # Union of route pixels of every route image
+        color_index = ColorIndex(route_colors)
+        mask = np.zeros(map_shape, dtype=np.uint8)
+        for img_route in img_routes:
+            h = min(img_route.shape[0], map_shape[0])
+            w = min(img_route.shape[1], map_shape[1])
+            mask[:h, :w][color_index.mask(img_route[:h, :w])] = 1
+
+        # Monster body can be anywhere around the platform, pad in game window pixels
+        # then convert to minimap pixels, rounded up
+        mx = -(-(cfg["margin_x"] + pad) // self.scale)
+        my = -(-(cfg["margin_y"] + pad) // self.scale)
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2*int(mx) + 1, 2*int(my) + 1))
+        self.mask = cv2.dilate(mask, kernel)
+
+    def project(self, roi, loc_player, loc_player_global, mask=None):
+        '''
+        Walkable mask of game window RoI (x, y, w, h), as 0/1 uint8 image.
+        mask replaces walkable mask with another 0/1 mask at minimap scale
+        '''
+        if mask is None:
+            mask = self.mask
+        x, y, w, h = roi
+        px, py = loc_player
+        gx, gy = loc_player_global
+        # game window = (minimap - loc_player_global) * scale + loc_player
+        M = np.float32([[self.scale, 0, px - gx * self.scale - x],
+                        [0, self.scale, py - gy * self.scale - y]])
+        return cv2.warpAffine(mask, M, (w, h), flags=cv2.INTER_NEAREST,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+    def get_bands(self, top_left, bottom_right, loc_player, loc_player_global, mask=None):
+        '''
+        Split search box into horizontal bands of walkable rows,
+        each band is cropped to its walkable columns.
+        mask replaces walkable mask like project()
+
+        Returns:
+            list of (top_left, bottom_right), empty if nothing is walkable
+        '''
+        x0, y0 = top_left
+        x1, y1 = bottom_right
+        mask = self.project((x0, y0, x1 - x0, y1 - y0), loc_player, loc_player_global, mask)
+        rows = np.flatnonzero(mask.any(axis=1))
+        if len(rows) == 0:
+            return []
+
+        # Runs of walkable rows, small gaps don't save enough to split
+        breaks = np.flatnonzero(np.diff(rows) > self.min_band_gap)
+        starts = np.concatenate(([rows[0]], rows[breaks + 1]))
+        ends = np.concatenate((rows[breaks], [rows[-1]])) + 1
+        bands = []
+        for ya, yb in zip(starts.tolist(), ends.tolist()):
+            cols = np.flatnonzero(mask[ya:yb].any(axis=0))
+            bands.append(((x0 + int(cols[0]), y0 + ya), (x0 + int(cols[-1]) + 1, y0 + yb)))
+        return bands
@@ -0,0 +1,111 @@
+'''
+FrameNormalizer
+Turn a raw game window frame into the working frame AutoBot perceives:
+cut the title bar, drop alpha channel, check window size and resize to WINDOW_WORKING_SIZE.
+It runs in the capture thread, once per captured frame.
+'''
+# Standard import
+import threading
+
+# Library import
+import cv2
+import numpy as np
+
+# Local import
+from src.utils.common import is_img_16_to_9
+from src.utils.global_var import WINDOW_WORKING_SIZE
+
+class FrameNormalizer:
+    '''
+    FrameNormalizer
+    '''
+    def __init__(self, cfg, is_check_size=True):
+        self.cfg = cfg
+        self.is_check_size = is_check_size # Disable size check for test image
+        self.title_bar_height = cfg["game_window"]["title_bar_height"]
+        self.img_bgra = None # resize buffer for BGRA frames
+        self.shape_src = None # raw frame shape of cached index maps
+        self.xs = None # working frame column -> raw frame column
+        self.ys = None # working frame row -> raw frame row
+        # normalize() is called by capture thread, and by consumer to complete a frame
+        self.lock = threading.Lock()
+
+    def check_size(self, frame_no_title):
+        '''
+        Make sure the window size is as expected.
+        Return error message, or "" if the size is fine
+        '''
+        if not self.is_check_size:
+            return ""
+
+        if self.cfg["bot"]["mode"] == "aux":
+            if not is_img_16_to_9(frame_no_title, self.cfg): # Aux mode allow 16:9 resolution
+                return f"Unexpeted window size: {frame_no_title.shape[:2]} (expect window ratio 16:9)\n"\
+                        "Please use windowed mode & smallest resolution."
+        # Other mode only allow specific resolution
+        elif tuple(self.cfg["game_window"]["size"]) != frame_no_title.shape[:2]:
+            return f"Unexpeted window size: {frame_no_title.shape[:2]} "\
+                   f"(expect {self.cfg['game_window']['size']})\n"\
+                    "Please use windowed mode & smallest resolution."
+        return ""
+
+    def update_index_maps(self, frame_no_title):
+        '''
+        Build nearest neighbor index maps, same sampling as cv2.INTER_NEAREST
+        '''
+        if self.shape_src == frame_no_title.shape[:2]:
+            return
+        h_src, w_src = frame_no_title.shape[:2]
+        w, h = WINDOW_WORKING_SIZE
+        self.xs = np.minimum(np.floor(np.arange(w) * (1.0 / (w / w_src))).astype(np.intp), w_src - 1)
+        self.ys = np.minimum(np.floor(np.arange(h) * (1.0 / (h / h_src))).astype(np.intp), h_src - 1)
+        self.shape_src = frame_no_title.shape[:2]
+
+    def normalize(self, frame, dst=None, rois=None):
+        '''
+        Normalize raw frame into dst.
+
+        Args:
+            frame: raw BGR or BGRA frame, including title bar
+            dst: preallocated working frame buffer, reallocated if None
+            rois: only normalize these (x, y, w, h) regions on working frame,
+                  None for the whole frame. Pixels outside rois are left untouched
+
+        Returns:
+            (img_working, error): img_working is None if the window size is unexpected
+        '''
+        frame_no_title = frame[self.title_bar_height:, :]
+        error = self.check_size(frame_no_title)
+        if error:
+            return None, error
+
+        w, h = WINDOW_WORKING_SIZE
+        if dst is None:
+            dst = np.empty((h, w, 3), dtype=np.uint8)
+
+        if rois is not None:
+            # Copy each region with nearest neighbor index maps
+            self.update_index_maps(frame_no_title)
+            for x, y, rw, rh in rois:
+                dst[y:y+rh, x:x+rw] = frame_no_title[
+                    np.ix_(self.ys[y:y+rh], self.xs[x:x+rw])][:, :, :3]
+            return dst, ""
+
+        with self.lock:
+            self.resize(frame_no_title, dst)
+        return dst, ""
+
+    def resize(self, frame_no_title, dst):
+        '''
+        Resize the whole frame into dst and drop alpha channel
+        '''
+        if frame_no_title.shape[2] == 4:
+            # Resize first, the working frame is about the same size as the raw frame
+            # and cvtColor can write into the contiguous working buffer directly
+            self.img_bgra = cv2.resize(frame_no_title, WINDOW_WORKING_SIZE,
+                                       dst=self.img_bgra,
+                                       interpolation=cv2.INTER_NEAREST)
+            cv2.cvtColor(self.img_bgra, cv2.COLOR_BGRA2BGR, dst=dst)
+        else:
+            cv2.resize(frame_no_title, WINDOW_WORKING_SIZE, dst=dst,
+                       interpolation=cv2.INTER_NEAREST)
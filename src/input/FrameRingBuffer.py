@@ -0,0 +1,187 @@
+'''
+FrameRingBuffer
+Preallocated N-slot frame buffer shared between capture thread and consumers
+'''
+# Standard import
+import time
+import threading
+from collections import namedtuple
+
+# Library import
+import numpy as np
+
+# A captured frame.
+# img: read-only BGR view of the raw frame (no copy)
+# seq: monotonically increasing sequence number, start from 1
+# timestamp: capture time in seconds (time.time())
+# img_working: read-only normalized working frame, None if not normalized
+# error: normalization error message, "" if no error
+# rois: regions normalized on img_working, None if the whole frame is normalized
+CapturedFrame = namedtuple("CapturedFrame",
+                           ["img", "seq", "timestamp", "img_working", "error", "rois"])
+
+class FrameRingBuffer:
+    '''
+    Ring buffer with preallocated slots.
+
+    The producer (capture thread) copies each new frame into the next free slot,
+    so the callback never waits on a consumer. Consumers get read-only views
+    of the latest slot without copying. The slot a consumer thread got last is
+    pinned, the producer never writes into it, so the view stays valid until
+    the same thread gets another frame or calls release().
+    The producer drops frames if every other slot is pinned.
+
+    If a normalizer is given, each slot also keeps a preallocated working frame
+    which is normalized by the producer before the slot is published.
+    Consumers can limit normalization to some regions with set_rois(), and
+    complete() the rest of a frame on demand.
+    '''
+    def __init__(self, num_slots=4, normalizer=None):
+        self.num_slots = max(2, num_slots)
+        self.normalizer = normalizer
+        self.slots = [None] * self.num_slots # preallocated frame buffers
+        self.slots_working = [None] * self.num_slots # normalized working frames
+        self.errors = [""] * self.num_slots # normalization error of each slot
+        self.slots_rois = [None] * self.num_slots # normalized regions of each slot
+        self.rois = None # regions to normalize, None for the whole frame
+        self.seqs = [0] * self.num_slots # sequence number of each slot
+        self.timestamps = [0.0] * self.num_slots # capture time of each slot
+        self.idx_latest = -1 # index of the latest written slot
+        self.pinned = {} # consumer thread id -> index of slot it holds
+        self.seq = 0 # sequence number of the latest frame
+        self.lock = threading.Lock()
+        # Notify consumers that a new frame is available
+        self.cond_new_frame = threading.Condition(self.lock)
+
+    def push(self, img, timestamp=None):
+        '''
+        Copy a new frame into the next free slot and publish it.
+        Return sequence number of the latest frame, which is not this frame if it's dropped
+        '''
+        with self.lock:
+            # Consumers only get the latest slot, any other unpinned slot is free
+            busy = set(self.pinned.values())
+            busy.add(self.idx_latest)
+            idx = next(((self.idx_latest + i) % self.num_slots for i in range(1, self.num_slots)
+                        if (self.idx_latest + i) % self.num_slots not in busy), -1)
+            if idx < 0:
+                return self.seq
+            slot = self.slots[idx]
+
+        # Reallocate this slot when the window is resized. It's swapped in when
+        # published, the latest and pinned slots keep their frames until then
+        if slot is None or slot.shape != img.shape or slot.dtype != img.dtype:
+            slot = np.empty(img.shape, dtype=img.dtype)
+
+        # Copy and normalize outside the lock, the slot is neither latest nor pinned
+        np.copyto(slot, img)
+        error = ""
+        rois = self.rois
+        if self.normalizer is not None:
+            img_working, error = self.normalizer.normalize(
+                                    slot, self.slots_working[idx], rois)
+            if img_working is not None:
+                self.slots_working[idx] = img_working
+
+        with self.lock:
+            self.seq += 1
+            self.slots[idx] = slot
+            self.errors[idx] = error
+            self.slots_rois[idx] = rois
+            self.seqs[idx] = self.seq
+            self.timestamps[idx] = time.time() if timestamp is None else timestamp
+            self.idx_latest = idx
+            self.cond_new_frame.notify_all()
+
+        return self.seq
+
+    def latest(self):
+        '''
+        Get the latest frame as CapturedFrame, return None if no frame yet.
+        Pin it for calling thread
+        '''
+        with self.lock:
+            idx = self.idx_latest
+            if idx < 0:
+                return None
+            self.pinned[threading.get_ident()] = idx
+            return self._make_frame(idx)
+
+    def wait_newer(self, seq_last, timeout):
+        '''
+        Block until a frame newer than seq_last is published.
+
+        Returns:
+            CapturedFrame of the latest frame, or None if timeout
+        '''
+        with self.cond_new_frame:
+            if not self.cond_new_frame.wait_for(lambda: self.seq > seq_last,
+                                                timeout=timeout):
+                return None
+            self.pinned[threading.get_ident()] = self.idx_latest
+            return self._make_frame(self.idx_latest)
+
+    def release(self):
+        '''
+        Unpin the slot calling thread holds, its views must not be used anymore
+        '''
+        with self.lock:
+            self.pinned.pop(threading.get_ident(), None)
+
+    def set_rois(self, rois):
+        '''
+        Set regions the producer normalizes from next frame, None for the whole frame
+        '''
+        self.rois = rois
+
+    def complete(self, seq):
+        '''
+        Normalize the whole working frame of a partially normalized frame.
+
+        Returns:
+            Completed CapturedFrame, or None if the slot was already overwritten
+        '''
+        with self.lock:
+            idx = self.seqs.index(seq) if seq in self.seqs else -1
+            if idx < 0:
+                return None
+            if self.slots_rois[idx] is None or self.errors[idx]:
+                return self._make_frame(idx)
+
+        # The producer doesn't write the slot while the consumer holds it
+        self.normalizer.normalize(self.slots[idx], self.slots_working[idx])
+
+        with self.lock:
+            if self.seqs[idx] != seq:
+                return None
+            self.slots_rois[idx] = None
+            return self._make_frame(idx)
+
+    def latest_crop(self, x, y, w, h):
+        '''
+        Get a read-only view of a region on the latest working frame,
+        for consumers which only need a part of the frame.
+        Return None if no normalized frame yet
+        '''
+        frame = self.latest()
+        if frame is None or frame.img_working is None:
+            return None
+        return frame.img_working[y:y+h, x:x+w]
+
+    def _make_frame(self, idx):
+        '''
+        Wrap slot into a read-only CapturedFrame, caller must hold the lock
+        '''
+        slot = self.slots[idx]
+        # Drop alpha channel by view instead of cv2.cvtColor
+        img = slot[:, :, :3] if slot.ndim == 3 and slot.shape[2] == 4 else slot[...]
+        img.flags.writeable = False
+
+        img_working = None
+        error = self.errors[idx]
+        if self.normalizer is not None and not error:
+            img_working = self.slots_working[idx][...]
+            img_working.flags.writeable = False
+
+        return CapturedFrame(img, self.seqs[idx], self.timestamps[idx],
+                             img_working, error, self.slots_rois[idx])
@@ -4,7 +4,6 @@ python mapleStoryAutoLevelUp.py --map cloud_balcony --monster brown_windup_bear,
 '''
 # Standard import
 import time
-import threading
 
 # Libarary Import
 from windows_capture import WindowsCapture, Frame, InternalCaptureControl
@@ -13,15 +12,19 @@ import cv2
 # local import
 from src.utils.logger import logger
 from src.utils.common import get_game_window_title_by_token, load_image, resize_window
+from src.input.FrameRingBuffer import FrameRingBuffer
+from src.input.FrameNormalizer import FrameNormalizer
 
 class GameWindowCapturor:
     '''
     GameWindowCapturor
     '''
+    can_activate_window = True # Support activate_game_window()
+
     def __init__(self, cfg, test_image_name = None):
         self.cfg = cfg
-        self.frame = None
-        self.lock = threading.Lock()
+        self.frame_buffer = FrameRingBuffer(cfg["system"]["capture_ring_buffer_size"],
+                                            FrameNormalizer(cfg, is_check_size=test_image_name is None))
         self.is_terminated = False
         self.fps = 0
         self.fps_limit = cfg["system"]["fps_limit_window_capturor"]
@@ -31,7 +34,7 @@ class GameWindowCapturor:
 
         # If use test image as input, disable the whole capture thread
         if test_image_name is not None:
-            self.frame = load_image(f"test/{test_image_name}.png")
+            self.frame_buffer.push(load_image(f"test/{test_image_name}.png"))
             return
 
         # Get game window title
@@ -59,10 +62,10 @@ class GameWindowCapturor:
     def on_frame_arrived(self, frame: Frame,
                          capture_control: InternalCaptureControl):
         '''
-        Frame arrived callback: store frame into buffer with lock.
+        Frame arrived callback: copy frame into ring buffer slot.
         '''
-        with self.lock:
-            self.frame = frame.frame_buffer
+        # frame.frame_buffer is only valid inside this callback
+        self.frame_buffer.push(frame.frame_buffer)
         self.limit_fps()
 
     def on_closed(self):
@@ -74,12 +77,43 @@ class GameWindowCapturor:
 
     def get_frame(self):
         '''
-        Safely get latest game window frame.
+        Get latest game window frame as a read-only BGR view.
+        '''
+        frame = self.frame_buffer.latest()
+        if frame is None:
+            return None
+        return frame.img
+
+    def get_latest_frame(self):
+        '''
+        Get latest game window frame with its sequence number and
+        capture timestamp, see CapturedFrame
+        '''
+        return self.frame_buffer.latest()
+
+    def get_frame_crop(self, x, y, w, h):
+        '''
+        Get a read-only view of a region on the latest working frame
+        '''
+        return self.frame_buffer.latest_crop(x, y, w, h)
+
+    def set_rois(self, rois):
+        '''
+        Only normalize these working frame regions from next frame, None for the whole frame
+        '''
+        self.frame_buffer.set_rois(rois)
+
+    def complete_frame(self, seq):
+        '''
+        Normalize the rest of a partially normalized frame, return None if it's gone
+        '''
+        return self.frame_buffer.complete(seq)
+
+    def wait_for_new_frame(self, seq_last, timeout):
+        '''
+        Block until a frame newer than seq_last arrived, return None if timeout
         '''
-        with self.lock:
-            if self.frame is None:
-                return None
-            return cv2.cvtColor(self.frame, cv2.COLOR_BGRA2BGR)
+        return self.frame_buffer.wait_newer(seq_last, timeout)
 
     def stop(self):
         '''
@@ -10,6 +10,8 @@ import Quartz
 
 # Local import
 from src.utils.logger import logger
+from src.input.FrameRingBuffer import FrameRingBuffer
+from src.input.FrameNormalizer import FrameNormalizer
 
 def get_window_title(token):
     '''
@@ -54,10 +56,12 @@ class GameWindowCapturor:
     '''
     GameWindowCapturor for macOS
     '''
+    can_activate_window = False # activate_game_window() only support Windows
+
     def __init__(self, cfg):
         self.cfg = cfg
-        self.frame = None
-        self.lock = threading.Lock()
+        self.frame_buffer = FrameRingBuffer(cfg["system"]["capture_ring_buffer_size"],
+                                            FrameNormalizer(cfg))
         self.is_terminated = False
 
         self.window_title = get_window_title(cfg["game_window"]["title"])
@@ -82,7 +86,7 @@ class GameWindowCapturor:
 
         # Wait frame init
         time.sleep(0.1)
-        while self.frame is None:
+        while self.frame_buffer.latest() is None:
             self.limit_fps()
 
     def start_capture(self):
@@ -121,19 +125,48 @@ class GameWindowCapturor:
         捕捉當前遊戲區域畫面
         '''
         img = self.capture.grab(self.region)
-        frame = np.array(img)
-        with self.lock:
-            self.frame = frame
+        # Wrap mss raw BGRA bytes without extra allocation
+        frame = np.frombuffer(img.raw, dtype=np.uint8).reshape(img.height, img.width, 4)
+        self.frame_buffer.push(frame)
 
     def get_frame(self):
         '''
-        安全地獲取最新的螢幕畫面
+        獲取最新的螢幕畫面 (read-only BGR view)
+        '''
+        frame = self.frame_buffer.latest()
+        if frame is None:
+            return None
+        return frame.img
+
+    def get_latest_frame(self):
+        '''
+        Get latest frame with its sequence number and capture timestamp
+        '''
+        return self.frame_buffer.latest()
+
+    def get_frame_crop(self, x, y, w, h):
+        '''
+        Get a read-only view of a region on the latest working frame
+        '''
+        return self.frame_buffer.latest_crop(x, y, w, h)
+
+    def set_rois(self, rois):
+        '''
+        Only normalize these working frame regions from next frame, None for the whole frame
+        '''
+        self.frame_buffer.set_rois(rois)
+
+    def complete_frame(self, seq):
+        '''
+        Normalize the rest of a partially normalized frame, return None if it's gone
+        '''
+        return self.frame_buffer.complete(seq)
+
+    def wait_for_new_frame(self, seq_last, timeout):
+        '''
+        Block until a frame newer than seq_last arrived, return None if timeout
         '''
-        with self.lock:
-            if self.frame is None:
-                return None
-            # cv2.imwrite("debug_frame.png", self.frame)
-            return cv2.cvtColor(self.frame, cv2.COLOR_BGRA2BGR)
+        return self.frame_buffer.wait_newer(seq_last, timeout)
 
     def on_closed(self):
         '''
@@ -0,0 +1,80 @@
+'''
+HeadlessCapturor
+Capture backend without game window, for debugging and benchmarking on any host.
+It publishes a single static frame: a test image, or a blank frame of expected window size
+'''
+# Library import
+import numpy as np
+
+# Local import
+from src.utils.logger import logger
+from src.utils.common import load_image
+from src.input.FrameRingBuffer import FrameRingBuffer
+from src.input.FrameNormalizer import FrameNormalizer
+
+class HeadlessCapturor:
+    '''
+    HeadlessCapturor
+    '''
+    can_activate_window = False # No game window to activate
+
+    def __init__(self, cfg, test_image_name=None):
+        self.cfg = cfg
+        self.frame_buffer = FrameRingBuffer(cfg["system"]["capture_ring_buffer_size"],
+                                            FrameNormalizer(cfg, is_check_size=test_image_name is None))
+        self.is_terminated = False
+        self.window_title = ""
+        self.fps = 0
+
+        if test_image_name is not None:
+            img = load_image(f"test/{test_image_name}.png")
+        else:
+            h, w = cfg["game_window"]["size"]
+            h += cfg["game_window"]["title_bar_height"]
+            img = np.zeros((h, w, 3), dtype=np.uint8)
+        self.frame_buffer.push(img)
+
+        logger.info("[HeadlessCapturor] Init done")
+
+    def get_frame(self):
+        '''
+        Get the static frame as a read-only BGR view.
+        '''
+        return self.frame_buffer.latest().img
+
+    def get_latest_frame(self):
+        '''
+        Get the static frame with its sequence number and timestamp
+        '''
+        return self.frame_buffer.latest()
+
+    def get_frame_crop(self, x, y, w, h):
+        '''
+        Get a read-only view of a region on the latest working frame
+        '''
+        return self.frame_buffer.latest_crop(x, y, w, h)
+
+    def set_rois(self, rois):
+        '''
+        Only normalize these working frame regions from next frame, None for the whole frame
+        '''
+        self.frame_buffer.set_rois(rois)
+
+    def complete_frame(self, seq):
+        '''
+        Normalize the rest of a partially normalized frame, return None if it's gone
+        '''
+        return self.frame_buffer.complete(seq)
+
+    def wait_for_new_frame(self, seq_last, timeout):
+        '''
+        Static frame never changes, only return it if it hasn't been taken
+        '''
+        return self.frame_buffer.wait_newer(seq_last, timeout)
+
+    def stop(self):
+        '''
+        Nothing to stop
+        '''
+        self.is_terminated = True
+        logger.info("[HeadlessCapturor] Terminated")
@@ -0,0 +1,72 @@
+'''
+HeadlessKeyBoardController
+No-op input backend. Commands are recorded but no key is simulated,
+for debugging and benchmarking on hosts without keyboard/mouse access
+'''
+# Standard Import
+import time
+
+# Local import
+from src.utils.logger import logger
+from src.input.KeyBoardController import set_key_simulation
+
+class HeadlessKeyBoardController():
+    '''
+    HeadlessKeyBoardController
+    Same interface as KeyBoardController
+    '''
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.cmd_action = "none"
+        self.cmd_up_down = "none"
+        self.cmd_left_right = "none"
+        self.fps = 0
+        # Timer
+        self.t_last_screenshot = 0.0
+        self.t_last_skill = 0.0
+        self.t_last_run = time.time()
+        # Flags
+        self.is_enable = True
+        self.is_need_force_heal = False
+        self.is_terminated = False
+
+        # Module-level press_key() is used all over the engine, disable it as well
+        set_key_simulation(False)
+
+        logger.info("[HeadlessKeyBoardController] Init done")
+
+    def toggle_enable(self):
+        '''
+        toggle_enable
+        '''
+        self.is_enable = not self.is_enable
+        logger.info(f"Player pressed F1, is_enable:{self.is_enable}")
+
+    def disable(self):
+        '''
+        disable keyboard controlller
+        '''
+        self.is_enable = False
+
+    def enable(self):
+        '''
+        enable keyboard controlller
+        '''
+        self.is_enable = True
+
+    def set_command(self, new_command):
+        '''
+        Set keyboard command
+        '''
+        self.cmd_left_right, self.cmd_up_down, self.cmd_action = new_command.split()
+
+    def is_game_window_active(self):
+        '''
+        There is no game window
+        '''
+        return False
+
+    def release_all_key(self):
+        '''
+        Nothing to release
+        '''
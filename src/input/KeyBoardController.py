@@ -6,25 +6,40 @@ Simulate user keyboard input to control character in the game
 import threading
 import time
 
-# Library import
-import pyautogui
-from pynput import keyboard
-
 # Local import
 from src.utils.logger import logger
 from src.utils.common import is_mac
 
-if is_mac():
-    import Quartz
-else:
-    import pygetwindow as gw
+# pyautogui is imported on first key press, see get_pyautogui()
+_pyautogui = None
+# Disabled by headless input backend, key_down()/key_up() become no-op
+_is_key_simulation_enabled = True
 
-pyautogui.PAUSE = 0  # remove delay
+def get_pyautogui():
+    '''
+    Lazy import pyautogui, it's slow to import and requires a desktop session
+    '''
+    global _pyautogui
+    if _pyautogui is None:
+        import pyautogui
+        pyautogui.PAUSE = 0  # remove delay
+        _pyautogui = pyautogui
+    return _pyautogui
+
+def set_key_simulation(is_enable):
+    '''
+    Enable/Disable simulated key press for the whole process
+    '''
+    global _is_key_simulation_enabled
+    _is_key_simulation_enabled = is_enable
 
 def key_down(key):
     '''
     Press key down
     '''
+    if not _is_key_simulation_enabled:
+        return
+    pyautogui = get_pyautogui()
     try:
         pyautogui.keyDown(key)
     except pyautogui.FailSafeException:
@@ -35,6 +50,9 @@ def key_up(key):
     '''
     Release key
     '''
+    if not _is_key_simulation_enabled:
+        return
+    pyautogui = get_pyautogui()
     try:
         pyautogui.keyUp(key)
     except pyautogui.FailSafeException:
@@ -45,6 +63,7 @@ def recover_mouse():
     '''
     Move mouse back to center to avoid pyautogui failsafe
     '''
+    pyautogui = get_pyautogui()
     pyautogui.FAILSAFE = False # Temp disasble failsafe to avoid nested exception
 
     screen_w, screen_h = pyautogui.size()
@@ -94,6 +113,7 @@ class KeyBoardController():
 
         # use 'ctrl', 'alt' for mac, because it's hard to get around
         # macOS's security settings
+        from pynput import keyboard
         if is_mac():
             self.toggle_key = keyboard.Key.ctrl
             self.screenshot_key = keyboard.Key.alt
@@ -154,6 +174,7 @@ class KeyBoardController():
         - False
         '''
         if is_mac():
+            import Quartz
             active_window = Quartz.CGWindowListCopyWindowInfo(
                 Quartz.kCGWindowListOptionOnScreenOnly | Quartz.kCGWindowListExcludeDesktopElements,
                 Quartz.kCGNullWindowID
@@ -164,6 +185,7 @@ class KeyBoardController():
                     return True
             return False
         else:
+            import pygetwindow as gw
             try:
                 active_window = gw.getActiveWindow()
                 if not active_window:
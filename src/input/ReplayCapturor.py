@@ -0,0 +1,208 @@
+'''
+ReplayCapturor
+Feed recorded game window frames into AutoBot, as a drop-in replacement of GameWindowCapturor
+
+Supported recordings:
+    - Directory of PNG images, played in file name order.
+      Optional 'timestamps.txt' (one timestamp in seconds per line) gives recorded timing.
+    - Video file (.mp4, .avi, ...), timing from the video timestamps.
+    - Raw recording (.npy) with shape (N, H, W, C), loaded as memory map.
+      Optional '<name>.timestamps.npy' gives recorded timing.
+
+Execute this script:
+python -m src.engine.MapleStoryAutoLevelUp --replay recordings/session_1 --replay_speed 0 --disable_control
+'''
+# Standard import
+import os
+import glob
+import time
+import threading
+
+# Library import
+import cv2
+import numpy as np
+
+# Local import
+from src.utils.logger import logger
+from src.input.FrameRingBuffer import FrameRingBuffer
+from src.input.FrameNormalizer import FrameNormalizer
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov")
+
+class ReplayCapturor:
+    '''
+    ReplayCapturor
+
+    speed == 1.0: replay at recorded timestamps
+    speed >  1.0: replay faster than recorded
+    speed == 0.0: replay as fast as possible. The next frame is only published
+                  after AutoBot took the previous one, so no frame is dropped.
+    '''
+    can_activate_window = False # No game window to activate
+
+    def __init__(self, cfg, path, speed=1.0, is_loop=False):
+        self.cfg = cfg
+        self.path = path
+        self.speed = speed
+        self.is_loop = is_loop
+        self.frame_buffer = FrameRingBuffer(cfg["system"]["capture_ring_buffer_size"],
+                                            FrameNormalizer(cfg))
+        self.is_terminated = False
+        self.is_finished = False # True after the last frame is published
+        self.window_title = "" # There is no game window to control
+        self.fps = 0
+        self.seq_consumed = 0 # latest frame sequence number taken by consumer
+        self.event_consumed = threading.Event()
+
+        if not os.path.exists(path):
+            raise RuntimeError(f"[ReplayCapturor] Recording not found: {path}")
+
+        # Start replay thread
+        self.thread = threading.Thread(target=self.replay, daemon=True)
+        self.thread.start()
+
+        logger.info(f"[ReplayCapturor] Replay {path} with speed {speed}")
+
+    def iter_frames(self):
+        '''
+        Yield (img, timestamp) from recording. timestamp is None if unknown
+        '''
+        if os.path.isdir(self.path):
+            files = sorted(glob.glob(os.path.join(self.path, "*.png")))
+            timestamps = [None] * len(files)
+            path_timestamps = os.path.join(self.path, "timestamps.txt")
+            if os.path.exists(path_timestamps):
+                with open(path_timestamps, "r", encoding="utf-8") as f:
+                    timestamps = [float(line) for line in f if line.strip()]
+            for file, timestamp in zip(files, timestamps):
+                img = cv2.imread(file, cv2.IMREAD_UNCHANGED)
+                if img is None:
+                    logger.warning(f"[ReplayCapturor] Failed to load {file}")
+                    continue
+                yield img, timestamp
+
+        elif self.path.lower().endswith(".npy"):
+            frames = np.load(self.path, mmap_mode="r")
+            timestamps = [None] * len(frames)
+            path_timestamps = self.path[:-len(".npy")] + ".timestamps.npy"
+            if os.path.exists(path_timestamps):
+                timestamps = np.load(path_timestamps).tolist()
+            for img, timestamp in zip(frames, timestamps):
+                yield img, timestamp
+
+        elif self.path.lower().endswith(VIDEO_EXTENSIONS):
+            cap = cv2.VideoCapture(self.path)
+            if not cap.isOpened():
+                raise RuntimeError(f"[ReplayCapturor] Unable to open video: {self.path}")
+            try:
+                while True:
+                    ret, img = cap.read()
+                    if not ret:
+                        break
+                    yield img, cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            finally:
+                cap.release()
+
+        else:
+            raise RuntimeError(f"[ReplayCapturor] Unsupported recording: {self.path}")
+
+    def replay(self):
+        '''
+        Replay thread: publish recorded frames into ring buffer
+        '''
+        # Use capture FPS limit as timing if recording doesn't have timestamps
+        dt_default = 1.0 / self.cfg["system"]["fps_limit_window_capturor"]
+        while not self.is_terminated:
+            t_start = time.time()
+            timestamp_start = None
+            num_frames = 0
+            for img, timestamp in self.iter_frames():
+                if self.is_terminated:
+                    return
+
+                # Wait until recorded time is reached
+                if timestamp is None:
+                    timestamp = num_frames * dt_default
+                if timestamp_start is None:
+                    timestamp_start = timestamp
+                if self.speed > 0:
+                    t_target = t_start + (timestamp - timestamp_start) / self.speed
+                    dt = t_target - time.time()
+                    if dt > 0:
+                        time.sleep(dt)
+
+                seq = self.frame_buffer.push(img)
+                num_frames += 1
+
+                # Wait until consumer took the frame
+                if self.speed <= 0:
+                    while self.seq_consumed < seq and not self.is_terminated:
+                        self.event_consumed.wait(timeout=0.1)
+                        self.event_consumed.clear()
+
+            logger.info(f"[ReplayCapturor] Replayed {num_frames} frames in "
+                        f"{round(time.time() - t_start, 2)} seconds")
+            if num_frames == 0 or not self.is_loop:
+                break
+
+        self.is_finished = True
+
+    def get_frame(self):
+        '''
+        Get latest replay frame as a read-only BGR view.
+        '''
+        frame = self.get_latest_frame()
+        if frame is None:
+            return None
+        return frame.img
+
+    def get_latest_frame(self):
+        '''
+        Get latest replay frame with its sequence number and timestamp
+        '''
+        frame = self.frame_buffer.latest()
+        if frame is not None:
+            self.mark_consumed(frame.seq)
+        return frame
+
+    def get_frame_crop(self, x, y, w, h):
+        '''
+        Get a read-only view of a region on the latest working frame
+        '''
+        return self.frame_buffer.latest_crop(x, y, w, h)
+
+    def set_rois(self, rois):
+        '''
+        Only normalize these working frame regions from next frame, None for the whole frame
+        '''
+        self.frame_buffer.set_rois(rois)
+
+    def complete_frame(self, seq):
+        '''
+        Normalize the rest of a partially normalized frame, return None if it's gone
+        '''
+        return self.frame_buffer.complete(seq)
+
+    def wait_for_new_frame(self, seq_last, timeout):
+        '''
+        Block until a frame newer than seq_last arrived, return None if timeout
+        '''
+        frame = self.frame_buffer.wait_newer(seq_last, timeout)
+        if frame is not None:
+            self.mark_consumed(frame.seq)
+        return frame
+
+    def mark_consumed(self, seq):
+        '''
+        Let replay thread publish next frame
+        '''
+        self.seq_consumed = max(self.seq_consumed, seq)
+        self.event_consumed.set()
+
+    def stop(self):
+        '''
+        Stop replay thread
+        '''
+        self.is_terminated = True
+        self.event_consumed.set()
+        logger.info("[ReplayCapturor] Terminated")
@@ -0,0 +1,90 @@
+'''
+Capture and input backend registry
+
+Backends are registered as loader functions that import them only when selected,
+so platform-specific packages (windows-capture, mss, Quartz, pyautogui, ...)
+are never imported on hosts that don't use them.
+Loaders use plain import statements, so PyInstaller still finds and bundles them.
+'''
+# Local import
+from src.utils.common import is_mac, is_windows
+
+def load_windows_capturor():
+    from src.input.GameWindowCapturor import GameWindowCapturor
+    return GameWindowCapturor
+
+def load_mac_capturor():
+    from src.input.GameWindowCapturorForMac import GameWindowCapturor
+    return GameWindowCapturor
+
+def load_replay_capturor():
+    from src.input.ReplayCapturor import ReplayCapturor
+    return ReplayCapturor
+
+def load_headless_capturor():
+    from src.input.HeadlessCapturor import HeadlessCapturor
+    return HeadlessCapturor
+
+def load_keyboard_controller():
+    from src.input.KeyBoardController import KeyBoardController
+    return KeyBoardController
+
+def load_headless_keyboard_controller():
+    from src.input.HeadlessKeyBoardController import HeadlessKeyBoardController
+    return HeadlessKeyBoardController
+
+# name -> loader returning backend class
+CAPTURE_BACKENDS = {
+    "windows" : load_windows_capturor,
+    "mac"     : load_mac_capturor,
+    "replay"  : load_replay_capturor,
+    "headless": load_headless_capturor,
+}
+
+INPUT_BACKENDS = {
+    "pyautogui": load_keyboard_controller,
+    "headless" : load_headless_keyboard_controller,
+}
+
+def resolve_capture_backend(name):
+    '''
+    Resolve "auto" to the native capture backend of current platform
+    '''
+    if name != "auto":
+        return name
+    if is_windows():
+        return "windows"
+    if is_mac():
+        return "mac"
+    return "headless"
+
+def resolve_input_backend(name):
+    '''
+    Resolve "auto" to the native input backend of current platform
+    '''
+    if name != "auto":
+        return name
+    if is_windows() or is_mac():
+        return "pyautogui"
+    return "headless"
+
+def load_backend(registry, name):
+    '''
+    Import backend module and return backend class
+    '''
+    if name not in registry:
+        raise ValueError(f"Unsupported backend: {name}, "
+                         f"options: {list(registry.keys())}")
+    return registry[name]()
+
+def get_capture_backend(name):
+    '''
+    Get capture backend class by name, e.g. "auto" "windows" "headless"
+    '''
+    return load_backend(CAPTURE_BACKENDS, resolve_capture_backend(name))
+
+def get_input_backend(name):
+    '''
+    Get input backend class by name, e.g. "auto" "pyautogui" "headless"
+    '''
+    return load_backend(INPUT_BACKENDS, resolve_input_backend(name))
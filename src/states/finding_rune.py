@@ -26,7 +26,7 @@ class FindingRuneState(State):
     def check_transitions(self):
         # Check whether in arrow box mini game
         if self.bot.rune_solver.is_in_rune_game(
-            self.bot.img_frame, self.bot.img_frame_debug):
+            self.bot.ctx, self.bot.img_frame_debug):
             return "solving_rune"
 
         elif self.bot.rune_solver.loc_rune is not None:
@@ -38,7 +38,7 @@ class FindingRuneState(State):
     def on_frame(self):
         # Update rune location on screen
         self.bot.rune_solver.update_rune_location(
-                self.bot.img_frame,
+                self.bot.ctx,
                 self.bot.img_frame_debug,
                 self.bot.loc_player
         )
@@ -49,7 +49,7 @@ class FindingRuneState(State):
 
         # Stop attacking if "Please solve rune before hunting" shows on screen
         if self.bot.rune_solver.is_rune_warning(
-            self.bot.img_frame_gray, self.bot.img_frame_debug):
+            self.bot.ctx, self.bot.img_frame_debug):
             self.disable_attack()
 
         # Get commend from route map
@@ -9,9 +9,9 @@ class HuntingState(State):
 
     def check_transitions(self):
         if self.bot.rune_solver.is_rune_enable(
-            self.bot.img_frame_gray, self.bot.img_frame_debug) or \
+            self.bot.ctx, self.bot.img_frame_debug) or \
             self.bot.rune_solver.is_rune_warning(
-            self.bot.img_frame_gray, self.bot.img_frame_debug):
+            self.bot.ctx, self.bot.img_frame_debug):
             # When "Rune enable" message appears on screen
             self.bot.screenshot_img_frame()
 
@@ -18,7 +18,7 @@ class NearRuneState(State):
 
     def check_transitions(self):
         if self.bot.rune_solver.is_in_rune_game(
-            self.bot.img_frame, self.bot.img_frame_debug):
+            self.bot.ctx, self.bot.img_frame_debug):
             # Check whether in arrow box mini game
             return "solving_rune"
 
@@ -33,7 +33,7 @@ class NearRuneState(State):
     def on_frame(self):
         # Update rune location on screen
         self.bot.rune_solver.update_rune_location(
-                self.bot.img_frame,
+                self.bot.ctx,
                 self.bot.img_frame_debug,
                 self.bot.loc_player
         )
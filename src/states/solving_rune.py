@@ -13,7 +13,7 @@ class SolvingRuneState(State):
 
     def check_transitions(self):
         if not self.bot.rune_solver.is_in_rune_game(
-            self.bot.img_frame, self.bot.img_frame_debug):
+            self.bot.ctx, self.bot.img_frame_debug):
             # Not in arrow minigame anymore
             return "hunting"
         else:
@@ -21,4 +21,4 @@ class SolvingRuneState(State):
 
     def on_frame(self):
         self.bot.rune_solver.solve_rune(
-            self.bot.img_frame, self.bot.img_frame_debug)
+            self.bot.ctx, self.bot.img_frame_debug)
@@ -36,6 +36,9 @@ class AutoBotController(QObject):
                 is_ui=True,
                 disable_viz=True,
                 test_image='',
+                replay='',
+                replay_speed=1.0,
+                replay_loop=False,
                 init_state='',
             )
             self.auto_bot = MapleStoryAutoBot(args)
@@ -0,0 +1,120 @@
+'''
+Binary contour matching utility
+
+Matches black-line masks without blurring or floating-point template matching.
+A template is reduced to a few sampled points:
+    contour points:  black pixels of the template
+    interior points: template pixels far from any black pixel of the template
+Mismatch count of an offset is the XOR popcount of the two binary masks,
+sampled at the template points, with a tolerance radius for contours:
+    contour point without any black ROI pixel within the radius
+    interior point on a black ROI pixel
+'''
+# Library import
+import cv2
+import numpy as np
+
+# Local import
+from src.utils.buffer_pool import buffer_pool
+from src.utils.common import resize_by_scale
+
+MAX_POINTS = 255 # Mismatch counts are accumulated in uint8
+SPARSE_RATIO = 0.01 # Count remaining points only at surviving offsets below this ratio
+
+def binarize(mask, scale=1.0, dst=None):
+    '''
+    Downscale 0/255 mask and binarize to 0/1,
+    a pixel is set if any part of it was set, so thin lines survive downscaling
+    '''
+    mask = resize_by_scale(mask, scale)
+    return cv2.threshold(mask, 0, 1, cv2.THRESH_BINARY, dst=dst)[1]
+
+def get_tolerance_kernel(radius):
+    '''
+    Disk structuring element of radius
+    '''
+    return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2*radius + 1, 2*radius + 1))
+
+def sample_points(mask, max_points):
+    '''
+    Evenly sample (x, y) of non-zero pixels of mask in row-major order,
+    returns (n, 2) int32 array
+    '''
+    ys, xs = np.nonzero(mask)
+    if len(xs) > max_points:
+        idx = np.linspace(0, len(xs) - 1, max_points).round().astype(np.intp)
+        xs, ys = xs[idx], ys[idx]
+    return np.stack((xs, ys), axis=1).astype(np.int32)
+
+def get_template_points(black, foreground, radius, max_points):
+    '''
+    Sample template points for match_points().
+
+    black:      0/1 black-line mask of template
+    foreground: 0/1 mask of template pixels, 0 for background
+    Returns:
+        (contour_points, interior_points)
+    '''
+    max_points = min(max_points, MAX_POINTS)
+    contour_points = sample_points(black, max_points // 2)
+    # Keep interior points out of the tolerance band, contours may shift by radius
+    near = cv2.dilate(black, get_tolerance_kernel(radius + 1))
+    interior = cv2.bitwise_and(foreground, 1 - near)
+    interior_points = sample_points(interior, max_points - len(contour_points))
+    return contour_points, interior_points
+
+def get_match_planes(black, radius):
+    '''
+    Mismatch planes of 0/1 black-line ROI mask.
+
+    Returns:
+        (miss, extra): miss is 1 where no black pixel within radius, for contour points,
+                       extra is 1 on black pixels, for interior points
+    '''
+    near = cv2.dilate(black, get_tolerance_kernel(radius),
+                      dst=buffer_pool.get(black.shape, np.uint8, "binary_near"))
+    miss = np.subtract(1, near, out=near)
+    return miss, black
+
+def match_points(planes, contour_points, interior_points, size, max_mismatch):
+    '''
+    Find offsets of ROI where at most max_mismatch template points mismatch.
+
+    Mismatch counts are accumulated densely over the whole ROI only until
+    almost every offset has more than max_mismatch mismatches (contour points
+    rarely hit black pixels of background), remaining points are only counted
+    at the surviving offsets.
+
+    planes: get_match_planes() of ROI
+    size: (h, w) of template
+    Returns:
+        (xs, ys, counts) of offsets in row-major order, empty if template is bigger than ROI
+    '''
+    miss, extra = planes
+    h, w = size
+    h_res, w_res = miss.shape[0] - h + 1, miss.shape[1] - w + 1
+    empty = np.zeros(0, dtype=np.intp)
+    if h_res <= 0 or w_res <= 0:
+        return empty, empty, empty.astype(np.uint8)
+
+    # Contour points first, they reject background offsets
+    points = [(miss, x, y) for x, y in contour_points.tolist()] + \
+             [(extra, x, y) for x, y in interior_points.tolist()]
+
+    count = buffer_pool.get((h_res, w_res), np.uint8, "binary_match")
+    count.fill(0)
+    num_dense = 0
+    for plane, x, y in points:
+        cv2.add(count, plane[y:y+h_res, x:x+w_res], dst=count)
+        num_dense += 1
+        if num_dense > max_mismatch and num_dense % 8 == 0 and \
+           np.count_nonzero(count <= max_mismatch) <= count.size * SPARSE_RATIO:
+            break
+
+    # Planes and count may be views of larger pooled buffers, index them by row and column
+    ys, xs = np.nonzero(count <= max_mismatch)
+    counts = count[ys, xs]
+    for plane, x, y in points[num_dense:]:
+        counts += plane[ys + y, xs + x]
+    is_match = counts <= max_mismatch
+    return xs[is_match], ys[is_match], counts[is_match]
@@ -0,0 +1,87 @@
+'''
+Box geometry utility
+
+Vectorized operations over many axis-aligned boxes at once.
+A box is (x1, y1, x2, y2), boxes is a (n, 4) float64 array.
+'''
+# Library import
+import numpy as np
+
+def to_boxes(positions, sizes):
+    '''
+    Build boxes from top-left (x, y) positions and (w, h) sizes
+    '''
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    sizes = np.asarray(sizes, dtype=np.float64).reshape(-1, 2)
+    return np.concatenate((positions, positions + sizes), axis=1)
+
+def get_areas(boxes):
+    '''
+    Area of each box
+    '''
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+def get_centers(boxes):
+    '''
+    Integer (x, y) center of each box, x1 + w // 2
+    '''
+    return np.stack((boxes[:, 0] + (boxes[:, 2] - boxes[:, 0]) // 2,
+                     boxes[:, 1] + (boxes[:, 3] - boxes[:, 1]) // 2), axis=1)
+
+def get_intersection_areas(boxes, box):
+    '''
+    Intersection area of each box with one query box
+    '''
+    x1, y1, x2, y2 = box
+    iw = np.minimum(boxes[:, 2], x2) - np.maximum(boxes[:, 0], x1)
+    ih = np.minimum(boxes[:, 3], y2) - np.maximum(boxes[:, 1], y1)
+    return np.maximum(iw, 0) * np.maximum(ih, 0)
+
+def get_iou_matrix(boxes_a, boxes_b):
+    '''
+    (n, m) IoU between every box of boxes_a and every box of boxes_b, 0.0 if no overlap
+    '''
+    iw = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2]) - \
+         np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    ih = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3]) - \
+         np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    inter = np.maximum(iw, 0) * np.maximum(ih, 0)
+    union = get_areas(boxes_a)[:, None] + get_areas(boxes_b)[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=inter > 0)
+
+def greedy_nms(boxes, scores, iou_threshold, is_lower_better=False):
+    '''
+    Greedy non-maximum suppression, keep the best box and drop boxes
+    overlapping it with IoU >= iou_threshold (0.0 = any overlap),
+    then repeat on the remaining boxes. Boxes of the same score keep input order.
+
+    Returns:
+        indices of kept boxes, best first
+    '''
+    scores = np.asarray(scores, dtype=np.float64)
+    order = np.argsort(scores if is_lower_better else -scores, kind="stable")
+    boxes = boxes[order]
+
+    is_alive = np.ones(len(order), dtype=bool) # in order of order
+    keep = []
+    for rank in range(len(order)):
+        if not is_alive[rank]:
+            continue
+        keep.append(order[rank])
+        iou = get_iou_matrix(boxes[rank:rank+1], boxes[rank+1:])[0]
+        is_alive[rank+1:] &= (iou < iou_threshold) | (iou == 0.0)
+    return np.array(keep, dtype=np.intp)
+
+def get_nearest_box(boxes, point, is_valid=None):
+    '''
+    Index of the box whose center is nearest to point in Manhattan distance,
+    only among boxes where is_valid. First box wins a tie, -1 if none.
+    '''
+    if len(boxes) == 0:
+        return -1
+    distances = np.abs(get_centers(boxes) - np.asarray(point, dtype=np.float64)).sum(axis=1)
+    if is_valid is not None:
+        if not is_valid.any():
+            return -1
+        distances = np.where(is_valid, distances, np.inf)
+    return int(np.argmin(distances))
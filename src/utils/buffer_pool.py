@@ -0,0 +1,72 @@
+'''
+Global image buffer pool
+
+Per-frame intermediates (padded images, masks, match results) are written into
+reused buffers via OpenCV dst=/result= and NumPy out= instead of new arrays.
+'''
+# Standard Import
+import threading
+from collections import OrderedDict
+
+# Library import
+import numpy as np
+
+class BufferPool:
+    '''
+    Buffers keyed by (thread, tag, dtype, channels).
+
+    ROI sizes change every frame, so each key keeps one buffer grown to the
+    largest height and width requested, and returns a top-left view of it.
+    Views are not contiguous unless the full width is used.
+    A buffer is only reused by the same tag, so two intermediates alive at the
+    same time must use different tags. The content of a returned buffer is
+    undefined, it's overwritten the next time the same key is requested.
+    '''
+    def __init__(self, max_buffers=128):
+        self.max_buffers = max_buffers # Drop least recently used buffer beyond this
+        self.buffers = OrderedDict()
+        self.lock = threading.Lock()
+        self.num_allocs = 0 # number of allocations since last new_frame()
+
+    def get(self, shape, dtype=np.uint8, tag=""):
+        '''
+        Get a reused buffer view with given shape and dtype
+        '''
+        shape = tuple(shape)
+        # Only height and width grow, channels must match for OpenCV to write into the view
+        key = (threading.get_ident(), tag, np.dtype(dtype), len(shape), shape[2:])
+        with self.lock:
+            buf = self.buffers.get(key)
+            if buf is not None:
+                self.buffers.move_to_end(key)
+                if all(n <= m for n, m in zip(shape[:2], buf.shape)):
+                    return buf[tuple(slice(n) for n in shape[:2])]
+                shape_alloc = tuple(max(n, m) for n, m in zip(shape[:2], buf.shape)) + shape[2:]
+            else:
+                shape_alloc = shape
+
+            buf = np.empty(shape_alloc, dtype=dtype)
+            self.buffers[key] = buf
+            self.num_allocs += 1
+            if len(self.buffers) > self.max_buffers:
+                self.buffers.popitem(last=False)
+            return buf[tuple(slice(n) for n in shape[:2])]
+
+    def copy(self, img, tag=""):
+        '''
+        Copy img into a reused buffer, replacement of img.copy()
+        '''
+        buf = self.get(img.shape, img.dtype, tag)
+        np.copyto(buf, img)
+        return buf
+
+    def new_frame(self):
+        '''
+        Start a new frame, return number of allocations during last frame
+        '''
+        with self.lock:
+            num_allocs = self.num_allocs
+            self.num_allocs = 0
+        return num_allocs
+
+buffer_pool = BufferPool()
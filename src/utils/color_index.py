@@ -0,0 +1,71 @@
+'''
+Exact color lookup utility
+
+3-channel uint8 images are packed into one uint32 per pixel, so a pixel
+can be compared against many target colors in a single pass with a sorted
+lookup table, instead of one np.all(img == color, axis=2) per color.
+Channel order doesn't matter as long as image and colors use the same order.
+'''
+# Library import
+import cv2
+import numpy as np
+
+def pack_color(color):
+    '''
+    Pack a 3-channel color into uint32, same layout as pack_image()
+    '''
+    c0, c1, c2 = (int(c) for c in color)
+    return np.uint32(c0 | (c1 << 8) | (c2 << 16) | (0xFF << 24))
+
+def pack_image(img):
+    '''
+    Pack a (h, w, 3) uint8 image into (h, w) uint32, one pass by cv2.cvtColor
+    '''
+    img_4ch = cv2.cvtColor(np.ascontiguousarray(img), cv2.COLOR_BGR2BGRA) # alpha = 255
+    return img_4ch.view("<u4")[:, :, 0]
+
+def color_mask(img, color):
+    '''
+    Get mask (0 or 255) of pixels exactly equal to color
+    '''
+    color = tuple(int(c) for c in color)
+    return cv2.inRange(img, color, color)
+
+class ColorIndex:
+    '''
+    Classify pixels against many target colors in a single pass.
+
+    colors: list of 3-channel colors, label of colors[i] is i
+    '''
+    def __init__(self, colors):
+        self.colors = [tuple(int(c) for c in color) for color in colors]
+        keys = np.array([pack_color(color) for color in self.colors], dtype=np.uint32)
+        self.order = np.argsort(keys, kind="stable").astype(np.int32)
+        self.keys = keys[self.order] # sorted packed colors
+
+    def lookup(self, img):
+        '''
+        Returns:
+            (idx, hit): index into sorted keys, and whether the pixel is a target color
+        '''
+        packed = pack_image(img)
+        if len(self.keys) == 0:
+            return np.zeros(packed.shape, dtype=np.intp), np.zeros(packed.shape, dtype=bool)
+        idx = np.searchsorted(self.keys, packed)
+        np.minimum(idx, len(self.keys) - 1, out=idx)
+        return idx, self.keys[idx] == packed
+
+    def label_map(self, img):
+        '''
+        Get (h, w) int32 label map, label is index of colors, -1 for other pixels
+        '''
+        idx, hit = self.lookup(img)
+        if len(self.keys) == 0:
+            return np.full(hit.shape, -1, dtype=np.int32)
+        return np.where(hit, self.order[idx], -1).astype(np.int32)
+
+    def mask(self, img):
+        '''
+        Get (h, w) bool mask of pixels equal to any target color
+        '''
+        return self.lookup(img)[1]
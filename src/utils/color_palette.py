@@ -0,0 +1,49 @@
+'''
+Coarse color palette utility
+
+Colors are quantized to 256 bins of 3-3-2 bits (R, G, B) by one lookup table
+pass, so an image's palette is a 256-bin histogram computed by cv2.calcHist.
+Blue has the fewest bits, it varies the least between monster sprites.
+'''
+# Library import
+import cv2
+import numpy as np
+
+NUM_BINS = 256
+
+# Per channel lookup table of BGR image, bins of each channel don't overlap
+_LUT = np.stack([
+    (np.arange(256) >> 6),          # B, 2 bits
+    (np.arange(256) >> 5) << 2,     # G, 3 bits
+    (np.arange(256) >> 5) << 5,     # R, 3 bits
+], axis=1).astype(np.uint8).reshape(256, 1, 3)
+
+def quantize(img):
+    '''
+    Quantize (h, w, 3) BGR uint8 image to (h, w) uint8 palette bins
+    '''
+    img_bins = cv2.LUT(np.ascontiguousarray(img), _LUT)
+    # Channel bins don't overlap, sum of channels is their bitwise or
+    return cv2.transform(img_bins, np.ones((1, 3), dtype=np.float32))
+
+def get_palette_hist(img, mask=None):
+    '''
+    (256,) float32 pixel count of each palette bin of BGR image,
+    only pixels where mask is nonzero if mask is given
+    '''
+    return cv2.calcHist([quantize(img)], [0], mask, [NUM_BINS], [0, NUM_BINS]).reshape(-1)
+
+def get_dominant_bins(hist, coverage):
+    '''
+    (256,) bool mask of the fewest bins covering coverage of pixels in hist.
+    Bin 0 (black and near black) is never dominant, contours and shadows
+    are black on every monster and most of the screen.
+    '''
+    hist = np.array(hist, dtype=np.float64)
+    hist[0] = 0
+    order = np.argsort(-hist, kind="stable")
+    num_bins = np.searchsorted(np.cumsum(hist[order]), coverage * hist.sum()) + 1
+    is_dominant = np.zeros(NUM_BINS, dtype=bool)
+    is_dominant[order[:num_bins]] = True
+    is_dominant &= hist > 0
+    return is_dominant
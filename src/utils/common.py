@@ -17,22 +17,20 @@ import time
 # Libarary Import
 import numpy as np
 import yaml
-import pyautogui
-import pygetwindow as gw
-from ruamel.yaml import YAML
 
-# macOS Import
-if platform.system() == 'Darwin':
-    import Quartz
-else:
-    import win32gui
-    import win32con
+# Platform-specific packages (pyautogui, pygetwindow, Quartz, win32gui)
+# are imported inside the functions that need them, so this module can be
+# imported on any host
 
 # Local import
 from src.utils.logger import logger
 from src.utils.global_var import WINDOW_WORKING_SIZE
+from src.utils.buffer_pool import buffer_pool
+from src.utils.color_index import ColorIndex, color_mask
+from src.utils.box_geometry import to_boxes, greedy_nms
 
 OS_NAME = platform.system()
+MAX_PEAK_CANDIDATES = 1024 # Find local minima by erosion first beyond this many candidates
 
 def is_mac():
     return OS_NAME == 'Darwin'
@@ -47,6 +45,7 @@ def load_yaml(path):
         return convert_lists_to_tuples(data)
 
 def load_yaml_with_comments(path):
+    from ruamel.yaml import YAML
     yaml = YAML()
     yaml.preserve_quotes = True
     with open(path, 'r', encoding='utf-8') as f:
@@ -76,6 +75,16 @@ def save_yaml(data, path):
         yaml.dump(data, f, default_flow_style=False)
     logger.info(f"Save yaml: {path}")
 
+def save_atomic(path, write):
+    '''
+    Save file by write(f) with binary file object f.
+    Write to a temp file first and replace path with it, never leave a half written file
+    '''
+    path_tmp = path + ".tmp"
+    with open(path_tmp, 'wb') as f:
+        write(f)
+    os.replace(path_tmp, path)
+
 def get_cfg_diff(base, current):
     """
     Recursively compute the diff between base and current configs.
@@ -176,55 +185,11 @@ def nms(monsters, iou_threshold=0.3):
     Returns:
     - List of filtered monster dictionaries after applying NMS
     '''
-    boxes = []
-    for m in monsters:
-        x, y = m["position"]
-        w, h = m["size"]
-        # [x1, y1, x2, y2, score, original_data]
-        boxes.append([x, y, x + w, y + h, m["score"], m])
-
-    # Sort by score descending
-    boxes.sort(key=lambda x: x[4], reverse=True)
-
-    keep = []
-    while boxes:
-        best = boxes.pop(0)
-        keep.append(best[5])  # original monster_info
-
-        boxes = [b for b in boxes if get_iou(best, b) < iou_threshold]
-
-    return keep
-
-def get_iou(box1, box2):
-    '''
-    Calculate the Intersection over Union (IoU) between two bounding boxes.
-
-    Each box is expected to be a tuple or list with at least 4 values:
-    (x1, y1, x2, y2), where:
-        - (x1, y1) is the top-left corner
-        - (x2, y2) is the bottom-right corner
-
-    Returns:
-        A float representing the IoU value (0.0 ~ 1.0).
-        If there is no overlap, returns 0.0.
-    '''
-    x1, y1, x2, y2 = box1[:4]
-    x1_p, y1_p, x2_p, y2_p = box2[:4]
-
-    inter_x1 = max(x1, x1_p)
-    inter_y1 = max(y1, y1_p)
-    inter_x2 = min(x2, x2_p)
-    inter_y2 = min(y2, y2_p)
-
-    if inter_x2 <= inter_x1 or inter_y2 <= inter_y1:
-        return 0.0
-
-    inter_area = (inter_x2 - inter_x1) * (inter_y2 - inter_y1)
-    area1 = (x2 - x1) * (y2 - y1)
-    area2 = (x2_p - x1_p) * (y2_p - y1_p)
-    union = area1 + area2 - inter_area
-
-    return inter_area / union
+    if not monsters:
+        return []
+    boxes = to_boxes([m["position"] for m in monsters], [m["size"] for m in monsters])
+    keep = greedy_nms(boxes, [m["score"] for m in monsters], iou_threshold)
+    return [monsters[i] for i in keep]
 
 def screenshot(img, suffix="screenshot"):
     '''
@@ -285,17 +250,97 @@ def pad_to_size(img, size, pad_value=0):
             left  = pad_w // 2,
             right = pad_w - pad_w // 2,
             borderType=cv2.BORDER_CONSTANT,
-            value=pad_value
+            value=pad_value,
+            dst=buffer_pool.get((h_img + pad_h, w_img + pad_w) + img.shape[2:],
+                                img.dtype, "pad_to_size")
         )
 
     return img
 
+def get_match_result_buffer(img, img_pattern, tag="match_result"):
+    '''
+    Get a reused cv2.matchTemplate() result buffer
+    '''
+    h, w = img.shape[:2]
+    h_pattern, w_pattern = img_pattern.shape[:2]
+    return buffer_pool.get((h - h_pattern + 1, w - w_pattern + 1), np.float32, tag)
+
+def select_peaks(xs, ys, scores, footprint, max_peaks):
+    '''
+    Greedy pick lowest score candidates, dropping candidates within
+    half footprint (w, h) of a picked one, at most max_peaks.
+
+    Returns:
+        (xs, ys, scores) of picked candidates, lowest score first
+    '''
+    order = np.argsort(scores, kind="stable")
+    xs, ys, scores = xs[order], ys[order], scores[order]
+    half_w, half_h = footprint[0] // 2, footprint[1] // 2
+
+    is_alive = np.ones(len(xs), dtype=bool)
+    picked = []
+    while len(picked) < max_peaks:
+        idx_alive = np.flatnonzero(is_alive)
+        if len(idx_alive) == 0:
+            break
+        i = idx_alive[0] # lowest score alive candidate
+        picked.append(i)
+        is_alive &= (np.abs(xs - xs[i]) > half_w) | (np.abs(ys - ys[i]) > half_h)
+    return xs[picked], ys[picked], scores[picked]
+
+def find_match_peaks(res, thres, footprint, max_peaks):
+    '''
+    Find local minima of a cv2.matchTemplate() TM_SQDIFF result under thres.
+
+    A peak is the minimum within the template footprint (w, h) around it,
+    so a blob of similar scores gives one detection instead of every pixel.
+    max_peaks = 0 keeps every pixel under thres.
+
+    Returns:
+        (xs, ys, scores) of peaks
+    '''
+    if max_peaks == 0:
+        ys, xs = np.where(res <= thres)
+        return xs, ys, res[ys, xs]
+
+    is_candidate = res <= thres
+    idx = np.flatnonzero(is_candidate)
+    if len(idx) > MAX_PEAK_CANDIDATES:
+        # Large blobs under thres, only keep minimum of each footprint before picking
+        half_w, half_h = footprint[0] // 2, footprint[1] // 2
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2*half_w + 1, 2*half_h + 1))
+        res_min = cv2.erode(res, kernel, dst=buffer_pool.get(res.shape, res.dtype, "match_peaks"))
+        idx = np.flatnonzero(is_candidate & (res == res_min))
+    ys, xs = np.divmod(idx, res.shape[1])
+    return select_peaks(xs, ys, res[ys, xs], footprint, max_peaks)
+
+def resize_by_scale(img, scale, interpolation=cv2.INTER_AREA):
+    '''
+    Resize image by scale, return img itself if scale is 1.0
+    '''
+    if scale == 1.0:
+        return img
+    h, w = img.shape[:2]
+    return cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))),
+                      interpolation=interpolation)
+
+def scale_box(box, scale):
+    '''
+    Scale (x, y, w, h) box to a frame resized by scale
+    '''
+    if scale == 1.0:
+        return box
+    x, y, w, h = box
+    return (round(x * scale), round(y * scale),
+            max(1, round(w * scale)), max(1, round(h * scale)))
+
 def find_pattern_sqdiff(
         img, img_pattern,
         last_result=None,
         mask=None,
         local_search_radius=50,
-        global_threshold=0.4
+        global_threshold=0.4,
+        pyramid=None
     ):
     '''
     Perform masked template matching using SQDIFF_NORMED method.
@@ -307,6 +352,8 @@ def find_pattern_sqdiff(
     Parameters:
     - img: Target search image (numpy array), can be grayscale or BGR.
     - img_pattern: Template image to search for (numpy array, BGR).
+    - pyramid: pyramid_search config, search coarse-to-fine instead of
+               exhaustive global search if enabled
 
     Returns:
     - min_loc: The top-left coordinate (x, y) of the best match position.
@@ -331,34 +378,106 @@ def find_pattern_sqdiff(
                     img_roi,
                     img_pattern,
                     cv2.TM_SQDIFF_NORMED,
+                    result=get_match_result_buffer(img_roi, img_pattern),
                     mask=mask
             )
             min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
             if min_val < global_threshold:
                 return (x0 + min_loc[0], y0 + min_loc[1]), min_val, True
 
+    # Coarse-to-fine search
+    if pyramid is not None and pyramid["enable"]:
+        result = find_pattern_pyramid(img, img_pattern, mask, pyramid)
+        if result is not None:
+            return result[0], result[1], False
+
     # Global fallback
     res = cv2.matchTemplate(
             img,
             img_pattern,
             cv2.TM_SQDIFF_NORMED,
+            result=get_match_result_buffer(img, img_pattern),
             mask=mask
     )
 
     # Replace -inf/+inf/nan to 1.0 to avoid numerical error
-    res = np.nan_to_num(res, nan=1.0, posinf=1.0, neginf=1.0)
+    np.nan_to_num(res, copy=False, nan=1.0, posinf=1.0, neginf=1.0)
 
     min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(res)
 
     return min_loc, min_val, False
 
+def find_pattern_pyramid(img, img_pattern, mask, pyramid):
+    '''
+    Match on downscaled image to get top-k candidates,
+    then refine at full resolution in small windows around them.
+
+    Returns:
+        (loc, score), or None if pyramid search is not confident,
+        caller should fall back to exhaustive search
+    '''
+    scale = pyramid["scale"]
+    img_small = resize_by_scale(img, scale)
+    pattern_small = resize_by_scale(img_pattern, scale)
+    h_small, w_small = pattern_small.shape[:2]
+    if min(h_small, w_small) < pyramid["min_pattern_size"] or \
+       img_small.shape[0] < h_small or img_small.shape[1] < w_small:
+        return None # Pattern is too small to be recognized after downscale
+    mask_small = None if mask is None else \
+                 resize_by_scale(mask, scale, cv2.INTER_NEAREST)
+
+    res = cv2.matchTemplate(
+            img_small,
+            pattern_small,
+            cv2.TM_SQDIFF_NORMED,
+            result=get_match_result_buffer(img_small, pattern_small, "pyramid_result"),
+            mask=mask_small
+    )
+    np.nan_to_num(res, copy=False, nan=1.0, posinf=1.0, neginf=1.0)
+
+    # Top-k candidates, suppress neighborhood of each picked candidate
+    candidates = []
+    for _ in range(pyramid["top_k"]):
+        _, _, min_loc, _ = cv2.minMaxLoc(res)
+        candidates.append(min_loc)
+        x, y = min_loc
+        res[max(0, y - h_small // 2):y + h_small // 2 + 1,
+            max(0, x - w_small // 2):x + w_small // 2 + 1] = np.inf
+
+    # Refine at full resolution
+    h, w = img_pattern.shape[:2]
+    margin = int(np.ceil(1.0 / scale)) + 1 # covers rounding of coarse location
+    best = None
+    for x_small, y_small in candidates:
+        x = round(x_small / scale)
+        y = round(y_small / scale)
+        x0, y0 = max(0, x - margin), max(0, y - margin)
+        x1 = min(img.shape[1], x + margin + w)
+        y1 = min(img.shape[0], y + margin + h)
+        img_roi = img[y0:y1, x0:x1]
+        if img_roi.shape[0] < h or img_roi.shape[1] < w:
+            continue
+        res_roi = cv2.matchTemplate(
+                img_roi,
+                img_pattern,
+                cv2.TM_SQDIFF_NORMED,
+                result=get_match_result_buffer(img_roi, img_pattern),
+                mask=mask
+        )
+        np.nan_to_num(res_roi, copy=False, nan=1.0, posinf=1.0, neginf=1.0)
+        min_val, _, min_loc, _ = cv2.minMaxLoc(res_roi)
+        if best is None or min_val < best[1]:
+            best = ((x0 + min_loc[0], y0 + min_loc[1]), min_val)
+
+    if best is None or best[1] > pyramid["confidence_thres"]:
+        return None
+    return best
+
 def get_mask(img, ignore_pixel_color):
     '''
     get_mask
     '''
-    mask = np.all(img == ignore_pixel_color, axis=2).astype(np.uint8) * 255
-    mask = cv2.bitwise_not(mask)
-    return mask
+    return cv2.bitwise_not(color_mask(img, ignore_pixel_color))
 
 def to_opencv_hsv(color_hsv):
     """
@@ -409,11 +528,14 @@ def get_minimap_loc_size(img_frame):
     white = np.array([255, 255, 255])
 
     # Mask for pure white
-    mask_white = cv2.inRange(img_frame, white, white)
+    mask_white = cv2.inRange(img_frame, white, white,
+                             dst=buffer_pool.get(img_frame.shape[:2], np.uint8, "minimap_white"))
 
     # Connected components with stats
     num_labels, labels, stats, centroids = \
-        cv2.connectedComponentsWithStats(mask_white, connectivity=8)
+        cv2.connectedComponentsWithStats(
+            mask_white, connectivity=8,
+            labels=buffer_pool.get(img_frame.shape[:2], np.int32, "minimap_labels"))
 
     # Loop over components (skip label 0, which is background)
     for i in range(1, num_labels):
@@ -438,7 +560,9 @@ def get_minimap_loc_size(img_frame):
             continue
 
         # Create a mask of non-white pixels
-        mask_minimap = np.any(img_frame[y0:y0+rh, x0:x0+rw] != white, axis=2).astype(np.uint8)
+        mask_minimap = cv2.inRange(img_frame[y0:y0+rh, x0:x0+rw], white, white,
+                                   dst=buffer_pool.get((rh, rw), np.uint8, "minimap_mask"))
+        cv2.bitwise_not(mask_minimap, dst=mask_minimap)
 
         # Find bounding box of mask_minimap
         coords = cv2.findNonZero(mask_minimap)
@@ -455,6 +579,19 @@ def get_minimap_loc_size(img_frame):
     # logger.warning("Minimap not found in the game frame.")
     return None  # minimap not found
 
+def is_minimap_border_intact(img_frame, minimap_box):
+    '''
+    Check if the 1px white border around a minimap found by
+    get_minimap_loc_size() is still on the game frame
+    '''
+    x, y, w, h = minimap_box
+    if x < 1 or y < 1 or x + w >= img_frame.shape[1] or y + h >= img_frame.shape[0]:
+        return False
+    return bool(np.all(img_frame[y-1, x-1:x+w+1] == 255) and \
+                np.all(img_frame[y+h, x-1:x+w+1] == 255) and \
+                np.all(img_frame[y-1:y+h+1, x-1] == 255) and \
+                np.all(img_frame[y-1:y+h+1, x+w] == 255))
+
 def get_player_location_on_minimap(img_minimap, minimap_player_color=(136, 255, 255)):
     """
     Detects the player's position on the minimap.
@@ -607,36 +744,19 @@ def nms_matches(matches, iou_thresh=0.0):
     Returns:
         List of filtered matches (same format as input)
     '''
-    filtered = matches.copy()
-    i = 0
-    while i < len(filtered):
-        j = i + 1
-        while j < len(filtered):
-            _, loc_i, score_i, shape_i = filtered[i]
-            _, loc_j, score_j, shape_j = filtered[j]
-
-            box_i = (loc_i[0], loc_i[1],
-                     loc_i[0] + shape_i[1], loc_i[1] + shape_i[0])
-            box_j = (loc_j[0], loc_j[1],
-                     loc_j[0] + shape_j[1], loc_j[1] + shape_j[0])
-
-            if get_iou(box_i, box_j) > iou_thresh:
-                if score_i > score_j:
-                    filtered.pop(i)
-                    i -= 1
-                    break
-                else:
-                    filtered.pop(j)
-                    j -= 1
-            j += 1
-        i += 1
-
-    return filtered
+    if not matches:
+        return []
+    boxes = to_boxes([loc for _, loc, _, _ in matches],
+                     [(shape[1], shape[0]) for _, _, _, shape in matches])
+    keep = greedy_nms(boxes, [score for _, _, score, _ in matches], iou_thresh,
+                      is_lower_better=True)
+    return [matches[i] for i in sorted(keep)]
 
 def get_window_region_mac(window_title):
     '''
     Get window region on macOS using Quartz
     '''
+    import Quartz
     window_list = Quartz.CGWindowListCopyWindowInfo(
         Quartz.kCGWindowListOptionOnScreenOnly | Quartz.kCGWindowListExcludeDesktopElements,
         Quartz.kCGNullWindowID
@@ -665,6 +785,12 @@ def click_in_game_window(window_title, coord):
     '''
     Mouse click on a game window coordinate
     '''
+    # Headless/replay backends don't have a game window to click
+    if not window_title:
+        logger.warning(f"[click_in_game_window] No game window, skip click at {coord}")
+        return
+
+    import pyautogui
     # game_window = gw.getWindowsWithTitle(window_title)[0]
     # win_left, win_top = game_window.left, game_window.top
 
@@ -682,6 +808,7 @@ def click_in_game_window(window_title, coord):
         win_left, win_top = region["left"], region["top"]
     else:
         # Windows implementation using pygetwindow
+        import pygetwindow as gw
         game_window = gw.getWindowsWithTitle(window_title)[0]
         win_left, win_top = game_window.left, game_window.top
 
@@ -754,11 +881,8 @@ def mask_route_colors(img_map, img_route, color_code):
                        f"{img_map.shape} to {img_route.shape}")
         img_map = cv2.resize(img_map, (img_route.shape[1], img_route.shape[0]))
 
-    # Build mask for each color
-    mask = np.zeros(img_map.shape[:2], dtype=bool)
-    for color in target_colors:
-        matches = np.all(img_map == color, axis=-1)
-        mask |= matches
+    # Build mask of all colors in one pass
+    mask = ColorIndex(target_colors).mask(img_map)
 
     # Apply mask to img_route (set those pixels to black)
     img_route[mask] = (0, 0, 0)
@@ -770,6 +894,8 @@ def activate_game_window(window_title):
     activate_game_window
     This function only support Windows OS
     '''
+    import win32gui
+    import win32con
     hwnd = win32gui.FindWindow(None, window_title)
     if hwnd == 0:
         raise Exception(f"Cannot find window with title: {window_title}")
@@ -792,6 +918,7 @@ def get_game_window_title_by_token(token):
     '''
     Only work in Windows OS
     '''
+    import win32gui
     def callback(hwnd, matches):
         title = win32gui.GetWindowText(hwnd)
         if token.lower() in title.lower():
@@ -832,6 +959,7 @@ def normalize_pixel_coordinate(coord, window_size):
     return (norm_x, norm_y)
 
 def resize_window(window_title, width=1296, height=759):
+    import win32gui
     # 取得視窗句柄
     hwnd = win32gui.FindWindow(None, window_title)
     if hwnd == 0:
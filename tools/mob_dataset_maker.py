@@ -0,0 +1,174 @@
+'''
+Synthesize labelled monster detection training data for monster_detect.mode "dnn".
+
+Monster sprites from monster/<name>/<name>*.png are pasted onto random crops of
+map backgrounds (maps/*/map.png plus optional screenshots), flipped, slightly
+rescaled and recolored, overlapping each other and cut by the frame border.
+Output is a YOLO dataset:
+    <out>/images/{train,val}/*.png
+    <out>/labels/{train,val}/*.txt, one "class cx cy w h" line per monster, normalized
+    <out>/data.yaml, class names are monster names
+
+Execute this script:
+python -m tools.mob_dataset_maker --monsters pink_windup_bear,brown_windup_bear --num 2000
+Without --monsters, every monster in config/config_data.yaml map_mobs_mapping is a class.
+Then train with any YOLO trainer, e.g. ultralytics:
+    yolo detect train data=dataset/monster/data.yaml model=yolov8n.pt imgsz=640
+    yolo export model=best.pt format=onnx opset=12
+and copy best.onnx and data.yaml to dnn_detector.model and dnn_detector.names.
+'''
+# Standard import
+import argparse
+import glob
+import os
+
+# Library import
+import numpy as np
+import cv2
+
+# Local import
+from src.utils.global_var import WINDOW_WORKING_SIZE
+from src.utils.logger import logger
+from src.utils.common import load_yaml, load_image, get_mask
+
+def load_sprites(monster_names):
+    '''
+    Load sprites of each monster as list of (img, mask) per class
+    '''
+    sprites = []
+    for name in monster_names:
+        files = sorted(glob.glob(f"monster/{name}/{name}*.png"))
+        if not files:
+            raise FileNotFoundError(f"No images found in monster/{name}/{name}*")
+        imgs = [load_image(f, cv2.IMREAD_COLOR) for f in files]
+        sprites.append([(img, get_mask(img, (0, 255, 0))) for img in imgs])
+    return sprites
+
+def load_backgrounds(bg_dir):
+    '''
+    Load map backgrounds, and screenshots in bg_dir if given
+    '''
+    files = sorted(glob.glob("maps/*/map.png"))
+    if bg_dir:
+        files += sorted(glob.glob(os.path.join(bg_dir, "*.png")) +
+                        glob.glob(os.path.join(bg_dir, "*.jpg")))
+    backgrounds = [load_image(f, cv2.IMREAD_COLOR) for f in files]
+    if not backgrounds:
+        raise FileNotFoundError("No background images found")
+    return backgrounds
+
+def crop_background(rng, backgrounds, size):
+    '''
+    Random crop of size (w, h), backgrounds smaller than size are resized up
+    '''
+    w, h = size
+    img = backgrounds[rng.integers(len(backgrounds))]
+    ratio = max(w / img.shape[1], h / img.shape[0], 1.0)
+    if ratio > 1.0:
+        img = cv2.resize(img, None, fx=ratio, fy=ratio)
+    x = rng.integers(img.shape[1] - w + 1)
+    y = rng.integers(img.shape[0] - h + 1)
+    return img[y:y+h, x:x+w].copy()
+
+def paste_sprite(rng, img, owner, idx, sprite, mask):
+    '''
+    Paste sprite at random position of img, may be cut by img border.
+    Pasted pixels are marked as idx on owner map
+
+    Returns:
+        number of sprite pixels, including pixels out of img
+    '''
+    # Game renders sprites at native size, small jitter covers window scaling
+    scale = rng.uniform(0.9, 1.1)
+    sprite = cv2.resize(sprite, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+    mask = cv2.resize(mask, None, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+    if rng.random() < 0.5:
+        sprite, mask = cv2.flip(sprite, 1), cv2.flip(mask, 1)
+    # Brightness jitter, maps have different lighting
+    sprite = cv2.convertScaleAbs(sprite, alpha=rng.uniform(0.85, 1.15), beta=rng.uniform(-15, 15))
+
+    h, w = sprite.shape[:2]
+    H, W = img.shape[:2]
+    x = int(rng.integers(-w // 2, W - w // 2))
+    y = int(rng.integers(-h // 2, H - h // 2))
+    x1, y1, x2, y2 = max(x, 0), max(y, 0), min(x + w, W), min(y + h, H)
+    if x2 > x1 and y2 > y1:
+        is_sprite = mask[y1-y:y2-y, x1-x:x2-x] > 0
+        img[y1:y2, x1:x2][is_sprite] = sprite[y1-y:y2-y, x1-x:x2-x][is_sprite]
+        owner[y1:y2, x1:x2][is_sprite] = idx
+    return np.count_nonzero(mask)
+
+def make_sample(rng, backgrounds, sprites, args):
+    '''
+    Make one image and its YOLO labels.
+    Sprites pasted later cover earlier ones, a monster is labelled
+    if at least min_visible of it is left uncovered and inside the image.
+    '''
+    img = crop_background(rng, backgrounds, (args.width, args.height))
+    owner = np.full(img.shape[:2], -1, dtype=np.int32) # index of sprite on each pixel
+    pasted = [] # (class index, number of sprite pixels) of each pasted sprite
+    for idx in range(rng.integers(0, args.max_monsters + 1)):
+        idx_class = int(rng.integers(len(sprites)))
+        sprite, mask = sprites[idx_class][rng.integers(len(sprites[idx_class]))]
+        pasted.append((idx_class, paste_sprite(rng, img, owner, idx, sprite, mask)))
+
+    labels = []
+    for idx, (idx_class, num_pixels) in enumerate(pasted):
+        ys, xs = np.nonzero(owner == idx)
+        if len(xs) == 0 or len(xs) < args.min_visible * num_pixels:
+            continue
+        # Tight box of visible pixels
+        x1, y1, x2, y2 = xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+        labels.append((idx_class, (x1 + x2) / 2 / args.width, (y1 + y2) / 2 / args.height,
+                       (x2 - x1) / args.width, (y2 - y1) / args.height))
+    return img, labels
+
+def main(args):
+    '''
+    Synthesize dataset
+    '''
+    if args.monsters:
+        monster_names = args.monsters.split(",")
+    else:
+        data = load_yaml("config/config_data.yaml")
+        monster_names = sorted({name for names in data["map_mobs_mapping"].values() for name in names})
+    sprites = load_sprites(monster_names)
+    backgrounds = load_backgrounds(args.bg_dir)
+    logger.info(f"[mob_dataset_maker] {len(monster_names)} classes, {len(backgrounds)} backgrounds")
+
+    rng = np.random.default_rng(args.seed)
+    num_val = int(args.num * args.val_ratio)
+    for split in ("train", "val"):
+        os.makedirs(os.path.join(args.out, "images", split), exist_ok=True)
+        os.makedirs(os.path.join(args.out, "labels", split), exist_ok=True)
+    for i in range(args.num):
+        split = "val" if i < num_val else "train"
+        img, labels = make_sample(rng, backgrounds, sprites, args)
+        cv2.imwrite(os.path.join(args.out, "images", split, f"{i:06d}.png"), img)
+        with open(os.path.join(args.out, "labels", split, f"{i:06d}.txt"), "w") as f:
+            f.writelines(f"{c} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}\n" for c, cx, cy, w, h in labels)
+
+    with open(os.path.join(args.out, "data.yaml"), "w", encoding="utf-8") as f:
+        f.write(f"path: {os.path.abspath(args.out)}\n")
+        f.write("train: images/train\n")
+        f.write("val: images/val\n")
+        f.write("names:\n")
+        f.writelines(f"  {i}: {name}\n" for i, name in enumerate(monster_names))
+    logger.info(f"[mob_dataset_maker] Saved {args.num} images to {args.out}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--monsters', type=str, default="",
+                        help='Comma separated monster names, default every monster in config_data.yaml')
+    parser.add_argument('--out', type=str, default="dataset/monster", help='Output dataset folder')
+    parser.add_argument('--num', type=int, default=2000, help='Number of images')
+    parser.add_argument('--val_ratio', type=float, default=0.1, help='Ratio of validation images')
+    parser.add_argument('--width', type=int, default=WINDOW_WORKING_SIZE[0], help='Image width')
+    parser.add_argument('--height', type=int, default=WINDOW_WORKING_SIZE[1], help='Image height')
+    parser.add_argument('--max_monsters', type=int, default=8, help='Max monsters per image')
+    parser.add_argument('--min_visible', type=float, default=0.4,
+                        help='Min ratio of a monster left uncovered and inside image to be labelled')
+    parser.add_argument('--bg_dir', type=str, default="",
+                        help='Folder of extra background screenshots, ideally without monsters')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    main(parser.parse_args())
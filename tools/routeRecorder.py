@@ -20,6 +20,7 @@ from src.utils.common import (
     get_minimap_loc_size, get_player_location_on_minimap,
     to_opencv_hsv, load_yaml, override_cfg, is_mac, load_image,
 )
+from src.utils.color_index import ColorIndex
 from src.input.KeyBoardListener import KeyBoardListener
 from src.input.GameWindowCapturor import GameWindowCapturor
 
@@ -105,7 +106,8 @@ class RouteRecorder():
         '''
         self.loc_minimap_global, score, _ = find_pattern_sqdiff(
                                         self.img_map,
-                                        self.img_minimap)
+                                        self.img_minimap,
+                                        pyramid=self.cfg["pyramid_search"])
         loc_player_global = (
             self.loc_minimap_global[0] + self.loc_player_minimap[0],
             self.loc_minimap_global[1] + self.loc_player_minimap[1]
@@ -220,6 +222,8 @@ class RouteRecorder():
             for k, v in cfg["route"]["color_code_up_down"].items()
         }
         self.color_code.update(color_code_up_down) # Combine both dictionaries
+        # color_code keys are RGB, minimap image is BGR
+        self.color_index = ColorIndex([rgb[::-1] for rgb in self.color_code.keys()])
 
         self.fps_limit = self.cfg["system"]["fps_limit_route_recorder"]
 
@@ -285,10 +289,7 @@ class RouteRecorder():
         """
         Set all pixels in self.img_map to black if they match any color in color_code (assumed RGB).
         """
-        for rgb in self.color_code.keys():
-            bgr = (rgb[2], rgb[1], rgb[0])  # Convert RGB → BGR
-            mask = np.all(img == bgr, axis=2)
-            img[mask] = (0, 0, 0)
+        img[self.color_index.mask(img)] = (0, 0, 0)
         return img
 
     def update_minimap(self):
@@ -369,7 +370,8 @@ class RouteRecorder():
             self.loc_minimap_global, score, _ = find_pattern_sqdiff(
                 self.img_map,
                 self.img_minimap,
-                mask=mask
+                mask=mask,
+                pyramid=self.cfg["pyramid_search"]
             )
             x, y = self.loc_minimap_global
             h, w = self.img_minimap.shape[:2]